@@ -0,0 +1,61 @@
+"""
+Concurrency repro check: many threads sharing one pipeline / fast tokenizer.
+
+    python -m benchmarks.concurrency_check [--threads 8] [--rounds 3]
+
+Runs long-document (map-reduce) and plain summaries concurrently on a single
+stand-in BART pipeline from load_pipeline, the way concurrent /hf_summarize
+requests do. Each call mixes truncating, non-truncating and offset-mapping
+tokenizer calls, which used to fail with RuntimeError('Already borrowed')
+when they overlapped. Exits 1 if any call raised.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_models import CORPUS, build_stub_models
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LONG_TEXT = " ".join(CORPUS * 20)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    env = build_stub_models(os.path.join(tempfile.mkdtemp(), "models"))
+    sys.path.insert(0, REPO_ROOT)
+    from hugging_face.services.map_reduce_summary import map_reduce_summarize
+    from hugging_face.services.model_precision import load_pipeline
+
+    summarizer = load_pipeline("summarization", env["BART_MODEL"])
+
+    def call(i):
+        if i % 2:
+            return map_reduce_summarize(summarizer, LONG_TEXT, max_length=20)
+        return summarizer(CORPUS[i % len(CORPUS)], max_length=20)[0]["summary_text"]
+
+    failures = []
+    calls = args.threads * args.rounds
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(call, i) for i in range(calls)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                failures.append(repr(exc))
+
+    print(f"{calls - len(failures)}/{calls} concurrent summaries succeeded")
+    for failure in sorted(set(failures)):
+        print(f"  {failures.count(failure)} x {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throughput and parity of the EmbeddingsService backends.
+
+    python -m benchmarks.embeddings_backend_benchmark [--texts 2000] [--threads 8]
+
+Encodes the same synthetic chunks with the torch, onnx and onnx-int8
+backends, reports texts/sec and the lowest cosine similarity against the
+torch embeddings.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from langchain_HF.rag_pipeline_services.embeddings_service import EmbeddingsService
+
+
+def synthetic_chunks(n: int, words: int, seed: int = 0):
+    rnd = random.Random(seed)
+    vocab = (
+        "retrieval generation document vector index query answer context model "
+        "embedding chunk page source revenue contract policy customer service "
+        "latency throughput memory storage cluster node request response"
+    ).split()
+    return [" ".join(rnd.choice(vocab) for _ in range(words)) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=120)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.texts, args.words)
+    reference = None
+
+    print(f"{'backend':<12}{'texts/s':>10}{'speed-up':>10}{'min cos':>10}")
+    baseline = None
+    for backend in ("torch", "onnx", "onnx-int8"):
+        service = EmbeddingsService(
+            model_name=args.model,
+            normalize=True,
+            backend=backend,
+            threads=args.threads,
+        )
+        service.embed_texts(texts[: args.batch_size])  # warm-up
+
+        start = time.perf_counter()
+        vectors = np.asarray(service.embed_texts(texts, batch_size=args.batch_size))
+        rate = len(texts) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference, baseline = vectors, rate
+        worst = float((reference * vectors).sum(axis=1).min())
+        print(f"{backend:<12}{rate:>10.1f}{rate / baseline:>9.2f}x{worst:>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Offline latency / throughput benchmark of every route.
+
+    python -m benchmarks.load_test [--requests 40] [--concurrency 4]
+        [--routes hf_generate rag_ask ...] [--output results.json]
+        [--baseline previous.json --tolerance 0.25]
+
+Builds tiny random stand-in models (benchmarks.stub_models), a hand-written
+PDF corpus and a temporary working directory (Chroma, quantized store and
+logs go there), points the services at them through QWEN_MODEL, BART_MODEL,
+QA_MODEL, EMBEDDINGS_MODEL and RAG_DOCS_PATH, imports the app and drives each
+route through FastAPI's TestClient from `--concurrency` threads.
+
+Per route it reports p50/p95/p99 latency, requests/sec, status codes and the
+process peak RSS after the route, and writes everything as JSON. With
+--baseline, routes whose p95 or throughput got worse by more than
+--tolerance are listed and the exit code is 1.
+
+Stand-in models make the numbers a measure of the service overhead
+(routing, validation, tokenization, batching, retrieval, pipelines), not of
+real model compute; set the *_MODEL variables yourself to benchmark real
+checkpoints.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.stub_models import CORPUS, build_stub_models, write_sample_pdf
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HF = "/api/v1/hugging-ai"
+LC = "/api/v1/langchain-ai"
+RAG = "/api/v1/langchain-rag-ai"
+
+TOKEN = "benchmark-token"
+
+# routes that can only succeed once (one rebuild at a time; the collection is
+# gone after delete_all); their JSON fills later paths, e.g. {job_id}
+ONE_SHOT = {"rag_rebuild", "rag_delete_all"}
+LONG_TEXT = " ".join(CORPUS * 20)
+
+
+def scenarios(pdf_path: str):
+    """(name, method, path, request kwargs factory); order matters for RAG."""
+
+    def body(payload):
+        return lambda i: {"json": payload}
+
+    def upload(i):
+        return {
+            "data": {"query": f"What is retrieval? ({i})", "file_type": "pdf"},
+            "files": {"file": ("sample.pdf", open(pdf_path, "rb"), "application/pdf")},
+        }
+
+    hf = {"service_token": TOKEN}
+    return [
+        # hugging_face_ai
+        ("hf_generate", "POST", f"{HF}/hf_generate", lambda i: {"json": {**hf, "query": f"Explain vectors {i}"}}),
+        ("hf_summarize", "POST", f"{HF}/hf_summarize", body({**hf, "text": LONG_TEXT[:2000]})),
+        ("hf_summarize_long", "POST", f"{HF}/hf_summarize", body({**hf, "text": LONG_TEXT, "long_document": True})),
+        ("hf_qa", "POST", f"{HF}/hf_qa", body({**hf, "context": CORPUS[0], "question": "What grounds the answers?"})),
+        ("hf_qa_long", "POST", f"{HF}/hf_qa", body({**hf, "context": LONG_TEXT, "question": "What maps text to vectors?", "long_context": True, "top_windows": 4})),
+        ("hf_sequential", "POST", f"{HF}/hf_sequential", lambda i: {"json": {**hf, "query": f"Describe embeddings {i}"}}),
+        ("hf_speculative_stats", "GET", f"{HF}/hf_speculative_stats", lambda i: {"headers": {"X-Service-Token": TOKEN}}),
+        ("hf_scheduler_stats", "GET", f"{HF}/hf_scheduler_stats", lambda i: {"headers": {"X-Service-Token": TOKEN}}),
+        # langchain_ai
+        ("lc_generate", "POST", f"{LC}/generate", lambda i: {"json": {**hf, "prompt": f"Write about storage {i}"}}),
+        ("lc_summarize", "POST", f"{LC}/summarize", body({**hf, "text": CORPUS[1]})),
+        ("lc_chain", "POST", f"{LC}/chain", lambda i: {"json": {**hf, "topic": f"persistence {i}"}}),
+        ("lc_sequential_chain", "POST", f"{LC}/sequential-chain", body({**hf, "topic": LONG_TEXT[:1500]})),
+        ("lc_chain_batch", "POST", f"{LC}/chain/batch", lambda i: {"json": {**hf, "topics": [f"persistence {i}.{n}" for n in range(8)]}}),
+        ("lc_sequential_chain_batch", "POST", f"{LC}/sequential-chain/batch", body({**hf, "topics": [text * 4 for text in CORPUS[:4]]})),
+        # rag_apis: ingest first, destructive routes last
+        ("rag_add", "POST", f"{RAG}/add", body({})),
+        ("rag_document_loader", "GET", f"{RAG}/rag-document-loader", lambda i: {}),
+        ("rag_split_pdfs", "GET", f"{RAG}/split-pdfs", lambda i: {}),
+        ("rag_embed_test", "GET", f"{RAG}/embed-test", lambda i: {}),
+        ("rag_embed_chunks", "GET", f"{RAG}/embed-chunks", lambda i: {}),
+        ("rag_query", "POST", f"{RAG}/query", lambda i: {"json": {"query": f"vector store {i}", "k": 5}}),
+        ("rag_retrieve", "POST", f"{RAG}/retrieve", lambda i: {"json": {"query": f"embeddings {i}", "k": 5}}),
+        ("rag_ask", "POST", f"{RAG}/ask", lambda i: {"json": {"prompt": f"What is retrieval-augmented generation? {i}"}}),
+        ("rag_ask_from_document", "POST", f"{RAG}/ask-from-document", upload),
+        ("rag_status", "GET", f"{RAG}/status", lambda i: {}),
+        ("rag_rebuild", "POST", f"{RAG}/rebuild", body({"sample_queries": 10})),
+        ("rag_rebuild_status", "GET", RAG + "/rebuild/{job_id}", lambda i: {}),
+        ("rag_persist", "POST", f"{RAG}/persist", lambda i: {}),
+        ("metrics", "GET", "/metrics", lambda i: {}),
+        ("rag_delete_all", "DELETE", f"{RAG}/delete_all", lambda i: {}),
+    ]  # fmt: skip
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_route(client, method, path, make_kwargs, requests, concurrency, warmup):
+    def call(i):
+        kwargs = make_kwargs(i)
+        start = time.perf_counter()
+        response = client.request(method, path, **kwargs)
+        elapsed = time.perf_counter() - start
+        for item in kwargs.get("files", {}).values():
+            item[1].close()
+        return elapsed, response.status_code, response
+
+    for i in range(warmup):
+        call(-1 - i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([elapsed for elapsed, _, _ in results]) * 1000
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "throughput_rps": round(requests / wall, 3),
+        "errors": sum(
+            n for status, n in statuses.items() if not status.startswith("2")
+        ),
+        "status_codes": statuses,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "last_response": results[-1][2],
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms"
+            )
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40, help="per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--routes", nargs="*", help="only these scenario names")
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--baseline", help="earlier --output file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    docs = os.path.join(workdir, "docs")
+    os.makedirs(docs)
+    pdf_path = write_sample_pdf(
+        os.path.join(docs, "sample.pdf"), [CORPUS, CORPUS[::-1]] * 3
+    )
+
+    env = build_stub_models(os.path.join(workdir, "models"))
+    env.update(
+        RAG_DOCS_PATH=docs,
+        SERVICE_TOKEN=TOKEN,
+        HF_HUB_OFFLINE="1",
+        TRANSFORMERS_OFFLINE="1",
+        TRACE_SLOW_LOG=os.path.join(workdir, "slow_requests.jsonl"),
+    )
+    # explicit env wins over .env files picked up by load_dotenv()
+    os.environ.update(env)
+
+    # stores and logs use relative paths: keep them in the temp directory
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+
+    load_start = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    startup_seconds = time.perf_counter() - load_start
+
+    selected = scenarios(pdf_path)
+    if args.routes:
+        selected = [s for s in selected if s[0] in args.routes]
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "startup_seconds": round(startup_seconds, 2),
+            "workdir": workdir,
+        },
+        "routes": {},
+    }
+
+    print(
+        f"{'route':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'req/s':>10}{'errors':>8}{'peak MB':>10}"
+    )
+    # server errors are counted as 500s instead of aborting the run
+    with TestClient(app, raise_server_exceptions=False) as client:
+        context = {}
+        for name, method, path, make_kwargs in selected:
+            try:
+                path = path.format_map(context)
+            except KeyError as missing:
+                print(f"{name:<24}skipped: needs {missing} from an earlier route")
+                continue
+            if name in ONE_SHOT:
+                row = run_route(client, method, path, make_kwargs, 1, 1, 0)
+                try:
+                    context.update(row["last_response"].json())
+                except (TypeError, ValueError):
+                    pass
+            else:
+                row = run_route(
+                    client, method, path, make_kwargs,
+                    args.requests, args.concurrency, args.warmup,
+                )  # fmt: skip
+            del row["last_response"]
+            results["routes"][name] = row
+            print(
+                f"{name:<24}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                f"{row['p99_ms']:>10.1f}{row['throughput_rps']:>10.1f}"
+                f"{row['errors']:>8}{row['peak_rss_mb']:>10.1f}"
+            )
+
+    results["meta"]["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results -> {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Load time, memory and decoding speed of the model precision modes.
+
+    python -m benchmarks.precision_benchmark [--task text-generation]
+        [--model Qwen/Qwen2.5-3B-Instruct] [--precisions fp32 bf16 int8 int4]
+
+Every mode is loaded in a fresh process (so RSS is not polluted by the
+previous model) and reports resident memory after loading, load time and
+greedy tokens/sec. The quality smoke test compares each mode's greedy output
+with fp32: the fraction of matching leading tokens and the token overlap
+must stay above --min-agreement, and the output must not be empty. Exits 1
+if any mode failed to load or run, or failed the smoke test.
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+
+DEFAULT_MODELS = {
+    "text-generation": "Qwen/Qwen2.5-3B-Instruct",
+    "summarization": "facebook/bart-large-cnn",
+}
+
+PROMPTS = {
+    "text-generation": [
+        "<|im_start|>user\nWhat is retrieval-augmented generation?<|im_end|>\n<|im_start|>assistant\n",
+        "<|im_start|>user\nExplain what a vector database stores.<|im_end|>\n<|im_start|>assistant\n",
+        "<|im_start|>user\nName three uses of text summarization.<|im_end|>\n<|im_start|>assistant\n",
+    ],
+    "summarization": [
+        "The city council approved a new budget on Tuesday that increases spending "
+        "on public transport and road maintenance. The plan adds two bus lines, "
+        "extends night service on the metro and repairs forty kilometres of roads. "
+        "Council members said the changes respond to complaints about congestion "
+        "and unreliable service, and will be paid for by a small rise in parking "
+        "fees and a reallocation of unused funds from last year.",
+    ],
+}
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_mode(task, model_name, precision, max_new_tokens, results):
+    try:
+        results.put(measure(task, model_name, precision, max_new_tokens))
+    except Exception as exc:
+        results.put({"precision": precision, "error": str(exc)})
+
+
+def measure(task, model_name, precision, max_new_tokens):
+    import torch
+
+    from hugging_face.services.model_precision import load_pipeline
+
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    pipe = load_pipeline(task, model_name, precision=precision)
+    load_seconds = time.perf_counter() - start
+    loaded_rss = rss_mb() - base_rss
+
+    tokenizer, model = pipe.tokenizer, pipe.model
+    outputs, new_tokens, seconds = [], 0, 0.0
+    with torch.inference_mode():
+        for prompt in PROMPTS[task]:
+            inputs = tokenizer(prompt, return_tensors="pt", return_token_type_ids=False)
+            start = time.perf_counter()
+            output = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=max_new_tokens,
+                do_sample=False,
+            )
+            seconds += time.perf_counter() - start
+
+            if model.config.is_encoder_decoder:
+                tokens = output[0].tolist()
+            else:
+                tokens = output[0, inputs["input_ids"].shape[1] :].tolist()
+            outputs.append(tokens)
+            new_tokens += len(tokens)
+
+    return {
+        "precision": precision,
+        "load_seconds": round(load_seconds, 2),
+        "rss_mb": round(loaded_rss, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+        "tokens_per_sec": round(new_tokens / seconds, 2),
+        "outputs": outputs,
+    }
+
+
+def agreement(reference, candidate):
+    """(leading-token match fraction, token-set overlap) averaged over prompts."""
+    prefix, overlap = [], []
+    for ref, cand in zip(reference, candidate):
+        same = 0
+        for a, b in zip(ref, cand):
+            if a != b:
+                break
+            same += 1
+        prefix.append(same / max(len(ref), 1))
+        overlap.append(len(set(ref) & set(cand)) / max(len(set(ref) | set(cand)), 1))
+    return sum(prefix) / len(prefix), sum(overlap) / len(overlap)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task", default="text-generation", choices=sorted(PROMPTS))
+    parser.add_argument("--model", default=None)
+    parser.add_argument(
+        "--precisions", nargs="+", default=["fp32", "bf16", "int8", "int4"]
+    )
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--min-agreement", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="print raw results")
+    args = parser.parse_args()
+
+    model_name = args.model or DEFAULT_MODELS[args.task]
+    precisions = ["fp32"] + [p for p in args.precisions if p != "fp32"]
+
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for precision in precisions:
+        results = ctx.Queue()
+        process = ctx.Process(
+            target=run_mode,
+            args=(args.task, model_name, precision, args.max_new_tokens, results),
+        )
+        process.start()
+        row = None
+        while row is None:
+            try:
+                row = results.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    row = {"precision": precision, "error": "worker crashed"}
+        process.join()
+        rows.append(row)
+
+    reference = rows[0].get("outputs")
+    for row in rows:
+        if reference is None:
+            row.setdefault("error", "no fp32 reference output")
+        if "error" in row:
+            continue
+        prefix, overlap = agreement(reference, row["outputs"])
+        row["prefix_match"] = round(prefix, 3)
+        row["token_overlap"] = round(overlap, 3)
+        row["smoke_test"] = (
+            "pass"
+            if all(row["outputs"]) and max(prefix, overlap) >= args.min_agreement
+            else "FAIL"
+        )
+
+    failed = [row["precision"] for row in rows if row.get("smoke_test") != "pass"]
+
+    if args.json:
+        print(
+            json.dumps([{k: v for k, v in r.items() if k != "outputs"} for r in rows])
+        )
+        if failed:
+            sys.exit(1)
+        return
+
+    print(f"model: {model_name}")
+    print(
+        f"{'precision':<10}{'load s':>8}{'RSS MB':>9}{'tok/s':>9}"
+        f"{'prefix':>8}{'overlap':>9}{'smoke':>7}"
+    )
+    for row in rows:
+        if "error" in row:
+            print(f"{row['precision']:<10}  error: {row['error']}")
+            continue
+        print(
+            f"{row['precision']:<10}{row['load_seconds']:>8.2f}{row['rss_mb']:>9.1f}"
+            f"{row['tokens_per_sec']:>9.2f}{row['prefix_match']:>8.3f}"
+            f"{row['token_overlap']:>9.3f}{row['smoke_test']:>7}"
+        )
+    if failed:
+        print(f"failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Recall vs. memory for the quantized vector store.
+
+    python -m benchmarks.quantized_store_benchmark [--n 100000] [--dim 384]
+
+Builds float16 / int8 stores (with and without float32 re-scoring) from
+synthetic clustered embeddings and reports recall@k against exact float32
+search, bytes scanned per query and query latency.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+from langchain_HF.rag_pipeline_services.quantized_vectorstore_service import (
+    QuantizedVectorStoreService,
+)
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.n + args.queries, args.dim, args.clusters)
+    corpus, queries = data[: args.n], data[args.n :]
+    exact = np.argsort(-(queries @ corpus.T), axis=1)[:, : args.k]
+
+    pairs = [
+        (vec, Document(page_content=f"chunk {i}", metadata={"row": i}))
+        for i, vec in enumerate(corpus)
+    ]
+
+    print(f"n={args.n} dim={args.dim} k={args.k}")
+    print(f"float32 baseline: {corpus.nbytes / 2**20:.1f} MiB")
+    print(f"{'mode':<18}{'recall@k':>10}{'scanned MiB':>14}{'ms/query':>10}")
+
+    modes = [
+        ("float16", 0),
+        ("float16+rescore", 4),
+        ("int8", 0),
+        ("int8+rescore", 4),
+    ]
+    for name, factor in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = QuantizedVectorStoreService(
+                persist_directory=tmp,
+                dtype=name.split("+")[0],
+                keep_full_precision=factor > 0,
+                rescore_factor=factor,
+            )
+            store.add_embeddings(pairs)
+
+            hits = 0
+            start = time.perf_counter()
+            for q, truth in zip(queries, exact):
+                rows = [m["row"] for m in store.search(q, k=args.k)["metadatas"]]
+                hits += len(set(rows) & set(truth.tolist()))
+            elapsed = (time.perf_counter() - start) / len(queries)
+
+            recall = hits / (len(queries) * args.k)
+            scanned = store.memory_bytes()["compact"] / 2**20
+            print(f"{name:<18}{recall:>10.4f}{scanned:>14.1f}{elapsed * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
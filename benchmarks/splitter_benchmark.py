@@ -0,0 +1,100 @@
+"""
+Compare the LangChain recursive splitter with the fast offset-based splitter.
+
+    python -m benchmarks.splitter_benchmark [--docs <pdf folder>] [--workers 4]
+
+Checks that both produce identical chunks (text and metadata) before
+reporting timings. Without --docs a synthetic corpus is generated.
+"""
+
+import argparse
+import random
+import time
+
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from langchain_HF.rag_pipeline_services.fast_splitter import FastRecursiveTextSplitter
+
+
+def synthetic_corpus(pages: int, words_per_page: int, seed: int = 0):
+    rnd = random.Random(seed)
+    vocab = [
+        "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(1, 12)))
+        for _ in range(5000)
+    ]
+    separators = [" "] * 12 + ["\n"] * 2 + ["\n\n"]
+    docs = []
+    for page in range(pages):
+        words = (
+            rnd.choice(vocab) + rnd.choice(separators) for _ in range(words_per_page)
+        )
+        docs.append(
+            Document(
+                page_content="".join(words),
+                metadata={"source": "synthetic.pdf", "page": page},
+            )
+        )
+    return docs
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", help="folder with PDFs (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--words-per-page", type=int, default=600)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.docs:
+        from langchain_HF.rag_pipeline_services.loader_service import (
+            DocumentLoaderServices,
+        )
+
+        docs = DocumentLoaderServices().load_pdfs_from_folder(args.docs)
+    else:
+        docs = synthetic_corpus(args.pages, args.words_per_page)
+
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap
+    )
+    fast = FastRecursiveTextSplitter(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        workers=args.workers,
+    )
+
+    ref_time, ref_chunks = timed(lambda: reference.split_documents(docs), args.repeat)
+    fast_time, fast_chunks = timed(lambda: fast.split_documents(docs), args.repeat)
+
+    mismatches = sum(
+        a.page_content != b.page_content or a.metadata != b.metadata
+        for a, b in zip(ref_chunks, fast_chunks)
+    ) + abs(len(ref_chunks) - len(fast_chunks))
+
+    total_chars = sum(len(doc.page_content) for doc in docs)
+    print(f"pages: {len(docs)}  chars: {total_chars}  chunks: {len(ref_chunks)}")
+    print(f"recursive : {ref_time:.3f}s  ({total_chars / ref_time / 1e6:.1f} MB/s)")
+    print(f"fast      : {fast_time:.3f}s  ({total_chars / fast_time / 1e6:.1f} MB/s)")
+    print(f"speed-up  : {ref_time / fast_time:.2f}x")
+    print(f"parity    : {'OK' if mismatches == 0 else f'{mismatches} mismatches'}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Tiny randomly-initialized stand-ins for the service models, built offline.
+
+    python -m benchmarks.stub_models /tmp/stub_models
+
+Writes one directory per model (same architectures as production: Qwen2,
+BART, RoBERTa QA, a BERT sentence embedder) sharing a small byte-level BPE
+tokenizer, and returns the environment variables that point the services at
+them (QWEN_MODEL, BART_MODEL, QA_MODEL, EMBEDDINGS_MODEL). The outputs are
+gibberish; the point is exercising every code path at realistic call
+overhead without downloading anything.
+"""
+
+import os
+import sys
+
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+from transformers import (
+    BartConfig,
+    BartForConditionalGeneration,
+    BertConfig,
+    BertModel,
+    PreTrainedTokenizerFast,
+    Qwen2Config,
+    Qwen2ForCausalLM,
+    RobertaConfig,
+    RobertaForQuestionAnswering,
+)
+
+SPECIAL_TOKENS = [
+    "<pad>",
+    "<s>",
+    "</s>",
+    "<unk>",
+    "<mask>",
+    "<|endoftext|>",
+    "<|im_start|>",
+    "<|im_end|>",
+]
+
+CORPUS = [
+    "Retrieval-augmented generation grounds the answers of a language model "
+    "in documents retrieved from a vector store.",
+    "The quick brown fox jumps over the lazy dog while the service answers "
+    "questions, writes summaries and generates motivational quotes.",
+    "Embeddings map chunks of text to vectors; similar passages end up close "
+    "together, so the nearest neighbours of a query are good context.",
+    "Revenue, contracts, policies, customers, latency, throughput, memory, "
+    "storage, clusters, nodes, requests and responses.",
+]
+
+
+def _tokenizer(pair_template: bool) -> PreTrainedTokenizerFast:
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(
+        CORPUS * 4,
+        trainers.BpeTrainer(
+            vocab_size=600,
+            special_tokens=SPECIAL_TOKENS,
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    if pair_template:
+        tokenizer.post_processor = processors.RobertaProcessing(
+            ("</s>", tokenizer.token_to_id("</s>")),
+            ("<s>", tokenizer.token_to_id("<s>")),
+        )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>",
+        eos_token="</s>" if pair_template else "<|endoftext|>",
+        unk_token="<unk>",
+        pad_token="<pad>",
+        cls_token="<s>",
+        sep_token="</s>",
+        mask_token="<mask>",
+        additional_special_tokens=["<|im_start|>", "<|im_end|>"],
+        model_max_length=512,
+    )
+
+
+def build_stub_models(root: str) -> dict:
+    """Create the stand-in models under `root`; returns the env overrides."""
+    torch.manual_seed(0)
+    chat_tokenizer = _tokenizer(pair_template=False)
+    tokenizer = _tokenizer(pair_template=True)
+    vocab = len(tokenizer)
+
+    small = dict(hidden_size=64, intermediate_size=128, num_attention_heads=4)
+    stubs = {
+        "QWEN_MODEL": (
+            "qwen",
+            Qwen2ForCausalLM(
+                Qwen2Config(
+                    vocab_size=vocab,
+                    num_hidden_layers=2,
+                    num_key_value_heads=2,
+                    max_position_embeddings=2048,
+                    bos_token_id=chat_tokenizer.bos_token_id,
+                    eos_token_id=chat_tokenizer.eos_token_id,
+                    pad_token_id=chat_tokenizer.pad_token_id,
+                    **small,
+                )
+            ),
+            chat_tokenizer,
+        ),
+        "BART_MODEL": (
+            "bart",
+            BartForConditionalGeneration(
+                BartConfig(
+                    vocab_size=vocab,
+                    d_model=64,
+                    encoder_layers=2,
+                    decoder_layers=2,
+                    encoder_attention_heads=4,
+                    decoder_attention_heads=4,
+                    encoder_ffn_dim=128,
+                    decoder_ffn_dim=128,
+                    max_position_embeddings=1024,
+                    pad_token_id=tokenizer.pad_token_id,
+                    bos_token_id=tokenizer.bos_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    decoder_start_token_id=tokenizer.eos_token_id,
+                    forced_bos_token_id=tokenizer.bos_token_id,
+                    forced_eos_token_id=tokenizer.eos_token_id,
+                )
+            ),
+            tokenizer,
+        ),
+        "QA_MODEL": (
+            "qa",
+            RobertaForQuestionAnswering(
+                RobertaConfig(
+                    vocab_size=vocab,
+                    num_hidden_layers=2,
+                    max_position_embeddings=514,
+                    pad_token_id=tokenizer.pad_token_id,
+                    bos_token_id=tokenizer.bos_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    **small,
+                )
+            ),
+            tokenizer,
+        ),
+        "EMBEDDINGS_MODEL": (
+            "embeddings",
+            BertModel(
+                BertConfig(
+                    vocab_size=vocab,
+                    num_hidden_layers=2,
+                    max_position_embeddings=512,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **small,
+                ),
+                add_pooling_layer=False,
+            ),
+            tokenizer,
+        ),
+    }
+
+    env = {}
+    for variable, (name, model, model_tokenizer) in stubs.items():
+        path = os.path.join(root, name)
+        model.eval().save_pretrained(path)
+        model_tokenizer.save_pretrained(path)
+        env[variable] = path
+    return env
+
+
+def _pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_sample_pdf(path: str, pages=None):
+    """Write a small text PDF (one page per entry of `pages`) by hand."""
+    pages = pages or [CORPUS[:2], CORPUS[2:]]
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        stream = (
+            "BT /F1 11 Tf 50 750 Td 14 TL "
+            + " ".join(f"({_pdf_text(line)}) '" for line in lines)
+            + " ET"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+
+    with open(path, "w", encoding="latin-1") as f:
+        f.write(out)
+    return path
+
+
+if __name__ == "__main__":
+    for key, value in build_stub_models(sys.argv[1]).items():
+        print(f"{key}={value}")
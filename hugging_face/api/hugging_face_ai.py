@@ -1,6 +1,8 @@
+import hmac
 import os
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 
 # Text Generation
 from ..schemas.text_generation_schema import (
@@ -8,6 +10,8 @@ from ..schemas.text_generation_schema import (
     TextGenerationResponse,
 )
 from ..services.text_generation_service import generate_text
+from ..services.speculative_decoding import speculative_stats
+from ..services.resource_scheduler import get_scheduler
 
 # Summarization
 from ..schemas.summarizer import SummaryRequest, SummaryResponse
@@ -15,7 +19,7 @@ from ..services.summarizer_service import generate_summary
 
 # Question Answering
 from ..schemas.qa_schema import QARequest, QAResponse
-from ..services.qa_service import generate_qa
+from ..services.qa_service import generate_qa, generate_qa_long
 
 # Combined Text Generation and QA
 from ..schemas.combine_text_qa_schema import CombineTextQARequest, CombineTextQAResponse
@@ -29,6 +33,22 @@ load_dotenv()
 service_token = os.getenv("SERVICE_TOKEN")
 
 
+# GET routes have no body: the token comes as a header or query parameter
+def require_service_token(
+    x_service_token: Optional[str] = Header(None),
+    token: Optional[str] = Query(None, alias="service_token"),
+):
+    supplied = x_service_token or token
+    # fail closed: no SERVICE_TOKEN configured or none sent means no access
+    if not service_token or not supplied or not hmac.compare_digest(
+        supplied.encode("utf-8"), service_token.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=403,  # Forbidden
+            detail="Invalid service code. Access denied.",
+        )
+
+
 # Text Generation Endpoint
 @router.post("/hf_generate", response_model=TextGenerationResponse)
 def text_generation(request: TextGenerationRequest):
@@ -39,10 +59,22 @@ def text_generation(request: TextGenerationRequest):
             status_code=403,  # Forbidden
             detail="Invalid service code. Access denied.",
         )
-    result = generate_text(query=request.query)
+    result = generate_text(query=request.query, stop=request.stop)
     return TextGenerationResponse(output=result)
 
 
+# Speculative decoding counters (acceptance rate, tokens/sec)
+@router.get("/hf_speculative_stats", dependencies=[Depends(require_service_token)])
+def speculative_decoding_stats():
+    return speculative_stats.snapshot()
+
+
+# Resource scheduler classes (cores, threads, queued / active, utilization)
+@router.get("/hf_scheduler_stats", dependencies=[Depends(require_service_token)])
+def scheduler_stats():
+    return get_scheduler().snapshot()
+
+
 # Summarization Endpoint
 @router.post("/hf_summarize", response_model=SummaryResponse)
 def summarize_text(request: SummaryRequest):
@@ -52,7 +84,7 @@ def summarize_text(request: SummaryRequest):
             status_code=403,  # Forbidden
             detail="Invalid service code. Access denied.",
         )
-    result = generate_summary(request.text)
+    result = generate_summary(request.text, long_document=request.long_document)
     return SummaryResponse(summary=result)
 
 
@@ -66,7 +98,14 @@ def question_answer(request: QARequest):
             status_code=403,  # Forbidden
             detail="Invalid service code. Access denied.",
         )
-    result = generate_qa(question=request.question, context=request.context)
+    if request.long_context:
+        result = generate_qa_long(
+            context=request.context,
+            question=request.question,
+            top_windows=request.top_windows,
+        )
+    else:
+        result = generate_qa(question=request.question, context=request.context)
     return QAResponse(answer=result)
 
 
@@ -1,9 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 class QARequest(BaseModel):
     context: str
     question: str
     service_token: str
+    long_context: bool = False  # windowed, batched QA for long contexts
+    top_windows: Optional[int] = Field(None, ge=1)  # keep only the N windows closest to the question
 
 
 class QAResponse(BaseModel):
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 class SummaryRequest(BaseModel):
     text: str   # only text now
     service_token: str
+    long_document: bool = False  # map-reduce over the whole text instead of truncating
 
 class SummaryResponse(BaseModel):
     summary: str
@@ -1,9 +1,12 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
 class TextGenerationRequest(BaseModel): 
     query: str
     service_token: str
+    stop: Optional[List[str]] = None  # extra stop strings
 
 
 class TextGenerationResponse(BaseModel):
@@ -1,7 +1,15 @@
 import os
+import contextvars
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 from ..services.text_generation_service import generate_text
-from ..services.qa_service import generate_qa
+from ..services.qa_service import generate_qa_batch
+from observability.metrics import queue_depth
+from observability.tracing import span
 
 
 # Load .env variables
@@ -10,7 +18,145 @@ load_dotenv()
 hf_token = os.getenv("HF_TOKEN")
 
 
+class CompositePipeline:
+    """
+    Runs generate -> QA as two pipelined stages so consecutive requests overlap.
+
+    - stage one (text generation) runs on its own thread pool; outputs are
+      cached by query (LRU) and identical in-flight queries share one call
+    - stage two (QA) is fed through a queue and answered in micro-batches
+      collected across requests (up to `qa_max_batch`, waiting at most
+      `qa_max_wait` seconds for stragglers)
+    - if the generated text has at most `skip_qa_below_words` words it is
+      already as short as a QA span would be and is returned as-is
+      (0 disables the shortcut)
+
+    Under load throughput is bounded by the slower model, not the sum.
+    """
+
+    def __init__(
+        self,
+        generate_fn,
+        qa_batch_fn,
+        generator_workers: int = 1,
+        qa_max_batch: int = 8,
+        qa_max_wait: float = 0.01,
+        cache_size: int = 256,
+        skip_qa_below_words: int = 0,
+    ):
+        self.generate_fn = generate_fn
+        self.qa_batch_fn = qa_batch_fn
+        self.qa_max_batch = qa_max_batch
+        self.qa_max_wait = qa_max_wait
+        self.cache_size = cache_size
+        self.skip_qa_below_words = skip_qa_below_words
+
+        self._generator_pool = ThreadPoolExecutor(
+            max_workers=generator_workers, thread_name_prefix="hf-generate"
+        )
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self._qa_queue = queue.Queue()
+        queue_depth.set_function(self.qa_queue_depth, queue="hf_sequential_qa")
+        threading.Thread(target=self._qa_loop, name="hf-qa", daemon=True).start()
+
+    # -------------------------
+    # Stage one: generation
+    # -------------------------
+    def _stage_one(self, query: str) -> Future:
+        with self._lock:
+            if query in self._cache:
+                self._cache.move_to_end(query)
+                done = Future()
+                done.set_result(self._cache[query])
+                return done
+
+            if query in self._inflight:
+                return self._inflight[query]
+
+            # run in the caller's context so its tracing spans nest under it
+            future = self._generator_pool.submit(
+                contextvars.copy_context().run, self.generate_fn, query
+            )
+            self._inflight[query] = future
+
+        future.add_done_callback(lambda f: self._remember(query, f))
+        return future
+
+    def _remember(self, query: str, future: Future):
+        with self._lock:
+            self._inflight.pop(query, None)
+            if future.exception() is not None or self.cache_size <= 0:
+                return
+            self._cache[query] = future.result()
+            self._cache.move_to_end(query)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # -------------------------
+    # Stage two: batched QA
+    # -------------------------
+    def _qa_loop(self):
+        while True:
+            batch = [self._qa_queue.get()]
+            deadline = time.monotonic() + self.qa_max_wait
+            while len(batch) < self.qa_max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._qa_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            questions = [question for question, _, _ in batch]
+            contexts = [context for _, context, _ in batch]
+            try:
+                answers = self.qa_batch_fn(contexts, questions)
+            except Exception as exc:
+                for _, _, result in batch:
+                    result.set_exception(exc)
+                continue
+
+            for (_, _, result), answer in zip(batch, answers):
+                result.set_result(answer)
+
+    def _to_stage_two(self, query: str, context_future: Future, result: Future):
+        if context_future.exception() is not None:
+            result.set_exception(context_future.exception())
+            return
+
+        context = context_future.result()
+        if not context.strip():
+            result.set_result("")
+        elif 0 < len(context.split()) <= self.skip_qa_below_words:
+            result.set_result(context)
+        else:
+            self._qa_queue.put((query, context, result))
+
+    def submit(self, query: str) -> Future:
+        result = Future()
+        self._stage_one(query).add_done_callback(
+            lambda f: self._to_stage_two(query, f, result)
+        )
+        return result
+
+    def qa_queue_depth(self) -> int:
+        return self._qa_queue.qsize()
+
+
+# Shared executor for /hf_sequential
+sequential_pipeline = CompositePipeline(
+    generate_text,
+    generate_qa_batch,
+    qa_max_batch=int(os.getenv("HF_SEQUENTIAL_QA_MAX_BATCH", "8")),
+    cache_size=int(os.getenv("HF_SEQUENTIAL_CACHE_SIZE", "256")),
+    skip_qa_below_words=int(os.getenv("HF_SEQUENTIAL_SKIP_QA_BELOW_WORDS", "0")),
+)
+
+
 def combine_generate_text(query:str) -> str:
-    context = generate_text(query)
-    qa_response = generate_qa(question=query, context=context)
-    return qa_response
\ No newline at end of file
+    with span("hf_sequential"):
+        return sequential_pipeline.submit(query).result()
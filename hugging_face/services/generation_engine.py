@@ -0,0 +1,341 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+import torch
+import torch.nn.functional as F
+from dotenv import load_dotenv
+from transformers import AutoModelForCausalLM, DynamicCache
+from ..services.model_precision import load_model, load_tokenizer
+from ..services.resource_scheduler import get_scheduler
+from ..services.stop_conditions import EARLY_STOP_REASONS, StopConditions, StopMatcher
+from observability.metrics import (
+    observe_stage,
+    queue_depth,
+    record_early_stop,
+    record_generation,
+)
+from observability.tracing import span
+
+# Load .env variables
+load_dotenv()
+
+hf_token = os.getenv("HF_TOKEN")
+
+
+class _Request:
+    def __init__(self, prompt_ids, max_new_tokens, temperature, future, stop):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.future = future
+        self.stop = stop  # StopMatcher
+        self.stop_reason: Optional[str] = None
+        self.generated: List[int] = []
+        self.started = time.perf_counter()
+
+    @property
+    def position(self) -> int:
+        # position id of the last token, the one fed to the next decode step
+        return len(self.prompt_ids) + len(self.generated) - 1
+
+
+class ContinuousBatchingEngine:
+    """
+    In-process generation engine with iteration-level scheduling.
+
+    A single scheduler thread owns the model and a running batch whose KV
+    cache is left-padded to a common length. At every decoding step new
+    requests are prefilled and merged into the batch, one token is decoded
+    for every running request, and finished requests leave the batch
+    immediately, so short answers don't wait for the longest one and the
+    batch never pads to the longest prompt of a fixed group.
+
+    Each request has its own max_new_tokens, temperature (0 = greedy) and
+    StopConditions (eos / <|im_end|>, stop strings, newline-after-text).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "Qwen/Qwen2.5-3B-Instruct",
+        max_batch_size: int = 8,
+        model=None,
+        tokenizer=None,
+        scheduler=None,
+    ):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.scheduler = scheduler or get_scheduler()
+
+        self.tokenizer = tokenizer or load_tokenizer(model_name, token=hf_token)
+        self.model = model or load_model(
+            AutoModelForCausalLM,
+            model_name,
+            os.getenv("QWEN_PRECISION", "fp32"),
+            token=hf_token,
+        )
+        self.model.eval()
+
+        # default stop conditions: eos and <|im_end|>
+        self.stop = StopConditions()
+
+        self._waiting = queue.Queue()
+        self._running: List[_Request] = []
+        self._cache: Optional[DynamicCache] = None
+        self._mask: Optional[torch.Tensor] = None
+
+        queue_depth.set_function(self.queue_depth, queue="generation_engine_waiting")
+        queue_depth.set_function(self.running, queue="generation_engine_running")
+
+        threading.Thread(
+            target=self._loop, name="generation-engine", daemon=True
+        ).start()
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 256,
+        temperature: float = 0.0,
+        stop: Optional[StopConditions] = None,
+    ) -> Future:
+        future = Future()
+        prompt_ids = self.tokenizer(prompt, add_special_tokens=False)["input_ids"]
+        if not prompt_ids:
+            future.set_exception(ValueError("Prompt cannot be empty."))
+            return future
+        future.prompt_tokens = len(prompt_ids)
+        matcher = StopMatcher(stop or self.stop, self.tokenizer)
+        self._waiting.put(
+            _Request(prompt_ids, max_new_tokens, temperature, future, matcher)
+        )
+        return future
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int = 256,
+        temperature: float = 0.0,
+        stop: Optional[StopConditions] = None,
+    ) -> str:
+        with span("generate", model=self.model_name) as trace_span:
+            future = self.submit(prompt, max_new_tokens, temperature, stop)
+            if trace_span is not None and hasattr(future, "prompt_tokens"):
+                trace_span.set_attribute("prompt_tokens", future.prompt_tokens)
+            return future.result()
+
+    def queue_depth(self) -> int:
+        return self._waiting.qsize()
+
+    def running(self) -> int:
+        return len(self._running)
+
+    # -------------------------
+    # Scheduler loop
+    # -------------------------
+    def _loop(self):
+        # runs on the interactive class's cores / torch threads, and every
+        # step counts as interactive work (batch embedding defers to it)
+        self.scheduler.bind_thread("interactive")
+        while True:
+            waiting = [] if self._running else [self._waiting.get()]
+
+            with self.scheduler.busy("interactive"):
+                for request in waiting:
+                    self._admit(request)
+
+                while len(self._running) < self.max_batch_size:
+                    try:
+                        self._admit(self._waiting.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if self._running:
+                    try:
+                        self._step()
+                    except Exception as exc:
+                        self._fail_running(exc)
+
+    def _fail_running(self, exc: Exception):
+        for request in self._running:
+            if not request.future.done():
+                request.future.set_exception(exc)
+        self._running = []
+        self._cache = self._mask = None
+
+    def _sample(self, logits: torch.Tensor, temperature: float) -> int:
+        if temperature <= 0:
+            return int(torch.argmax(logits))
+        probs = torch.softmax(logits.float() / temperature, dim=-1)
+        return int(torch.multinomial(probs, 1))
+
+    def _finished(self, request: _Request) -> bool:
+        request.stop_reason = request.stop.feed(request.generated[-1:])
+        return (
+            request.stop_reason is not None
+            or len(request.generated) >= request.max_new_tokens
+        )
+
+    def _resolve(self, request: _Request):
+        tokens = request.generated
+        record_generation(
+            self.model_name, len(tokens), time.perf_counter() - request.started
+        )
+        if request.stop_reason in EARLY_STOP_REASONS:
+            record_early_stop(
+                self.model_name,
+                request.stop_reason,
+                request.max_new_tokens - len(tokens),
+            )
+        if tokens and tokens[-1] in request.stop.stop_ids:
+            tokens = tokens[:-1]
+        text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+        request.future.set_result(request.stop.conditions.trim(text))
+
+    # -------------------------
+    # Prefill + merge
+    # -------------------------
+    @torch.inference_mode()
+    def _admit(self, request: _Request):
+        if request.future.cancelled():
+            return
+        try:
+            ids = torch.tensor([request.prompt_ids])
+            with observe_stage("prefill"):
+                out = self.model(input_ids=ids, use_cache=True)
+            request.generated.append(
+                self._sample(out.logits[0, -1], request.temperature)
+            )
+        except Exception as exc:
+            request.future.set_exception(exc)
+            return
+
+        if self._finished(request):
+            self._resolve(request)
+            return
+
+        new_cache = out.past_key_values
+        new_mask = torch.ones(1, ids.shape[1], dtype=torch.long)
+        if not self._running:
+            self._cache, self._mask = new_cache, new_mask
+        else:
+            self._cache, self._mask = self._merge(
+                self._cache, self._mask, new_cache, new_mask
+            )
+        self._running.append(request)
+
+    @staticmethod
+    def _left_pad(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+        missing = length - tensor.shape[dim]
+        if missing == 0:
+            return tensor
+        # F.pad takes (left, right) pairs starting from the last dimension
+        pad = [0, 0] * (tensor.dim() - 1 - dim) + [missing, 0]
+        return F.pad(tensor, pad)
+
+    def _merge(self, cache, mask, new_cache, new_mask):
+        length = max(mask.shape[1], new_mask.shape[1])
+        layers = []
+        for (k, v), (nk, nv) in zip(
+            cache.to_legacy_cache(), new_cache.to_legacy_cache()
+        ):
+            layers.append(
+                (
+                    torch.cat(
+                        [self._left_pad(k, length, 2), self._left_pad(nk, length, 2)]
+                    ),
+                    torch.cat(
+                        [self._left_pad(v, length, 2), self._left_pad(nv, length, 2)]
+                    ),
+                )
+            )
+        mask = torch.cat(
+            [self._left_pad(mask, length, 1), self._left_pad(new_mask, length, 1)]
+        )
+        return DynamicCache.from_legacy_cache(tuple(layers)), mask
+
+    # -------------------------
+    # Decode step + eviction
+    # -------------------------
+    @torch.inference_mode()
+    def _step(self):
+        batch = len(self._running)
+        input_ids = torch.tensor([[r.generated[-1]] for r in self._running])
+        position_ids = torch.tensor([[r.position] for r in self._running])
+        self._mask = torch.cat(
+            [self._mask, torch.ones(batch, 1, dtype=self._mask.dtype)], dim=1
+        )
+
+        with observe_stage("decode"):
+            out = self.model(
+                input_ids=input_ids,
+                attention_mask=self._mask,
+                position_ids=position_ids,
+                past_key_values=self._cache,
+                use_cache=True,
+            )
+        self._cache = out.past_key_values
+
+        keep = []
+        for row, request in enumerate(self._running):
+            request.generated.append(
+                self._sample(out.logits[row, -1], request.temperature)
+            )
+            if self._finished(request):
+                self._resolve(request)
+            else:
+                keep.append(row)
+
+        if len(keep) == batch:
+            return
+        if not keep:
+            self._running, self._cache, self._mask = [], None, None
+            return
+
+        self._running = [self._running[row] for row in keep]
+        index = torch.tensor(keep)
+        self._cache.batch_select_indices(index)
+        self._mask = self._mask[index]
+        self._trim_padding()
+
+    def _trim_padding(self):
+        # drop leading columns that are padding for every remaining row
+        # (left behind by a long request that just finished)
+        lead = int((self._mask.cumsum(dim=1) == 0).all(dim=0).sum())
+        if lead == 0:
+            return
+        layers = tuple(
+            (k[:, :, lead:, :], v[:, :, lead:, :])
+            for k, v in self._cache.to_legacy_cache()
+        )
+        self._cache = DynamicCache.from_legacy_cache(layers)
+        self._mask = self._mask[:, lead:]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(model=None, tokenizer=None) -> ContinuousBatchingEngine:
+    """
+    Process-wide engine shared by generate_text and GenerationService.
+
+    The first call creates it; pass the model / tokenizer of a Qwen pipeline
+    that is loaded anyway so the process holds one copy of the weights
+    (otherwise the engine loads its own).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ContinuousBatchingEngine(
+                model_name=os.getenv("QWEN_MODEL", "Qwen/Qwen2.5-3B-Instruct"),
+                max_batch_size=int(os.getenv("GENERATION_ENGINE_MAX_BATCH", "8")),
+                model=model,
+                tokenizer=tokenizer,
+            )
+        return _engine
@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+
+def _token_chunks(tokenizer, text: str, chunk_tokens: int, overlap: int) -> List[str]:
+    """Split text into pieces of at most `chunk_tokens` tokens (by offsets)."""
+    offsets = tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+    )["offset_mapping"]
+
+    chunks = []
+    start = 0
+    while start < len(offsets):
+        end = min(start + chunk_tokens, len(offsets))
+        chunks.append(text[offsets[start][0] : offsets[end - 1][1]])
+        if end == len(offsets):
+            break
+        start = end - overlap
+    return chunks
+
+
+def map_reduce_summarize(
+    summarizer,
+    text: str,
+    max_length: Optional[int] = None,
+    min_length: Optional[int] = None,
+    chunk_tokens: Optional[int] = None,
+    overlap: int = 64,
+    batch_size: int = 4,
+    max_rounds: int = 3,
+) -> str:
+    """
+    Summarize text longer than the model's input window.
+
+    map:    split into token chunks that fit the encoder and summarize them as
+            batches of `batch_size` (peak memory is one batch, not the document)
+    reduce: join the partial summaries and repeat until they fit in one window,
+            then produce the final summary with max_length / min_length
+
+    `summarizer` is a transformers "summarization" pipeline.
+    """
+    tokenizer = summarizer.tokenizer
+    window = min(
+        tokenizer.model_max_length,
+        getattr(summarizer.model.config, "max_position_embeddings", 1024),
+    ) - tokenizer.num_special_tokens_to_add(pair=False)
+    chunk_tokens = min(chunk_tokens or window, window)
+
+    final_kwargs = {"do_sample": False, "truncation": True}
+    if max_length is not None:
+        final_kwargs["max_length"] = max_length
+    if min_length is not None:
+        final_kwargs["min_length"] = min_length
+
+    for _ in range(max_rounds):
+        chunks = _token_chunks(tokenizer, text, chunk_tokens, overlap)
+        if len(chunks) <= 1:
+            break
+
+        partials = summarizer(
+            chunks, batch_size=batch_size, do_sample=False, truncation=True
+        )
+        text = "\n".join(p["summary_text"].strip() for p in partials)
+
+    summary = summarizer(text, **final_kwargs)
+    return summary[0]["summary_text"]
@@ -0,0 +1,137 @@
+import importlib.util
+import threading
+
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoModelForQuestionAnswering,
+    AutoModelForSeq2SeqLM,
+    AutoTokenizer,
+    pipeline,
+)
+from ..services.model_snapshot import find_snapshot, load_snapshot_model
+from ..services.stop_conditions import enable_stop_conditions
+from observability.metrics import instrument_generate, model_memory, tensor_bytes
+
+# fp32: default weights
+# bf16: bfloat16 weights and activations (halves memory, fast on AVX512-BF16/AMX)
+# int8: dynamic int8 quantization of every nn.Linear (weights int8, fp32 activations)
+# int4: weight-only int4 through torchao (only when torchao is installed)
+PRECISIONS = ("fp32", "bf16", "int8", "int4")
+
+TASK_MODEL_CLASSES = {
+    "text-generation": AutoModelForCausalLM,
+    "summarization": AutoModelForSeq2SeqLM,
+    "question-answering": AutoModelForQuestionAnswering,
+}
+
+
+def load_model(model_cls, model_name: str, precision: str = "fp32", **kwargs):
+    """
+    Load `model_name` with `model_cls.from_pretrained` in the given precision,
+    or memory-map it from MODEL_SNAPSHOT_DIR when a snapshot exists.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unsupported precision: {precision} (use one of {PRECISIONS})"
+        )
+
+    snapshot = find_snapshot(model_name, precision)
+    if snapshot:
+        model = load_snapshot_model(model_cls, snapshot)
+        if precision == "int8":
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    elif precision == "bf16":
+        model = model_cls.from_pretrained(model_name, dtype=torch.bfloat16, **kwargs)
+
+    elif precision == "int4":
+        if importlib.util.find_spec("torchao") is None:
+            raise RuntimeError("int4 precision needs torchao (pip install torchao).")
+        from torchao.dtypes import Int4CPULayout
+        from transformers import TorchAoConfig
+
+        model = model_cls.from_pretrained(
+            model_name,
+            dtype=torch.bfloat16,
+            quantization_config=TorchAoConfig(
+                "int4_weight_only", group_size=128, layout=Int4CPULayout()
+            ),
+            **kwargs,
+        )
+
+    else:
+        model = model_cls.from_pretrained(model_name, dtype=torch.float32, **kwargs)
+        if precision == "int8":
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    model.eval()
+    model_memory.set(tensor_bytes(model), model=model_name)
+    return model
+
+
+# Fast-tokenizer methods that use the Rust tokenizer. Encoding first switches
+# its truncation / padding mode in place, so any of these overlapping with an
+# encode on another thread fails with RuntimeError('Already borrowed').
+_RUST_TOKENIZER_METHODS = (
+    "_batch_encode_plus",
+    "_decode",
+    "convert_tokens_to_ids",
+    "convert_ids_to_tokens",
+    "num_special_tokens_to_add",
+)
+
+
+def thread_safe_tokenizer(tokenizer):
+    """
+    Serialize a fast tokenizer's calls with one lock, so the pipelines and
+    services sharing it (concurrent requests, map-reduce summaries) can call
+    it from any thread. Tokenizing is short next to the model forward, which
+    still runs concurrently.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        return tokenizer
+    lock = threading.RLock()
+
+    def locked(method):
+        def call(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+
+        return call
+
+    for name in _RUST_TOKENIZER_METHODS:
+        setattr(tokenizer, name, locked(getattr(tokenizer, name)))
+    return tokenizer
+
+
+def load_tokenizer(model_name: str, **kwargs):
+    """
+    Tokenizer from the model's snapshot if there is one, else the hub
+    (thread-safe, see thread_safe_tokenizer).
+    """
+    return thread_safe_tokenizer(
+        AutoTokenizer.from_pretrained(find_snapshot(model_name) or model_name, **kwargs)
+    )
+
+
+def load_pipeline(task: str, model_name: str, precision: str = "fp32", **kwargs):
+    """
+    Same as transformers.pipeline(task, model=model_name, **kwargs), with the
+    model loaded in `precision`. `token` and `trust_remote_code` are also used
+    for loading the model and tokenizer.
+    """
+    load_kwargs = {
+        key: kwargs[key] for key in ("token", "trust_remote_code") if key in kwargs
+    }
+    model = load_model(TASK_MODEL_CLASSES[task], model_name, precision, **load_kwargs)
+    tokenizer = load_tokenizer(model_name, **load_kwargs)
+    if task != "question-answering":
+        instrument_generate(model, model_name)
+    if task == "text-generation":
+        enable_stop_conditions(model, tokenizer, model_name)
+    return pipeline(task, model=model, tokenizer=tokenizer, **kwargs)
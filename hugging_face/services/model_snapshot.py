@@ -0,0 +1,273 @@
+"""
+Memory-mapped model snapshots.
+
+    python -m hugging_face.services.model_snapshot convert
+    python -m hugging_face.services.model_snapshot convert --task summarization \
+        --model facebook/bart-large-cnn --precision bf16
+    python -m hugging_face.services.model_snapshot list
+
+`convert` downloads a checkpoint once and writes it to MODEL_SNAPSHOT_DIR as
+safetensors in the dtype of the requested precision, together with its
+config and tokenizer. When MODEL_SNAPSHOT_DIR is set, load_model() builds the
+model on the meta device and assigns tensors that point straight into a
+private (copy-on-write) mmap of those files: nothing is copied into the
+worker's heap, every worker on the host shares the same page-cache pages and
+a restart only maps files that are already cached.
+
+int8 snapshots store fp32 weights and are quantized after mapping, which
+gives private copies again; int4 (torchao) has no snapshot form.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import sys
+from glob import glob
+from typing import Dict, Optional
+
+import torch
+from dotenv import load_dotenv
+from transformers import AutoConfig, AutoTokenizer, GenerationConfig
+from transformers.integrations.accelerate import init_empty_weights
+
+# Load .env variables
+load_dotenv()
+
+hf_token = os.getenv("HF_TOKEN")
+
+# Unset = snapshots off, models load from the HF cache as before
+snapshot_root = os.getenv("MODEL_SNAPSHOT_DIR")
+
+# Weight dtype stored for each precision (int4 has no snapshot form)
+SNAPSHOT_DTYPES = {
+    "fp32": torch.float32,
+    "bf16": torch.bfloat16,
+    "int8": torch.float32,
+}
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def snapshot_path(model_name: str, precision: str, root: Optional[str] = None) -> str:
+    dtype = str(SNAPSHOT_DTYPES[precision]).replace("torch.", "")
+    return os.path.join(root or snapshot_root, model_name.replace("/", "--"), dtype)
+
+
+def find_snapshot(
+    model_name: str, precision: Optional[str] = None, root: Optional[str] = None
+) -> Optional[str]:
+    """
+    Directory of a converted snapshot, or None. Without `precision` any dtype
+    of the model matches (enough for loading its tokenizer).
+    """
+    root = root or snapshot_root
+    if not root:
+        return None
+
+    if precision is None:
+        candidates = glob(os.path.join(root, model_name.replace("/", "--"), "*"))
+    elif precision in SNAPSHOT_DTYPES:
+        candidates = [snapshot_path(model_name, precision, root)]
+    else:
+        return None
+
+    for path in sorted(candidates):
+        if os.path.exists(os.path.join(path, "snapshot.json")):
+            return path
+    return None
+
+
+# -------------------------
+# Convert
+# -------------------------
+def convert_model(
+    model_cls,
+    model_name: str,
+    precision: str = "fp32",
+    root: Optional[str] = None,
+    **kwargs,
+) -> str:
+    """Write `model_name` as a snapshot in the dtype of `precision`."""
+    if precision not in SNAPSHOT_DTYPES:
+        raise ValueError(f"No snapshot format for precision: {precision}")
+    root = root or snapshot_root
+    if not root:
+        raise ValueError("Set MODEL_SNAPSHOT_DIR or pass a root directory.")
+
+    path = snapshot_path(model_name, precision, root)
+    staging = path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    model = model_cls.from_pretrained(
+        model_name, dtype=SNAPSHOT_DTYPES[precision], **kwargs
+    )
+    model.save_pretrained(staging, safe_serialization=True, max_shard_size="2GB")
+    AutoTokenizer.from_pretrained(model_name, **kwargs).save_pretrained(staging)
+
+    with open(os.path.join(staging, "snapshot.json"), "w") as f:
+        json.dump(
+            {
+                "model": model_name,
+                "architecture": type(model).__name__,
+                "dtype": str(SNAPSHOT_DTYPES[precision]).replace("torch.", ""),
+            },
+            f,
+        )
+
+    # swap the finished directory in; readers never see a partial snapshot
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    return path
+
+
+# -------------------------
+# Load
+# -------------------------
+def mmap_state_dict(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Tensors of every *.safetensors file in `path`, backed by a MAP_PRIVATE
+    mapping of the file instead of a heap copy.
+    """
+    state = {}
+    for file in sorted(glob(os.path.join(path, "*.safetensors"))):
+        with open(file, "rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+        header.pop("__metadata__", None)
+
+        storage = torch.UntypedStorage.from_file(
+            file, shared=False, nbytes=os.path.getsize(file)
+        )
+        raw = torch.empty(0, dtype=torch.uint8).set_(storage)
+        data_start = 8 + header_size
+
+        for name, info in header.items():
+            dtype = SAFETENSORS_DTYPES[info["dtype"]]
+            begin, end = info["data_offsets"]
+            chunk = raw[data_start + begin : data_start + end]
+            if (data_start + begin) % dtype.itemsize:
+                # a view needs aligned offsets; rare, so copy this one
+                chunk = chunk.clone()
+            state[name] = chunk.view(dtype).reshape(info["shape"])
+    return state
+
+
+def load_snapshot_model(model_cls, path: str):
+    """Build `model_cls` from a snapshot without copying its weights."""
+    config = AutoConfig.from_pretrained(path)
+    with init_empty_weights():
+        model = model_cls.from_config(config)
+
+    model.load_state_dict(mmap_state_dict(path), strict=False, assign=True)
+    model.tie_weights()
+
+    missing = [
+        name
+        for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+        if tensor.is_meta
+    ]
+    if missing:
+        raise RuntimeError(f"Snapshot {path} is missing weights: {missing[:5]}")
+
+    if os.path.exists(os.path.join(path, "generation_config.json")):
+        model.generation_config = GenerationConfig.from_pretrained(path)
+
+    model.eval()
+    return model
+
+
+# -------------------------
+# CLI
+# -------------------------
+def configured_models():
+    """(task, model, precision) for every model the services load."""
+    models = [
+        (
+            "text-generation",
+            os.getenv("QWEN_MODEL", "Qwen/Qwen2.5-3B-Instruct"),
+            os.getenv("QWEN_PRECISION", "fp32"),
+        ),
+        (
+            "summarization",
+            os.getenv("BART_MODEL", "facebook/bart-large-cnn"),
+            os.getenv("BART_PRECISION", "fp32"),
+        ),
+        (
+            "question-answering",
+            os.getenv("QA_MODEL", "deepset/roberta-base-squad2"),
+            "fp32",
+        ),
+    ]
+    if os.getenv("QWEN_DRAFT_MODEL"):
+        models.append(
+            (
+                "text-generation",
+                os.getenv("QWEN_DRAFT_MODEL"),
+                os.getenv("QWEN_PRECISION", "fp32"),
+            )
+        )
+    return models
+
+
+def main(argv=None):
+    from ..services.model_precision import TASK_MODEL_CLASSES
+
+    parser = argparse.ArgumentParser(prog="python -m " + __spec__.name)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="write snapshots")
+    convert.add_argument("--task", choices=sorted(TASK_MODEL_CLASSES))
+    convert.add_argument("--model")
+    convert.add_argument("--precision", default="fp32")
+    convert.add_argument("--root", default=snapshot_root)
+
+    listing = commands.add_parser("list", help="show converted snapshots")
+    listing.add_argument("--root", default=snapshot_root)
+
+    args = parser.parse_args(argv)
+    if not args.root:
+        parser.error("set MODEL_SNAPSHOT_DIR or pass --root")
+
+    if args.command == "list":
+        for meta in sorted(glob(os.path.join(args.root, "*", "*", "snapshot.json"))):
+            with open(meta) as f:
+                info = json.load(f)
+            print(f"{info['model']:<40}{info['dtype']:<10}{os.path.dirname(meta)}")
+        return
+
+    if args.model:
+        if not args.task:
+            parser.error("--task is required with --model")
+        targets = [(args.task, args.model, args.precision)]
+    else:
+        targets = configured_models()
+
+    for task, model_name, precision in targets:
+        if precision not in SNAPSHOT_DTYPES:
+            print(f"skip {model_name}: no snapshot format for {precision}")
+            continue
+        path = convert_model(
+            TASK_MODEL_CLASSES[task],
+            model_name,
+            precision,
+            root=args.root,
+            token=hf_token,
+        )
+        print(f"{model_name} ({precision}) -> {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,114 @@
 import os
+from typing import List, Optional
+import numpy as np
 from dotenv import load_dotenv
-from transformers import pipeline
+from ..services.model_precision import load_pipeline
+from observability.tracing import span
 
 # Load .env variables
 load_dotenv()
 
 hf_token = os.getenv("HF_TOKEN")
 
+# Model ids or local paths
+qa_model = os.getenv("QA_MODEL", "deepset/roberta-base-squad2")
+embeddings_model = os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2")
+
 # Load model once
-question_answer = pipeline(task="question-answering", model="deepset/roberta-base-squad2",token=hf_token)
+question_answer = load_pipeline("question-answering", qa_model, token=hf_token)
 
 def generate_qa(context: str,question: str) -> str:
-    qa_response = question_answer(question=question, context=context)
-    return qa_response["answer"]
\ No newline at end of file
+    with span("qa"):
+        qa_response = question_answer(question=question, context=context)
+    return qa_response["answer"]
+
+
+def generate_qa_batch(contexts: List[str], questions: List[str]) -> List[str]:
+    """Answer several (question, context) pairs in one batched pipeline call."""
+    with span("qa", batch_size=len(questions)):
+        qa_responses = question_answer(
+            question=questions, context=contexts, batch_size=len(questions)
+        )
+    # the pipeline unwraps single-item batches into a dict
+    if isinstance(qa_responses, dict):
+        qa_responses = [qa_responses]
+    return [response["answer"] for response in qa_responses]
+
+
+# Sentence embedder for window pre-filtering, loaded on first use
+_window_embedder = None
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    global _window_embedder
+    if _window_embedder is None:
+        from sentence_transformers import SentenceTransformer
+
+        _window_embedder = SentenceTransformer(embeddings_model, device="cpu")
+    return _window_embedder.encode(
+        texts, convert_to_numpy=True, normalize_embeddings=True
+    )
+
+
+def _context_windows(
+    context: str, question: str, window_tokens: int, stride: int
+) -> List[str]:
+    """Cut the context into overlapping windows that fit next to the question."""
+    tokenizer = question_answer.tokenizer
+    question_len = len(tokenizer(question, add_special_tokens=False)["input_ids"])
+    budget = (
+        window_tokens - question_len - tokenizer.num_special_tokens_to_add(pair=True)
+    )
+    if budget <= stride:
+        raise ValueError("Question is too long for the QA window size.")
+
+    offsets = tokenizer(
+        context, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+    )["offset_mapping"]
+
+    windows = []
+    start = 0
+    while start < len(offsets):
+        end = min(start + budget, len(offsets))
+        windows.append(context[offsets[start][0] : offsets[end - 1][1]])
+        if end == len(offsets):
+            break
+        start = end - stride
+    return windows
+
+
+def generate_qa_long(
+    context: str,
+    question: str,
+    top_windows: Optional[int] = None,
+    window_tokens: int = 384,
+    stride: int = 128,
+    max_batch: int = 64,
+) -> str:
+    """
+    Long-context QA: split the context into windows once, optionally keep only
+    the `top_windows` most similar to the question (embedding cosine), and
+    score all remaining windows in batched forward passes.
+    """
+    windows = _context_windows(context, question, window_tokens, stride)
+    if not windows:
+        return ""
+
+    if top_windows and len(windows) > top_windows:
+        vectors = _embed([question] + windows)
+        similarity = vectors[1:] @ vectors[0]
+        keep = sorted(np.argsort(-similarity)[:top_windows])
+        windows = [windows[i] for i in keep]
+
+    with span("qa", windows=len(windows)):
+        qa_responses = question_answer(
+            question=[question] * len(windows),
+            context=windows,
+            batch_size=min(len(windows), max_batch),
+            max_seq_len=window_tokens,
+        )
+    if isinstance(qa_responses, dict):
+        qa_responses = [qa_responses]
+
+    best = max(qa_responses, key=lambda response: response["score"])
+    return best["answer"]
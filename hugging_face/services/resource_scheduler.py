@@ -0,0 +1,398 @@
+"""
+Priority-aware CPU scheduler for model work.
+
+Each workload class runs on its own worker threads, pinned to the class's
+cores (os.sched_setaffinity on the worker thread) and with the class's torch
+intra-op thread count (torch keeps that count per thread), so a bulk ingest
+and interactive inference stop fighting over one thread pool.
+
+  interactive : query embeddings, /hf_generate and /ask generation
+                (the continuous-batching engine thread is bound to it too)
+  batch       : bulk embedding for /add, /embed-chunks and index rebuilds
+
+Batch work is cut into chunks. Before each chunk a batch worker waits (at
+most SCHED_BATCH_MAX_DEFER_MS) while a higher-priority class sharing any of
+its cores has work queued or running, so interactive requests go ahead of
+a long ingest instead of queueing behind it, and the ingest still advances.
+
+RESOURCE_SCHEDULER=priority starts the worker threads; otherwise tasks run
+inline on the calling thread as before and are only accounted for.
+Per-class utilization, queue depth and wait time are on /metrics and in
+snapshot().
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Dict, List, Optional, Set
+
+import torch
+from dotenv import load_dotenv
+
+from observability.metrics import REGISTRY, queue_depth
+
+# Load .env variables
+load_dotenv()
+
+busy_seconds = REGISTRY.counter(
+    "scheduler_busy_seconds_total",
+    "Seconds of model work run, by scheduler workload class.",
+    ("workload",),
+)
+wait_seconds = REGISTRY.histogram(
+    "scheduler_wait_seconds",
+    "Time tasks waited (queue and priority deferral) before running.",
+    ("workload",),
+)
+utilization = REGISTRY.gauge(
+    "scheduler_utilization",
+    "Busy fraction of each workload class's capacity over the utilization window.",
+    ("workload",),
+)
+active_tasks = REGISTRY.gauge(
+    "scheduler_active_tasks", "Tasks running, by workload class.", ("workload",)
+)
+
+# Workload class of the code running in this context (see workload())
+_workload: ContextVar[str] = ContextVar("workload", default="interactive")
+
+
+@contextmanager
+def workload(name: str):
+    """Run the enclosed model calls (e.g. embeddings) as workload `name`."""
+    token = _workload.set(name)
+    try:
+        yield
+    finally:
+        _workload.reset(token)
+
+
+def current_workload() -> str:
+    return _workload.get()
+
+
+def parse_cores(spec: Optional[str]) -> Optional[Set[int]]:
+    """'0-3,6' -> {0, 1, 2, 3, 6}; empty / None -> None (all cores)."""
+    if not spec:
+        return None
+    cores = set()
+    for part in spec.split(","):
+        start, _, stop = part.strip().partition("-")
+        cores.update(range(int(start), int(stop or start) + 1))
+    return cores
+
+
+def _host_cores() -> Set[int]:
+    try:
+        return set(os.sched_getaffinity(0))
+    except AttributeError:
+        return set(range(os.cpu_count() or 1))
+
+
+class WorkloadClass:
+    """
+    name       : "interactive", "batch", ...
+    priority   : lower runs first; a class defers to lower numbers
+    cores      : CPU ids its workers are pinned to (None = all)
+    threads    : torch intra-op threads of its workers
+    workers    : tasks of this class that run at the same time
+    chunk_size : items per task in map_chunks (None = one task)
+    max_defer  : seconds a task may wait for higher-priority work
+    """
+
+    def __init__(
+        self,
+        name: str,
+        priority: int,
+        cores: Optional[Set[int]] = None,
+        threads: Optional[int] = None,
+        workers: int = 1,
+        chunk_size: Optional[int] = None,
+        max_defer: float = 1.0,
+    ):
+        host = _host_cores()
+        if cores is not None:
+            cores = cores & host
+            if not cores:
+                raise ValueError(f"No usable cores for workload class {name!r}.")
+        self.name = name
+        self.priority = priority
+        self.cores = cores
+        self.threads = threads or len(cores or host)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_defer = max_defer
+
+        self.queue = deque()
+        self.active = 0
+        self.bound = 0
+        self.busy_total = 0.0
+        self.running: Dict[object, float] = {}
+        self.samples = deque()
+
+    def shares_cores(self, other: "WorkloadClass") -> bool:
+        if self.cores is None or other.cores is None:
+            return True
+        return bool(self.cores & other.cores)
+
+    @classmethod
+    def from_env(cls, name: str, priority: int, workers: int, **kwargs):
+        prefix = f"SCHED_{name.upper()}_"
+        threads = os.getenv(prefix + "THREADS")
+        return cls(
+            name,
+            priority=int(os.getenv(prefix + "PRIORITY", str(priority))),
+            cores=parse_cores(os.getenv(prefix + "CORES")),
+            threads=int(threads) if threads else None,
+            workers=int(os.getenv(prefix + "WORKERS", str(workers))),
+            **kwargs,
+        )
+
+
+class ResourceScheduler:
+    """
+    Runs model calls on per-class worker threads (enabled) or inline
+    (disabled), with priority deferral and utilization accounting.
+
+    run(name, fn, ...) executes one task and returns its result;
+    map_chunks(name, fn, items) runs fn over chunk_size slices, one task per
+    slice, so a higher-priority class can get in between slices.
+    """
+
+    def __init__(
+        self,
+        classes: List[WorkloadClass],
+        enabled: bool = True,
+        utilization_window: float = 60.0,
+    ):
+        self.classes = {cls.name: cls for cls in classes}
+        self.enabled = enabled
+        self.utilization_window = utilization_window
+
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._bind_lock = threading.Lock()
+        self._default_threads = torch.get_num_threads()
+
+        now = time.monotonic()
+        for cls in classes:
+            cls.samples.append((now, 0.0))
+            queue_depth.set_function(
+                lambda cls=cls: len(cls.queue), queue=f"scheduler_{cls.name}"
+            )
+            active_tasks.set_function(lambda cls=cls: cls.active, workload=cls.name)
+            utilization.set_function(
+                lambda cls=cls: self.utilization(cls.name), workload=cls.name
+            )
+
+        if enabled:
+            ready = threading.Barrier(sum(cls.workers for cls in classes) + 1)
+            for cls in classes:
+                for index in range(cls.workers):
+                    threading.Thread(
+                        target=self._worker,
+                        args=(cls, ready),
+                        name=f"scheduler-{cls.name}-{index}",
+                        daemon=True,
+                    ).start()
+            ready.wait()
+
+    # -------------------------
+    # Threads
+    # -------------------------
+    def bind_thread(self, name: str):
+        """
+        Pin the calling thread to class `name`'s cores and torch thread count
+        (used by worker threads and the generation engine thread).
+        """
+        cls = self.classes[name]
+        with self._cond:
+            cls.bound += 1
+        self._local.workload = cls
+        if not self.enabled:
+            return
+
+        if cls.cores is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cls.cores)  # 0 = this thread on Linux
+        with self._bind_lock:
+            # initialise this thread's OpenMP state first, or torch replaces
+            # the count with the process default on the first parallel op
+            torch.get_num_threads()
+            torch.set_num_threads(cls.threads)
+            # set_num_threads also changes the default new threads start
+            # with; put it back from a throwaway thread
+            restore = threading.Thread(target=self._restore_default_threads)
+            restore.start()
+            restore.join()
+
+    def _restore_default_threads(self):
+        torch.get_num_threads()
+        torch.set_num_threads(self._default_threads)
+
+    def _worker(self, cls: WorkloadClass, ready: threading.Barrier):
+        try:
+            self.bind_thread(cls.name)
+        finally:
+            ready.wait()
+        while True:
+            fn, args, kwargs, future, submitted = self._next_task(cls)
+            wait_seconds.observe(time.monotonic() - submitted, workload=cls.name)
+            if not future.set_running_or_notify_cancel():
+                self._finish(cls, None)
+                continue
+            token = object()
+            self._start(cls, token, counted=True)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                self._finish(cls, token)
+
+    # -------------------------
+    # Queueing
+    # -------------------------
+    def _pressure(self, cls: WorkloadClass) -> bool:
+        """Higher-priority work is queued or running on cores `cls` uses."""
+        return any(
+            other.priority < cls.priority
+            and cls.shares_cores(other)
+            and (other.queue or other.active)
+            for other in self.classes.values()
+        )
+
+    def _next_task(self, cls: WorkloadClass):
+        with self._cond:
+            while True:
+                while not cls.queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + cls.max_defer
+                while cls.queue and self._pressure(cls):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if cls.queue:
+                    cls.active += 1  # claimed under the lock, started by _start
+                    return cls.queue.popleft()
+
+    def _start(self, cls: WorkloadClass, token, counted: bool = False):
+        with self._cond:
+            if not counted:
+                cls.active += 1
+            cls.running[token] = time.monotonic()
+
+    def _finish(self, cls: WorkloadClass, token):
+        with self._cond:
+            cls.active -= 1
+            start = cls.running.pop(token, None)
+            if start is not None:
+                elapsed = time.monotonic() - start
+                cls.busy_total += elapsed
+                busy_seconds.inc(elapsed, workload=cls.name)
+            self._cond.notify_all()
+
+    @contextmanager
+    def busy(self, name: str):
+        """Account the enclosed block as running work of class `name`."""
+        cls = self.classes[name]
+        token = object()
+        self._start(cls, token)
+        try:
+            yield
+        finally:
+            self._finish(cls, token)
+
+    def run(self, name: str, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) as a task of class `name`; return its result."""
+        cls = self.classes[name]
+        # inline when disabled, and on scheduler threads (no nested queueing)
+        if not self.enabled or getattr(self._local, "workload", None) is not None:
+            with self.busy(name):
+                return fn(*args, **kwargs)
+
+        future = Future()
+        # run in the caller's context so tracing spans nest under its request
+        task = (copy_context().run, (fn, *args), kwargs, future, time.monotonic())
+        with self._cond:
+            cls.queue.append(task)
+            self._cond.notify_all()
+        return future.result()
+
+    def map_chunks(self, name: str, fn: Callable, items: list) -> list:
+        """[fn(chunk) for each chunk_size slice of items], one task per slice."""
+        size = self.classes[name].chunk_size
+        if not size or len(items) <= size:
+            return [self.run(name, fn, items)]
+        return [
+            self.run(name, fn, items[start : start + size])
+            for start in range(0, len(items), size)
+        ]
+
+    # -------------------------
+    # Stats
+    # -------------------------
+    def utilization(self, name: str) -> float:
+        """Average running tasks / capacity over the utilization window."""
+        cls = self.classes[name]
+        capacity = max((cls.workers if self.enabled else 0) + cls.bound, 1)
+        with self._cond:
+            now = time.monotonic()
+            busy = cls.busy_total + sum(now - start for start in cls.running.values())
+            cls.samples.append((now, busy))
+            while (
+                len(cls.samples) > 2
+                and cls.samples[1][0] <= now - self.utilization_window
+            ):
+                cls.samples.popleft()
+            then, busy_then = cls.samples[0]
+        if now - then <= 0:
+            return 0.0
+        return (busy - busy_then) / (now - then) / capacity
+
+    def snapshot(self) -> dict:
+        classes = {}
+        for name, cls in self.classes.items():
+            classes[name] = {
+                "priority": cls.priority,
+                "cores": sorted(cls.cores) if cls.cores is not None else None,
+                "threads": cls.threads,
+                "workers": cls.workers if self.enabled else 0,
+                "chunk_size": cls.chunk_size,
+                "queued": len(cls.queue),
+                "active": cls.active,
+                "busy_seconds": round(cls.busy_total, 3),
+                "utilization": round(self.utilization(name), 4),
+            }
+        return {"enabled": self.enabled, "classes": classes}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ResourceScheduler:
+    """Process-wide scheduler, configured from SCHED_* environment variables."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ResourceScheduler(
+                [
+                    WorkloadClass.from_env("interactive", priority=0, workers=4),
+                    WorkloadClass.from_env(
+                        "batch",
+                        priority=1,
+                        workers=1,
+                        chunk_size=int(os.getenv("SCHED_BATCH_CHUNK", "256")),
+                        max_defer=float(os.getenv("SCHED_BATCH_MAX_DEFER_MS", "1000"))
+                        / 1000,
+                    ),
+                ],
+                enabled=os.getenv("RESOURCE_SCHEDULER") == "priority",
+                utilization_window=float(os.getenv("SCHED_UTILIZATION_WINDOW", "60")),
+            )
+        return _scheduler
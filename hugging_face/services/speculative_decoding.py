@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from transformers import AutoModelForCausalLM
+from ..services.model_precision import load_model
+
+# Load .env variables
+load_dotenv()
+
+hf_token = os.getenv("HF_TOKEN")
+
+# Small model sharing Qwen2.5's tokenizer, e.g. "Qwen/Qwen2.5-0.5B-Instruct".
+# Unset = speculative decoding off.
+draft_model_name = os.getenv("QWEN_DRAFT_MODEL")
+
+_draft_model = None
+_draft_lock = threading.Lock()
+
+
+class SpeculativeStats:
+    """
+    Counters for assisted generation.
+
+    Every verification forward of the target model yields the accepted draft
+    tokens plus one of its own, so accepted = new tokens - target forwards,
+    and each draft forward proposes one token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.calls = 0
+        self.new_tokens = 0
+        self.target_forwards = 0
+        self.draft_forwards = 0
+        self.seconds = 0.0
+
+    def _counters(self):
+        if not hasattr(self._local, "target"):
+            self._local.target = 0
+            self._local.draft = 0
+        return self._local
+
+    def count_target(self, *_):
+        self._counters().target += 1
+
+    def count_draft(self, *_):
+        self._counters().draft += 1
+
+    def record(self, new_tokens, target_forwards, draft_forwards, seconds):
+        with self._lock:
+            self.calls += 1
+            self.new_tokens += new_tokens
+            self.target_forwards += target_forwards
+            self.draft_forwards += draft_forwards
+            self.seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            accepted = max(self.new_tokens - self.target_forwards, 0)
+            return {
+                "enabled": draft_model_name is not None,
+                "draft_model": draft_model_name,
+                "calls": self.calls,
+                "new_tokens": self.new_tokens,
+                "draft_tokens_proposed": self.draft_forwards,
+                "draft_tokens_accepted": accepted,
+                "acceptance_rate": (
+                    accepted / self.draft_forwards if self.draft_forwards else None
+                ),
+                "tokens_per_target_forward": (
+                    self.new_tokens / self.target_forwards
+                    if self.target_forwards
+                    else None
+                ),
+                "tokens_per_sec": (
+                    self.new_tokens / self.seconds if self.seconds else None
+                ),
+            }
+
+
+speculative_stats = SpeculativeStats()
+
+
+def load_draft_model():
+    """Load the draft model once; it is shared by every Qwen pipeline."""
+    global _draft_model
+    with _draft_lock:
+        if _draft_model is None:
+            # same precision as the target it drafts for
+            _draft_model = load_model(
+                AutoModelForCausalLM,
+                draft_model_name,
+                os.getenv("QWEN_PRECISION", "fp32"),
+                token=hf_token,
+            )
+            _draft_model.register_forward_hook(speculative_stats.count_draft)
+        return _draft_model
+
+
+def enable_speculative_decoding(text_pipeline):
+    """
+    Make every generate() call of this pipeline's model assisted by the draft
+    model (no-op when QWEN_DRAFT_MODEL is unset).
+
+    Greedy calls (do_sample=False) return exactly the target model's greedy
+    output; sampled calls keep the target's distribution.
+    """
+    if not draft_model_name:
+        return text_pipeline
+
+    model = text_pipeline.model
+    draft = load_draft_model()
+    model.register_forward_hook(speculative_stats.count_target)
+    generate = model.generate
+
+    def assisted_generate(*args, **kwargs):
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        # assisted generation only supports one sequence at a time
+        if input_ids is not None and input_ids.shape[0] > 1:
+            return generate(*args, **kwargs)
+        kwargs.setdefault("assistant_model", draft)
+
+        counters = speculative_stats._counters()
+        target_before, draft_before = counters.target, counters.draft
+        start = time.perf_counter()
+
+        output = generate(*args, **kwargs)
+
+        sequences = getattr(output, "sequences", output)
+        new_tokens = sequences.numel() - (
+            input_ids.numel() if input_ids is not None else 0
+        )
+        speculative_stats.record(
+            new_tokens,
+            counters.target - target_before,
+            counters.draft - draft_before,
+            time.perf_counter() - start,
+        )
+        return output
+
+    model.generate = assisted_generate
+    return text_pipeline
@@ -0,0 +1,195 @@
+"""
+Stop conditions for generation: end a sequence at <|im_end|> / eos, at the
+first of some stop strings, or at the first newline after some text (one-line
+answers such as titles), instead of running to max_new_tokens and trimming
+the text afterwards.
+
+StopConditions is a description (immutable, shared by every call of a
+route). Text-generation pipelines from load_pipeline accept it as a
+`stop_conditions=` call argument: enable_stop_conditions() turns it into a
+fresh StoppingCriteria per generate() call, so each row of a batch halts at
+its own first stop, and records the max_new_tokens budget left unused by
+stop-string / newline stops in generation_tokens_saved_total. The
+continuous-batching engine takes the same object (engine.generate(...,
+stop=...)).
+"""
+
+import json
+import os
+from typing import Iterable, List, Optional
+
+import torch
+from dotenv import load_dotenv
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from observability.metrics import record_early_stop
+
+# Load .env variables
+load_dotenv()
+
+CHAT_END = "<|im_end|>"
+# stops that cut generation short; eos / <|im_end|> end a sequence where it
+# would have ended anyway, so they save nothing
+EARLY_STOP_REASONS = frozenset({"stop_string", "newline"})
+
+
+class StopConditions:
+    """
+    strings         : stop at the first occurrence of any of these
+    token_ids       : extra stop token ids (eos and <|im_end|> always stop)
+    stop_at_newline : stop at the first newline after non-blank text
+    """
+
+    def __init__(
+        self,
+        strings: Iterable[str] = (),
+        token_ids: Iterable[int] = (),
+        stop_at_newline: bool = False,
+    ):
+        self.strings = tuple(s for s in strings if s)
+        self.token_ids = frozenset(token_ids)
+        self.stop_at_newline = stop_at_newline
+
+    def extend(self, strings: Optional[Iterable[str]]) -> "StopConditions":
+        """Same conditions plus more stop strings (e.g. from a request)."""
+        if not strings:
+            return self
+        return StopConditions(
+            self.strings + tuple(strings), self.token_ids, self.stop_at_newline
+        )
+
+    def stop_ids(self, tokenizer) -> set:
+        ids = set(self.token_ids)
+        ids.add(tokenizer.eos_token_id)
+        im_end = tokenizer.convert_tokens_to_ids(CHAT_END)
+        if isinstance(im_end, int) and im_end != tokenizer.unk_token_id:
+            ids.add(im_end)
+        ids.discard(None)
+        return ids
+
+    def match(self, text: str) -> Optional[str]:
+        """Reason the generated `text` should stop, if any."""
+        if any(s in text for s in self.strings):
+            return "stop_string"
+        if self.stop_at_newline and "\n" in text.lstrip():
+            return "newline"
+        return None
+
+    def trim(self, text: str) -> str:
+        """Cut generated text at its first stop (the stop itself is dropped)."""
+        cut = len(text)
+        for s in self.strings + (CHAT_END,):
+            index = text.find(s)
+            if index != -1:
+                cut = min(cut, index)
+        if self.stop_at_newline:
+            lead = len(text) - len(text.lstrip())
+            index = text.find("\n", lead)
+            if index != -1:
+                cut = min(cut, index)
+        return text[:cut].strip()
+
+
+class StopMatcher:
+    """
+    Follows one sequence token by token. Text is only decoded when there are
+    string / newline conditions; token-id stops are plain set lookups.
+    """
+
+    def __init__(self, conditions: StopConditions, tokenizer, stop_ids=None):
+        self.conditions = conditions
+        self.tokenizer = tokenizer
+        self.stop_ids = (
+            stop_ids if stop_ids is not None else conditions.stop_ids(tokenizer)
+        )
+        self.check_text = bool(conditions.strings) or conditions.stop_at_newline
+        self.tokens: List[int] = []
+
+    def feed(self, token_ids: List[int]) -> Optional[str]:
+        """Add new tokens; return the stop reason once the sequence is done."""
+        for token in token_ids:
+            self.tokens.append(token)
+            if token in self.stop_ids:
+                return "eos"
+        if self.check_text and token_ids:
+            text = self.tokenizer.decode(self.tokens, skip_special_tokens=True)
+            return self.conditions.match(text)
+        return None
+
+
+class StopCriteria(StoppingCriteria):
+    """Per-call criteria: one StopMatcher per batch row."""
+
+    def __init__(self, conditions: StopConditions, tokenizer, prompt_length: int):
+        self.conditions = conditions
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_ids = conditions.stop_ids(tokenizer)
+        self.matchers: List[StopMatcher] = []
+        self.stopped = {}  # row -> (new tokens, reason)
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores, **kwargs
+    ) -> torch.BoolTensor:
+        if not self.matchers:
+            self.matchers = [
+                StopMatcher(self.conditions, self.tokenizer, self.stop_ids)
+                for _ in range(input_ids.shape[0])
+            ]
+        done = []
+        for row, matcher in enumerate(self.matchers):
+            if row not in self.stopped:
+                # several tokens per call with assisted (speculative) decoding
+                start = self.prompt_length + len(matcher.tokens)
+                reason = matcher.feed(input_ids[row, start:].tolist())
+                if reason is not None:
+                    self.stopped[row] = (len(matcher.tokens), reason)
+            done.append(row in self.stopped)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    def record(self, model_name: str, max_new_tokens: Optional[int]):
+        if not max_new_tokens:
+            return
+        for new_tokens, reason in self.stopped.values():
+            if reason in EARLY_STOP_REASONS:
+                record_early_stop(model_name, reason, max_new_tokens - new_tokens)
+
+
+def _max_new_tokens(model, kwargs) -> Optional[int]:
+    if kwargs.get("max_new_tokens"):
+        return kwargs["max_new_tokens"]
+    config = kwargs.get("generation_config") or model.generation_config
+    return getattr(config, "max_new_tokens", None)
+
+
+def enable_stop_conditions(model, tokenizer, name: str):
+    """
+    Let model.generate() take `stop_conditions=StopConditions(...)` (passed
+    through by text-generation pipelines like any generate argument).
+    """
+    generate = model.generate
+
+    def generate_with_stops(*args, stop_conditions=None, **kwargs):
+        if stop_conditions is None:
+            return generate(*args, **kwargs)
+
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        criteria = StopCriteria(stop_conditions, tokenizer, input_ids.shape[-1])
+        kwargs["stopping_criteria"] = StoppingCriteriaList(
+            [*(kwargs.get("stopping_criteria") or []), criteria]
+        )
+        output = generate(*args, **kwargs)
+        criteria.record(name, _max_new_tokens(model, kwargs))
+        return output
+
+    model.generate = generate_with_stops
+    return model
+
+
+def route_stop_conditions(route: str, default: StopConditions) -> StopConditions:
+    """
+    Stop conditions of a route: `default`, plus the stop strings of the
+    STOP_STRINGS_<ROUTE> environment variable (a JSON list).
+    """
+    extra = os.getenv(f"STOP_STRINGS_{route.upper()}")
+    return default.extend(json.loads(extra) if extra else None)
@@ -1,16 +1,27 @@
 import os
 from dotenv import load_dotenv
-from transformers import pipeline
+from ..services.map_reduce_summary import map_reduce_summarize
+from ..services.model_precision import load_pipeline
 
 # Load .env variables
 load_dotenv()
 
 hf_token = os.getenv("HF_TOKEN")
 
+# Model id or local path
+bart_model = os.getenv("BART_MODEL", "facebook/bart-large-cnn")
+
+# fp32 (default) | bf16 | int8 | int4
+bart_precision = os.getenv("BART_PRECISION", "fp32")
+
 # Load model once
-summarizer = pipeline(task="summarization", model="facebook/bart-large-cnn",token=hf_token)
+summarizer = load_pipeline("summarization", bart_model, precision=bart_precision, token=hf_token)
+
+def generate_summary(text: str, long_document: bool = False) -> str:
+    if long_document:
+        # chunk -> batched partial summaries -> summary of summaries
+        return map_reduce_summarize(summarizer, text, max_length=50, min_length=25)
 
-def generate_summary(text: str) -> str:
     summary = summarizer(text, max_length=50, min_length=25, do_sample=False)
     return summary[0]["summary_text"]
 
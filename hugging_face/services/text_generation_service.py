@@ -1,27 +1,63 @@
 import os
+from typing import List, Optional
 from dotenv import load_dotenv
-from transformers import pipeline
+from ..services.model_precision import load_pipeline
+from ..services.speculative_decoding import enable_speculative_decoding
+from ..services.generation_engine import get_engine
+from ..services.resource_scheduler import get_scheduler
+from ..services.stop_conditions import StopConditions, route_stop_conditions
 
 # Load .env variables
 load_dotenv()
 
 hf_token = os.getenv("HF_TOKEN")
 
+# GENERATION_ENGINE=continuous shares one continuous-batching engine with the
+# RAG GenerationService instead of loading a private pipeline
+use_engine = os.getenv("GENERATION_ENGINE") == "continuous"
+
+# Model id or local path (e.g. a snapshot or a stand-in model for benchmarks)
+qwen_model = os.getenv("QWEN_MODEL", "Qwen/Qwen2.5-3B-Instruct")
+
+# fp32 (default) | bf16 | int8 | int4
+qwen_precision = os.getenv("QWEN_PRECISION", "fp32")
+
 # Load model once
-text_generation = pipeline(task="text-generation", model="Qwen/Qwen2.5-3B-Instruct",token=hf_token,trust_remote_code=True)
+if use_engine:
+    text_generation = None
+else:
+    text_generation = load_pipeline("text-generation", qwen_model, precision=qwen_precision, token=hf_token,trust_remote_code=True)
 
-def generate_text(query: str) -> str:
-    prompt = f"<|im_start|>user\n{query}<|im_end|>\n<|im_start|>assistant\n"
+    # Draft-model assisted decoding when QWEN_DRAFT_MODEL is set (greedy output unchanged)
+    enable_speculative_decoding(text_generation)
+
+# Stop at <|im_end|> / eos (plus STOP_STRINGS_HF_GENERATE) instead of running to max_new_tokens
+generate_stops = route_stop_conditions("hf_generate", StopConditions())
 
-    text_response = text_generation(
+def generate_text(query: str, stop: Optional[List[str]] = None) -> str:
+    prompt = f"<|im_start|>user\n{query}<|im_end|>\n<|im_start|>assistant\n"
+    stops = generate_stops.extend(stop)
+
+    if use_engine:
+        # engine returns only the new tokens, greedy like the pipeline call
+        return get_engine().generate(
+            prompt, max_new_tokens=100, temperature=0.0, stop=stops
+        )
+
+    # interactive class of the resource scheduler (inline unless enabled)
+    text_response = get_scheduler().run(
+        "interactive",
+        text_generation,
         prompt,
         max_new_tokens=100,
-        do_sample=False  # factual answers → deterministic
+        do_sample=False,  # factual answers → deterministic
+        stop_conditions=stops,
     )
 
     output = text_response[0]["generated_text"]
 
     # Remove the prompt part to keep only the model's answer
-    answer = output.split("<|im_start|>assistant\n")[-1].strip()
+    answer = output.split("<|im_start|>assistant\n")[-1]
 
-    return answer
+    # Drop the stop string the model ended on
+    return stops.trim(answer)
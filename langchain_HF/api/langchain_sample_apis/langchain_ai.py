@@ -1,11 +1,16 @@
 import os
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
-from ...schema.model_schema import TextGenRequest, SummarizeRequest, LLMChainRequest
+from ...schema.model_schema import (
+    TextGenRequest,
+    SummarizeRequest,
+    LLMChainRequest,
+    LLMChainBatchRequest,
+)
 from ...services.text_generation import generate_text
 from ...services.summarizer import summarize_text
-from ...services.simple_chain import generate_llm_chain_quote
-from ...services.sequential_chain import squential_chain
+from ...services.simple_chain import generate_llm_chain_quote, generate_llm_chain_quotes
+from ...services.sequential_chain import squential_chain, squential_chain_batch
 
 
 # Load .env variables
@@ -35,7 +40,7 @@ async def generate_text_api(request: TextGenRequest):
             status_code=403,
             detail="Invalid service code. Access denied.",
         )
-    result = generate_text(request.prompt)
+    result = generate_text(request.prompt, stop=request.stop)
     return {"response": result}
 
 
@@ -51,6 +56,7 @@ async def summarize_text_api(request: SummarizeRequest):
 
     - **text**: Input text to summarize
     - **service_token**: Authentication token for API access
+    - **long_document**: Summarize the whole text in chunks (map-reduce)
 
     Returns a concise summary of the input text.
     """
@@ -59,7 +65,7 @@ async def summarize_text_api(request: SummarizeRequest):
             status_code=403,
             detail="Invalid service code. Access denied.",
         )
-    result = summarize_text(request.text)
+    result = summarize_text(request.text, long_document=request.long_document)
     return {"summary": result}
 
 
@@ -99,3 +105,41 @@ async def sequential_llm_chain(request: LLMChainRequest):
         )
     result = squential_chain(request.topic)
     return {"quote": result}
+
+
+@router.post("/chain/batch")
+def simple_llm_chain_batch(request: LLMChainBatchRequest):
+    """
+    Generate one quote per topic with batched pipeline calls.
+
+    - **topics**: Topics to generate quotes about
+    - **service_token**: Authentication token for API access
+
+    Returns the quotes in the order of the topics.
+    """
+    if request.service_token != service_token:
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid service code. Access denied.",
+        )
+    results = generate_llm_chain_quotes(request.topics)
+    return {"quotes": results}
+
+
+@router.post("/sequential-chain/batch")
+def sequential_llm_chain_batch(request: LLMChainBatchRequest):
+    """
+    Summarize and title many texts; each chain stage runs as one batch.
+
+    - **topics**: Texts to summarize and title
+    - **service_token**: Authentication token for API access
+
+    Returns one result per text, in order.
+    """
+    if request.service_token != service_token:
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid service code. Access denied.",
+        )
+    results = squential_chain_batch(request.topics)
+    return {"quotes": results}
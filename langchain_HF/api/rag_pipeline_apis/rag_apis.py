@@ -1,18 +1,48 @@
 import os
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi import Form, File, UploadFile
 from typing import Optional
 import tempfile
+from itertools import islice
 from enum import Enum
-from ...schema.model_schema import AddOptions, QueryRequest, AskRequest
-from ...services.model_config import load_text_generation_model
+import numpy as np
+from ...schema.model_schema import (
+    AddOptions,
+    QueryRequest,
+    AskRequest,
+    RebuildRequest,
+)
+from ...services.model_config import generator, load_text_generation_model
 from ...rag_pipeline_services.loader_service import DocumentLoaderServices
 from ...rag_pipeline_services.splitter_service import DocumentSplitterService
 from ...rag_pipeline_services.embeddings_service import EmbeddingsService
+from ...rag_pipeline_services.corpus_cache_service import CorpusCacheService
 from ...rag_pipeline_services.vectorstore_service import ChromaVectorStoreService
+from ...rag_pipeline_services.quantized_vectorstore_service import (
+    QuantizedVectorStoreService,
+)
+from ...rag_pipeline_services.sharded_vectorstore_service import (
+    RebalanceInProgress,
+    ShardedVectorStoreService,
+)
 from ...rag_pipeline_services.retriever_service import RetrieverService
+from ...rag_pipeline_services.index_manager_service import (
+    IndexManagerService,
+    RebuildInProgress,
+)
+from ...rag_pipeline_services.metadata_filter import build_where
 from ...rag_pipeline_services.generation_query_service import GenerationService
+from hugging_face.services.generation_engine import get_engine
+from hugging_face.services.resource_scheduler import get_scheduler, workload
+from hugging_face.services.stop_conditions import StopConditions, route_stop_conditions
+from .response_formats import (
+    ResponseFormat,
+    jsonable_vectors,
+    ndjson_response,
+    npz_response,
+    text_arrays,
+)
 
 
 class FileType(str, Enum):
@@ -24,8 +54,8 @@ class FileType(str, Enum):
 # Load .env variables
 load_dotenv()
 
-# doc path
-docs_path = "Add your docs path here"
+# doc path (folder of PDFs used by the load / split / embed / add routes)
+docs_path = os.getenv("RAG_DOCS_PATH", "Add your docs path here")
 
 router = APIRouter()
 service_token = os.getenv("SERVICE_TOKEN")
@@ -33,62 +63,152 @@ service_token = os.getenv("SERVICE_TOKEN")
 # Initialize document loader service
 loader_service = DocumentLoaderServices()
 
-# Initialize document splitter service
-splitter_service = DocumentSplitterService()
+# Priority scheduler for model work (RESOURCE_SCHEDULER=priority pins the
+# interactive / batch classes to SCHED_<CLASS>_CORES and _THREADS)
+scheduler = get_scheduler()
 
 # Initialize embeddings service
+# EMBEDDINGS_BACKEND=torch (default) | onnx | onnx-int8; the onnx backends are
+# checked against torch at start-up unless EMBEDDINGS_PARITY_CHECK=false
+embeddings_parity = os.getenv("EMBEDDINGS_PARITY_TOLERANCE")
 embedder = EmbeddingsService(
-    model_name="all-MiniLM-L6-v2", device="cpu", normalize=True
+    model_name=os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2"),
+    device=os.getenv("EMBEDDINGS_DEVICE", "cpu"),
+    normalize=True,
+    backend=os.getenv("EMBEDDINGS_BACKEND", "torch"),
+    threads=int(os.getenv("EMBEDDINGS_THREADS", "0")) or None,
+    parity_check=os.getenv("EMBEDDINGS_PARITY_CHECK", "true").lower() != "false",
+    parity_tolerance=float(embeddings_parity) if embeddings_parity else None,
+    pool_workers=int(os.getenv("EMBEDDINGS_POOL_WORKERS", "0")),
+    scheduler=scheduler,
+)
+
+
+def embed_batch(documents, batch_size: int = 32):
+    """Bulk embedding as the scheduler's low-priority batch workload."""
+    with workload("batch"):
+        return embedder.embed_documents(documents, batch_size=batch_size)
+
+
+# Initialize document splitter service
+splitter_mode = os.getenv("SPLITTER_MODE", "recursive")
+splitter_service = DocumentSplitterService(
+    mode=splitter_mode,
+    workers=int(os.getenv("SPLITTER_WORKERS", "1")),
+    tokenizer=embedder.tokenizer if splitter_mode == "tokens" else None,
+    max_tokens=embedder.max_seq_length,
+)
+
+# Initialize corpus cache (parsed pages + chunks of docs_path, kept on disk)
+corpus = CorpusCacheService(
+    loader_service,
+    splitter_service,
+    cache_dir=os.getenv("CORPUS_CACHE_DIR", "corpus_cache"),
 )
 
 # Initialize vector store service
-chroma_store = ChromaVectorStoreService()
+# VECTOR_STORE=chroma (default) | int8 | float16 (compact quantized storage)
+# VECTOR_SHARDS>1 partitions it across that many shards (VECTOR_SHARD_BY=hash | source)
+# CHROMA_MODE=http: one shared Chroma server owns the index for all workers
+# (CHROMA_HOST / CHROMA_PORT, started by rag_pipeline_services.vectorstore_server)
+vector_store_type = os.getenv("VECTOR_STORE", "chroma")
+store_kwargs = {}
+if vector_store_type == "chroma" and os.getenv("CHROMA_MODE") == "http":
+    store_kwargs.update(
+        mode="http",
+        host=os.getenv("CHROMA_HOST"),
+        port=int(os.getenv("CHROMA_PORT", "8001")),
+    )
+if vector_store_type != "chroma":
+    store_kwargs["rescore_factor"] = int(os.getenv("VECTOR_STORE_RESCORE_FACTOR", "4"))
+vector_shards = int(os.getenv("VECTOR_SHARDS", "1"))
+if vector_shards > 1:
+    shard_dir = os.getenv("VECTOR_SHARD_DIR", "sharded_db")
+    # VECTOR_SHARDS sizes a new store; an existing (maybe rebalanced) layout wins
+    chroma_store = ShardedVectorStoreService(
+        persist_directory=shard_dir,
+        num_shards=(
+            None
+            if ShardedVectorStoreService.stored_layout(shard_dir)
+            else vector_shards
+        ),
+        shard_by=os.getenv("VECTOR_SHARD_BY"),
+        backend=vector_store_type,
+        **store_kwargs,
+    )
+elif vector_store_type == "chroma":
+    chroma_store = ChromaVectorStoreService(**store_kwargs)
+else:
+    chroma_store = QuantizedVectorStoreService(dtype=vector_store_type, **store_kwargs)
 
 # Initialize retriever service
 retriever = RetrieverService(embedder, chroma_store, k=5)
 
+# Initialize index manager (background rebuild + swap, /persist snapshots)
+index_manager = IndexManagerService(
+    chroma_store,
+    build_items=lambda: embed_batch(corpus.chunks(docs_path)),
+    snapshot_root=os.getenv("VECTOR_SNAPSHOT_DIR", "vector_snapshots"),
+    keep_snapshots=int(os.getenv("VECTOR_SNAPSHOT_KEEP", "3")),
+)
+
 
 # Initialize generation service
+# GENERATION_ENGINE=continuous: share one continuous-batching engine with /hf_generate
+# (built on the LangChain pipeline's Qwen weights, which the chain routes need anyway)
+engine = (
+    get_engine(model=generator.model, tokenizer=generator.tokenizer)
+    if os.getenv("GENERATION_ENGINE") == "continuous"
+    else None
+)
 llm = load_text_generation_model()
-gen_service = GenerationService(retriever, llm)
+# /ask halts at eos / <|im_end|> or when the model starts a new QUESTION: /
+# CONTEXT: section (STOP_STRINGS_ASK adds stop strings)
+ask_stops = route_stop_conditions("ask", StopConditions(["\nQUESTION:", "\nCONTEXT:"]))
+gen_service = GenerationService(
+    retriever, llm, engine=engine, scheduler=scheduler, stop_conditions=ask_stops
+)
 
 
 @router.get("/rag-document-loader")
 def load_documents():
     """Endpoint to load documents for RAG pipeline."""
-    docs = loader_service.load_pdfs_from_folder(docs_path)
+    # only the first page is read; the total comes from page counts
+    first = next(corpus.iter_pages(docs_path), None)
 
-    if not docs:
+    if first is None:
         return {"message": "No PDFs found in docs folder"}
 
     return {
-        "total_pages_loaded": len(docs),
-        "first_page_preview": docs[0].page_content[:300],
-        "metadata": docs[0].metadata,
+        "total_pages_loaded": corpus.page_count(docs_path),
+        "first_page_preview": first.page_content[:300],
+        "metadata": first.metadata,
     }
 
 
 @router.get("/split-pdfs")
 def split_pdfs():
-    docs = loader_service.load_pdfs_from_folder(docs_path)
-    chunks = splitter_service.split_documents(docs)
+    total_chunks = corpus.chunk_count(docs_path)
+    first = next(corpus.iter_chunks(docs_path), None)
+    if first is None:
+        return {"message": "No chunks created"}
 
     return {
-        "total_documents": len(docs),
-        "total_chunks": len(chunks),
-        "sample_chunk": chunks[0].page_content,
-        "metadata": chunks[0].metadata,
+        "total_documents": corpus.page_count(docs_path),
+        "total_chunks": total_chunks,
+        "sample_chunk": first.page_content,
+        "metadata": first.metadata,
     }
 
 
 @router.get("/embed-test")
 def embed_test():
-    docs = loader_service.load_pdfs_from_folder(docs_path)
-    chunks = splitter_service.split_documents(docs)
+    # the first 5 chunks only (usually from the first file)
+    chunks = list(islice(corpus.iter_chunks(docs_path), 5))
     if not chunks:
         return {"message": "no chunks"}
 
-    pairs = embedder.embed_documents(chunks[:5])
+    pairs = embedder.embed_documents(chunks)
     return {
         "embedded": len(pairs),
         "dim": len(pairs[0][0]),
@@ -98,18 +218,78 @@ def embed_test():
 
 
 @router.get("/embed-chunks")
-def embed_process():
-    # 1. Load PDFs
-    docs = loader_service.load_pdfs_from_folder(docs_path)
-
-    # 2. Split into chunks
-    chunks = splitter_service.split_documents(docs)
+def embed_process(
+    format: ResponseFormat = ResponseFormat.json,
+    cursor: int = Query(0, ge=0, description="index of the first chunk"),
+    limit: Optional[int] = Query(None, ge=1, description="chunks per page"),
+    batch_size: int = Query(64, ge=1, description="chunks embedded at a time"),
+):
+    """
+    Embeds chunks cursor .. cursor+limit (all when no limit) and returns them
+    as JSON, streamed NDJSON (a header line, then one line per chunk,
+    embedded `batch_size` at a time) or an .npz archive. `next_cursor` (the
+    X-Next-Cursor header for ndjson / npz) is null on the last page.
+    """
+    # 1-2. Parsed and split chunks come from the corpus cache
+    total_chunks = corpus.chunk_count(docs_path)
 
-    if not chunks:
+    if not total_chunks:
         return {"message": "No chunks created"}
 
-    # ⭐ Embed ALL chunks (change this to chunks[:5] if you want only 5)
-    embedded_pairs = embedder.embed_documents(chunks)
+    # 3. Select the page (only the files holding it are read)
+    stop = total_chunks if limit is None else min(cursor + limit, total_chunks)
+    page = corpus.chunk_page(docs_path, cursor, stop)
+    next_cursor = stop if stop < total_chunks else None
+    page_info = {
+        "total_chunks": total_chunks,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+    }
+    headers = {
+        "X-Total-Chunks": str(total_chunks),
+        "X-Next-Cursor": "" if next_cursor is None else str(next_cursor),
+    }
+
+    # 4a. NDJSON: embed and send batch by batch (memory bounded by batch_size)
+    if format == ResponseFormat.ndjson:
+
+        def records():
+            yield page_info
+            for offset in range(0, len(page), batch_size):
+                batch = page[offset : offset + batch_size]
+                with workload("batch"):
+                    vectors = embedder.embed_array([doc.page_content for doc in batch])
+                for index, (vector, doc) in enumerate(zip(vectors, batch)):
+                    yield {
+                        "index": cursor + offset + index,
+                        "embedding_vector": vector.tolist(),
+                        "vector_dimension": len(vector),
+                        "text": doc.page_content,
+                        "metadata": doc.metadata,
+                    }
+
+        return ndjson_response(records(), headers=headers)
+
+    # 4b. npz: one float32 matrix, no per-float JSON
+    if format == ResponseFormat.npz:
+        with workload("batch"):
+            vectors = embedder.embed_array(
+                [doc.page_content for doc in page], batch_size=batch_size
+            )
+        return npz_response(
+            {
+                "embeddings": vectors,
+                "indices": np.arange(cursor, stop, dtype=np.int64),
+                **text_arrays(
+                    [doc.page_content for doc in page], [doc.metadata for doc in page]
+                ),
+            },
+            filename=f"chunks_{cursor}_{stop}.npz",
+            headers=headers,
+        )
+
+    # 4c. JSON
+    embedded_pairs = embed_batch(page, batch_size=batch_size)
 
     # ⭐ Build full output
     results = []
@@ -124,47 +304,91 @@ def embed_process():
         )
 
     return {
-        "total_chunks": len(chunks),
+        **page_info,
         "total_embedded": len(results),
         "data": results,
     }
 
 
+def add_to_store(embedded_pairs):
+    try:
+        chroma_store.add_embeddings(embedded_pairs)
+    except RebalanceInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @router.post("/add", summary="Load PDFs, split, embed and add to ChromaDB")
 def add_all_to_chroma(opts: AddOptions):
     """
     Loads PDFs from `source_folder`, splits them, embeds chunks and adds to ChromaDB.
     Returns counts.
     """
-    # 1) load
-    docs = loader_service.load_pdfs_from_folder(docs_path)
-    if not docs:
+    # 1) load (parsed pages are cached per file)
+    if not corpus.pdf_files(docs_path):
         raise HTTPException(status_code=400, detail=f"No PDFs found in `{docs_path}`")
 
-    # 2) split
-    chunks = splitter_service.split_documents(docs)
+    # 2) split (cached per file and splitter configuration)
+    chunks = corpus.chunks(docs_path)
     if not chunks:
         raise HTTPException(status_code=500, detail="Splitter produced no chunks")
 
-    # 3) embed
-    embedded_pairs = embedder.embed_documents(chunks)
+    # 3) embed (batch priority: interactive requests go first)
+    embedded_pairs = embed_batch(chunks)
 
     # 4) add to chroma
-    chroma_store.add_embeddings(embedded_pairs)
+    add_to_store(embedded_pairs)
 
     return {
         "status": "ok",
         "source_folder": docs_path,
-        "pages_loaded": len(docs),
+        "pages_loaded": corpus.page_count(docs_path),
         "chunks_created": len(chunks),
         "items_added": len(embedded_pairs),
     }
 
 
+def search_response(meta: dict, results: dict, format: ResponseFormat, name: str):
+    """
+    Encode search results (ids / documents / metadatas / distances, plus
+    `embeddings` when requested) in the requested format.
+    """
+    if format == ResponseFormat.json:
+        return {**meta, "results": jsonable_vectors(results)}
+
+    vectors = results.get("embeddings")
+    if format == ResponseFormat.ndjson:
+
+        def records():
+            yield meta
+            for row, item_id in enumerate(results["ids"]):
+                record = {
+                    "id": item_id,
+                    "document": results["documents"][row],
+                    "metadata": results["metadatas"][row],
+                    "distance": results["distances"][row],
+                }
+                if vectors is not None:
+                    record["embedding"] = vectors[row].tolist()
+                yield record
+
+        return ndjson_response(records())
+
+    arrays = {
+        "ids": np.array(results["ids"], dtype=str),
+        "distances": np.asarray(results["distances"], dtype=np.float32),
+        **text_arrays(results["documents"], results["metadatas"]),
+    }
+    if vectors is not None:
+        arrays["embeddings"] = vectors
+    return npz_response(arrays, filename=f"{name}.npz")
+
+
 @router.post("/query", summary="Query ChromaDB with text")
-def query_chroma(req: QueryRequest):
+def query_chroma(req: QueryRequest, format: ResponseFormat = ResponseFormat.json):
     """
     Embed the query and search ChromaDB, returning documents, metadatas and distances.
+    format=npz returns them (and the chunk vectors, always included) as an
+    .npz archive; format=ndjson streams one result per line.
     """
     if not req.query or req.query.strip() == "":
         raise HTTPException(status_code=400, detail="Query text required")
@@ -176,16 +400,55 @@ def query_chroma(req: QueryRequest):
 
     q_vec = q_vec_list[0]
 
-    # 2) search chroma
-    results = chroma_store.search(q_vec, k=req.k)
+    # 2) search chroma (restricted to matching metadata when filters are given)
+    where = build_where(**req.filters.model_dump()) if req.filters else None
+    results = chroma_store.search(
+        q_vec,
+        k=req.k,
+        where=where,
+        include_embeddings=req.include_embeddings or format == ResponseFormat.npz,
+    )
 
-    return {"query": req.query, "k": req.k, "results": results}
+    meta = {"query": req.query, "k": req.k, "where": where}
+    return search_response(meta, results, format, name="query")
 
 
-@router.post("/persist", summary="Persist ChromaDB to disk")
+@router.post(
+    "/persist", summary="Snapshot the vector store to disk as a compacted copy"
+)
 def persist_chroma():
-    chroma_store.persist()
-    return {"status": "persisted"}
+    try:
+        snapshot = index_manager.persist()
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "persisted", **snapshot}
+
+
+@router.post(
+    "/rebuild",
+    status_code=202,
+    summary="Rebuild the index in the background and swap it in when valid",
+)
+def rebuild_index(req: RebuildRequest):
+    """
+    Builds a new collection with the given HNSW parameters while the current
+    one keeps serving, validates it and switches retrieval over atomically.
+    Poll /rebuild/{job_id} for progress.
+    """
+    try:
+        return index_manager.start_rebuild(**req.model_dump())
+    except RebuildInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/rebuild/{job_id}", summary="Status of a background rebuild")
+def rebuild_status(job_id: str):
+    job = index_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown rebuild job `{job_id}`")
+    return job
 
 
 @router.delete("/delete_all", summary="Delete entire Chroma collection")
@@ -199,33 +462,46 @@ def chroma_status():
     """
     Simple status: returns number of items currently in the collection (best-effort).
     """
-    try:
-        info = chroma_store.collection.count()
-        # chroma returns dict with 'count' depending on version; fallback
-        count = info if isinstance(info, int) else info.get("count", None)
-    except Exception:
-        # fallback: try retrieving collection metadata length
-        try:
-            count = len(chroma_store.collection.get()["ids"])
-        except Exception:
-            count = None
-
     return {
         "collection_name": chroma_store.collection_name,
         "persist_directory": chroma_store.persist_directory,
-        "count": count,
+        "count": chroma_store.count(),
+        "shard_counts": (
+            chroma_store.shard_counts()
+            if isinstance(chroma_store, ShardedVectorStoreService)
+            else None
+        ),
     }
 
 
 @router.post("/retrieve")
-def retrieve_chunks(req: QueryRequest):
-    result = retriever.retrieve(req.query, req.k)
-    return result
+def retrieve_chunks(req: QueryRequest, format: ResponseFormat = ResponseFormat.json):
+    where = build_where(**req.filters.model_dump()) if req.filters else None
+    include_embeddings = req.include_embeddings or format == ResponseFormat.npz
+    result = retriever.retrieve(
+        req.query, req.k, where=where, include_embeddings=include_embeddings
+    )
+    if format == ResponseFormat.json:
+        return jsonable_vectors(result)
+
+    contexts = result["results"]
+    results = {
+        "ids": [context["id"] for context in contexts],
+        "documents": [context["text"] for context in contexts],
+        "metadatas": [context["metadata"] for context in contexts],
+        "distances": [context["distance"] for context in contexts],
+    }
+    if include_embeddings:
+        results["embeddings"] = result["embeddings"]
+    return search_response(
+        {"query": result["query"], "k": result["k"]}, results, format, name="retrieve"
+    )
 
 
 @router.post("/ask")
 def ask(req: AskRequest):
-    return gen_service.generate_answer(req.prompt)
+    where = build_where(**req.filters.model_dump()) if req.filters else None
+    return gen_service.generate_answer(req.prompt, where=where, stop=req.stop)
 
 
 @router.post("/ask-from-document")
@@ -292,7 +568,7 @@ async def ask_from_document(
         # ---------------------------------------------------
         embedded_pairs = embedder.embed_documents(chunks)
 
-        chroma_store.add_embeddings(embedded_pairs)
+        add_to_store(embedded_pairs)
 
         # ---------------------------------------------------
         # 5. Retriever
@@ -303,7 +579,9 @@ async def ask_from_document(
         # 6. Generator (LLM)
         # ---------------------------------------------------
         llm = load_text_generation_model()
-        generator = GenerationService(retriever, llm)
+        generator = GenerationService(
+            retriever, llm, engine=engine, stop_conditions=ask_stops
+        )
 
         # ---------------------------------------------------
         # 7. Generate RAG answer
@@ -0,0 +1,67 @@
+"""
+Response encodings for the routes that return vectors.
+
+  - json   : the default JSON body (vectors as lists of floats)
+  - ndjson : one JSON object per line, streamed as it is produced
+  - npz    : numpy .npz archive (uncompressed): vectors as one float32
+             matrix, text / metadata as string arrays; read it with
+             np.load(io.BytesIO(response.content)) - no pickle needed
+"""
+
+import io
+import json
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from fastapi.responses import Response, StreamingResponse
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+
+
+class ResponseFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    npz = "npz"
+
+
+def ndjson_response(
+    records: Iterable[dict], headers: Optional[Dict[str, str]] = None
+) -> StreamingResponse:
+    """Stream `records` (a generator) as newline-delimited JSON."""
+    lines = (json.dumps(record) + "\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+
+
+def npz_response(
+    arrays: Dict[str, np.ndarray],
+    filename: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return Response(
+        content=buffer.getvalue(),
+        media_type=NPZ_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            **(headers or {}),
+        },
+    )
+
+
+def text_arrays(texts: List[str], metadatas: List[dict]) -> Dict[str, np.ndarray]:
+    """Unicode arrays for the text / metadata side of an .npz response."""
+    return {
+        "texts": np.array(texts, dtype=str),
+        "metadatas": np.array(
+            [json.dumps(metadata or {}) for metadata in metadatas], dtype=str
+        ),
+    }
+
+
+def jsonable_vectors(response: dict) -> dict:
+    """Convert an `embeddings` float32 array in `response` to lists for JSON."""
+    if isinstance(response.get("embeddings"), np.ndarray):
+        response = dict(response, embeddings=response["embeddings"].tolist())
+    return response
@@ -0,0 +1,270 @@
+# rag_pipeline_services/corpus_cache_service.py
+"""
+On-disk cache of the parsed and split corpus of a docs folder.
+
+Every PDF gets two gzip'd JSON-lines files in the cache directory, keyed by
+the file's path and content hash: its parsed pages, and its chunks for a
+splitter configuration (DocumentSplitterService.cache_key), so changing the
+splitter re-splits from cached pages without re-parsing. manifest.json maps
+each absolute path to its size / mtime / sha256 and page and chunk counts;
+documents keep the `source` the loader gives them (folder_path joined with
+the file name), as without the cache.
+
+A file is re-hashed only when its size or mtime changed, and re-parsed only
+when the hash changed too (touching a file costs one hash, not a parse).
+Everything is read lazily, file by file and line by line: iter_pages /
+iter_chunks with islice only open the files they need, and page_count()
+reads page counts from the manifest (or the PDF's page tree) without
+extracting any text.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from langchain.schema import Document
+from pypdf import PdfReader
+
+from observability.metrics import observe_stage
+
+from ..rag_pipeline_services.loader_service import DocumentLoaderServices
+from ..rag_pipeline_services.splitter_service import DocumentSplitterService
+
+
+class CorpusCacheService:
+    def __init__(
+        self,
+        loader: DocumentLoaderServices,
+        splitter: DocumentSplitterService,
+        cache_dir: str = "corpus_cache",
+    ):
+        """
+        loader    : parses PDFs that are not cached (or changed)
+        splitter  : splits pages that have no chunks for its cache_key yet
+        cache_dir : folder for the manifest and the gzip'd JSON-lines files
+        """
+        self.loader = loader
+        self.splitter = splitter
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._manifest_file = os.path.join(cache_dir, "manifest.json")
+        self._manifest: Dict[str, dict] = {}
+        if os.path.exists(self._manifest_file):
+            with open(self._manifest_file) as f:
+                self._manifest = json.load(f)
+
+        self._lock = threading.Lock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+
+    # -------------------------------------------------------
+    # FILES / MANIFEST
+    # -------------------------------------------------------
+    @staticmethod
+    def pdf_files(folder_path: str) -> List[str]:
+        return [
+            os.path.join(folder_path, name)
+            for name in sorted(os.listdir(folder_path))
+            if name.endswith(".pdf")
+        ]
+
+    @staticmethod
+    def _key(path: str) -> str:
+        """Manifest key: the same file under any relative spelling."""
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_file(self, entry: dict, kind: str) -> str:
+        return os.path.join(self.cache_dir, f"{entry['key']}.{kind}.jsonl.gz")
+
+    def _save_manifest(self):
+        tmp = self._manifest_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp, self._manifest_file)
+
+    def _file_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+
+    def _entry(self, path: str) -> Optional[dict]:
+        """
+        Manifest entry for `path` if its cached pages are still valid:
+        unchanged size and mtime, or a changed stat but the same content.
+        """
+        stat = os.stat(path)
+        entry = self._manifest.get(self._key(path))
+        if entry is None:
+            return None
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+
+        if self._sha256(path) != entry["sha256"]:
+            return None
+        # touched but identical: remember the new stat, keep the cache
+        with self._lock:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            self._save_manifest()
+        return entry
+
+    def _drop(self, entry: dict):
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(entry["key"] + "."):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    # -------------------------------------------------------
+    # JSON LINES
+    # -------------------------------------------------------
+    @staticmethod
+    def _write(path: str, documents: List[Document]):
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            for doc in documents:
+                f.write(
+                    json.dumps({"text": doc.page_content, "metadata": doc.metadata})
+                    + "\n"
+                )
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str, source: Optional[str] = None) -> Iterator[Document]:
+        """Documents of a cache file; `source` replaces the cached one."""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                metadata = record["metadata"]
+                if source is not None and "source" in metadata:
+                    # cached under another spelling of the same file
+                    metadata["source"] = source
+                yield Document(page_content=record["text"], metadata=metadata)
+
+    # -------------------------------------------------------
+    # PAGES
+    # -------------------------------------------------------
+    def _pages_entry(self, path: str) -> dict:
+        """Valid manifest entry for `path`, parsing and caching it if needed."""
+        entry = self._entry(path)
+        if entry is not None:
+            return entry
+
+        with self._file_lock(self._key(path)):
+            entry = self._entry(path)  # another request may have built it
+            if entry is not None:
+                return entry
+
+            stat = os.stat(path)
+            sha256 = self._sha256(path)
+            with observe_stage("load"):
+                pages = self.loader.load_pdf(path)
+
+            old = self._manifest.get(self._key(path))
+            if old is not None:
+                self._drop(old)
+            path_key = hashlib.sha256(self._key(path).encode("utf-8")).hexdigest()[:8]
+            entry = {
+                "key": f"{sha256[:16]}_{path_key}",
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+                "pages": len(pages),
+                "chunks": {},
+            }
+            self._write(self._entry_file(entry, "pages"), pages)
+            with self._lock:
+                self._manifest[self._key(path)] = entry
+                self._save_manifest()
+            return entry
+
+    def iter_pages(self, folder_path: str) -> Iterator[Document]:
+        """Pages of every PDF in the folder, file by file, from the cache."""
+        for path in self.pdf_files(folder_path):
+            entry = self._pages_entry(path)
+            yield from self._read(self._entry_file(entry, "pages"), source=path)
+
+    def pages(self, folder_path: str) -> List[Document]:
+        return list(self.iter_pages(folder_path))
+
+    def page_count(self, folder_path: str) -> int:
+        """Total pages without extracting text (manifest or the PDF page tree)."""
+        total = 0
+        for path in self.pdf_files(folder_path):
+            entry = self._entry(path)
+            total += entry["pages"] if entry else len(PdfReader(path).pages)
+        return total
+
+    # -------------------------------------------------------
+    # CHUNKS
+    # -------------------------------------------------------
+    def _chunks_entry(self, path: str) -> dict:
+        entry = self._pages_entry(path)
+        key = self.splitter.cache_key
+        if key in entry["chunks"]:
+            return entry
+
+        with self._file_lock(self._key(path)):
+            if key not in entry["chunks"]:
+                pages = list(self._read(self._entry_file(entry, "pages"), source=path))
+                chunks = self.splitter.split_documents(pages)
+                chunk_file = self._entry_file(entry, f"chunks-{self._key_hash(key)}")
+                self._write(chunk_file, chunks)
+                with self._lock:
+                    entry["chunks"][key] = len(chunks)
+                    self._save_manifest()
+        return entry
+
+    @staticmethod
+    def _key_hash(splitter_key: str) -> str:
+        return hashlib.sha256(splitter_key.encode("utf-8")).hexdigest()[:12]
+
+    def iter_chunks(self, folder_path: str) -> Iterator[Document]:
+        """Chunks of every PDF in the folder (current splitter), file by file."""
+        kind = f"chunks-{self._key_hash(self.splitter.cache_key)}"
+        for path in self.pdf_files(folder_path):
+            entry = self._chunks_entry(path)
+            yield from self._read(self._entry_file(entry, kind), source=path)
+
+    def chunks(self, folder_path: str) -> List[Document]:
+        return list(self.iter_chunks(folder_path))
+
+    def chunk_count(self, folder_path: str) -> int:
+        """Total chunks (splits files that have not been split yet)."""
+        key = self.splitter.cache_key
+        return sum(
+            self._chunks_entry(path)["chunks"][key]
+            for path in self.pdf_files(folder_path)
+        )
+
+    def chunk_page(self, folder_path: str, start: int, stop: int) -> List[Document]:
+        """
+        Chunks start .. stop, reading only the files that hold them (cached
+        chunk counts let earlier files be skipped without opening them).
+        """
+        key = self.splitter.cache_key
+        kind = f"chunks-{self._key_hash(key)}"
+        page, offset = [], 0
+        for path in self.pdf_files(folder_path):
+            if offset >= stop:
+                break
+            entry = self._chunks_entry(path)
+            count = entry["chunks"][key]
+            if offset + count > start:
+                page.extend(
+                    islice(
+                        self._read(self._entry_file(entry, kind), source=path),
+                        max(start - offset, 0),
+                        stop - offset,
+                    )
+                )
+            offset += count
+        return page
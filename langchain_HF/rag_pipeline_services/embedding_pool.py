@@ -0,0 +1,202 @@
+# rag_pipeline_services/embedding_pool.py
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from ..rag_pipeline_services.onnx_backend import host_threads
+
+
+class EmbeddingPoolError(RuntimeError):
+    """A worker failed, died or did not answer in time; encode in-process instead."""
+
+
+def _load_model(model_name: str, backend: str, threads: int, onnx_cache_dir: str):
+    if backend == "torch":
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(threads)
+        return SentenceTransformer(model_name_or_path=model_name, device="cpu")
+
+    from ..rag_pipeline_services.onnx_backend import load_onnx_model
+
+    return load_onnx_model(
+        model_name,
+        quantize=backend == "onnx-int8",
+        cache_dir=onnx_cache_dir,
+        threads=threads,
+    )
+
+
+def _worker(model_name, backend, threads, onnx_cache_dir, tasks, results):
+    try:
+        model = _load_model(model_name, backend, threads, onnx_cache_dir)
+    except Exception as exc:
+        results.put(("ready", repr(exc)))
+        return
+    results.put(("ready", None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        job_id, shm_name, shape, start, texts, batch_size = task
+        try:
+            # spawned workers share the parent's resource tracker, so the
+            # parent's unlink() is the only cleanup needed
+            shm = shared_memory.SharedMemory(name=shm_name)
+            out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            out[start : start + len(texts)] = model.encode(
+                texts,
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            )
+            del out
+            shm.close()
+            results.put((job_id, None))
+        except Exception as exc:
+            results.put((job_id, repr(exc)))
+
+
+class EmbeddingPool:
+    """
+    Keeps the embedding model loaded in N worker processes.
+
+    encode() shards the texts into contiguous slices, one per worker, and
+    each worker writes its vectors straight into a shared-memory float32
+    matrix at its slice offset, so results come back in input order without
+    pickling lists of floats.
+
+    Every worker answers on its own result queue (a worker killed while
+    writing to a shared queue would leave its lock held for the others).
+    Waiting is bounded by `start_timeout` / `task_timeout` and stops early
+    when the worker has died; replies are matched by job id, so a late
+    reply to a timed-out job is never taken for a newer one.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int,
+        workers: int,
+        backend: str = "torch",
+        threads_per_worker: Optional[int] = None,
+        onnx_cache_dir: str = "onnx_models",
+        start_timeout: float = 600.0,
+        task_timeout: float = 300.0,
+    ):
+        """
+        start_timeout : seconds to wait for every worker to load the model
+        task_timeout  : seconds to wait for the slices of one encode() call
+        """
+        self.dim = dim
+        self.workers = workers
+        self.task_timeout = task_timeout
+        threads = threads_per_worker or max(1, host_threads() // workers)
+
+        ctx = mp.get_context("spawn")
+        self._tasks = [ctx.Queue() for _ in range(workers)]
+        self._results = [ctx.Queue() for _ in range(workers)]
+        self._processes = [
+            ctx.Process(
+                target=_worker,
+                args=(model_name, backend, threads, onnx_cache_dir, tasks, results),
+                daemon=True,
+            )
+            for tasks, results in zip(self._tasks, self._results)
+        ]
+        for p in self._processes:
+            p.start()
+
+        try:
+            errors = self._wait("ready", workers, start_timeout)
+        except EmbeddingPoolError:
+            self.close()
+            raise
+        if any(errors):
+            self.close()
+            raise EmbeddingPoolError(f"Embedding pool failed to start: {errors}")
+
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        n = len(texts)
+        if n == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        shape = (n, self.dim)
+        shm = shared_memory.SharedMemory(create=True, size=n * self.dim * 4)
+        try:
+            with self._lock:
+                job_id = next(self._job_ids)
+                step = -(-n // self.workers)  # ceil
+                shards = 0
+                for w, start in enumerate(range(0, n, step)):
+                    self._tasks[w].put(
+                        (
+                            job_id,
+                            shm.name,
+                            shape,
+                            start,
+                            texts[start : start + step],
+                            batch_size,
+                        )
+                    )
+                    shards += 1
+
+                errors = self._wait(job_id, shards, self.task_timeout)
+                if any(errors):
+                    raise EmbeddingPoolError(f"Embedding pool worker failed: {errors}")
+
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _wait(self, job_id, replies: int, timeout: float) -> list:
+        """Errors (None = ok) of workers 0..replies-1 for `job_id`."""
+        deadline = time.monotonic() + timeout
+        errors = []
+        for results, process in zip(self._results[:replies], self._processes):
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise EmbeddingPoolError(
+                        f"Embedding pool timed out after {timeout}s "
+                        f"({len(errors)}/{replies} replies to job {job_id})"
+                    )
+                try:
+                    reply_id, error = results.get(timeout=min(remaining, 1.0))
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise EmbeddingPoolError(
+                            f"Embedding pool worker {process.pid} died "
+                            f"(exit code {process.exitcode})"
+                        )
+                    continue
+                # replies to an earlier, timed-out job are dropped
+                if reply_id == job_id:
+                    errors.append(error)
+                    break
+        return errors
+
+    def alive(self) -> bool:
+        return all(p.is_alive() for p in self._processes)
+
+    def close(self):
+        for q in self._tasks:
+            q.put(None)
+        for p in self._processes:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
@@ -1,8 +1,24 @@
 import os
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 from langchain.schema import Document
 import numpy as np
+from hugging_face.services.resource_scheduler import current_workload
+from observability.metrics import model_memory, observe_stage, tensor_bytes
+
+from ..rag_pipeline_services.embedding_pool import EmbeddingPool, EmbeddingPoolError
+from ..rag_pipeline_services.onnx_backend import load_onnx_model
+
+PARITY_SAMPLES = [
+    "Retrieval-augmented generation grounds answers in your documents.",
+    "What does the contract say about termination notice periods?",
+    "Quarterly revenue grew 12% year over year, driven by services.",
+    "a",
+    "The quick brown fox jumps over the lazy dog. " * 40,
+]
+
+# lowest accepted cosine similarity to torch is 1 - tolerance
+DEFAULT_PARITY_TOLERANCE = {"onnx": 1e-3, "onnx-int8": 2e-2}
 
 
 class EmbeddingsService:
@@ -11,6 +27,15 @@ class EmbeddingsService:
     - model_name: any sentence-transformers / HF model (e.g. "all-MiniLM-L6-v2")
     - device: "cpu" or "cuda"
     - normalize: whether to L2-normalize embeddings (common for some vector DBs)
+    - backend: "torch", "onnx" or "onnx-int8" (onnxruntime, dynamic int8 weights)
+    - threads: onnxruntime intra-op threads (default: CPUs available to us)
+    - parity_check: compare the onnx backends against the torch model at
+      start-up and fail if any cosine similarity is below 1 - tolerance
+    - parity_tolerance: that tolerance (default: DEFAULT_PARITY_TOLERANCE)
+    - pool_workers: if > 0, also load the model in that many worker processes
+      and encode batches of at least `pool_min_texts` texts across them
+    - scheduler: if set, encoding runs through this ResourceScheduler as the
+      caller's workload class (batch ingestion is split into chunks there)
     """
 
     def __init__(
@@ -19,10 +44,20 @@ class EmbeddingsService:
         device: str = "cpu",
         normalize: bool = False,
         hf_token_env: str = "HF_TOKEN",
+        backend: str = "torch",
+        threads: Optional[int] = None,
+        onnx_cache_dir: str = "onnx_models",
+        parity_check: bool = True,
+        parity_tolerance: Optional[float] = None,
+        pool_workers: int = 0,
+        pool_min_texts: int = 256,
+        scheduler=None,
     ):
         self.model_name = model_name
         self.device = device
         self.normalize = normalize
+        self.backend = backend
+        self.scheduler = scheduler
 
         # If you need to access private models, set HF token in environment before creating the model:
         hf_token = os.getenv(hf_token_env)
@@ -30,7 +65,84 @@ class EmbeddingsService:
             os.environ["HUGGINGFACEHUB_API_TOKEN"] = hf_token
 
         # Load the model (this downloads from HF if not cached)
-        self.model = SentenceTransformer(model_name_or_path=model_name, device=device)
+        if backend == "torch":
+            self.model = SentenceTransformer(
+                model_name_or_path=model_name, device=device
+            )
+            model_memory.set(tensor_bytes(self.model), model=model_name)
+        elif backend in ("onnx", "onnx-int8"):
+            if device != "cpu":
+                raise ValueError("The onnx backends run on CPU only.")
+            self.model = load_onnx_model(
+                model_name,
+                quantize=backend == "onnx-int8",
+                cache_dir=onnx_cache_dir,
+                threads=threads,
+            )
+            if parity_check:
+                self.check_parity(
+                    tolerance=(
+                        parity_tolerance
+                        if parity_tolerance is not None
+                        else DEFAULT_PARITY_TOLERANCE[backend]
+                    )
+                )
+        else:
+            raise ValueError(f"Unsupported embeddings backend: {backend}")
+
+        self.pool = None
+        self.pool_min_texts = pool_min_texts
+        if pool_workers > 0:
+            if device != "cpu":
+                raise ValueError("The embedding pool runs on CPU only.")
+            try:
+                self.pool = EmbeddingPool(
+                    model_name,
+                    dim=self.model.get_sentence_embedding_dimension(),
+                    workers=pool_workers,
+                    backend=backend,
+                    threads_per_worker=threads,
+                    onnx_cache_dir=onnx_cache_dir,
+                )
+            except EmbeddingPoolError as exc:
+                print(f"Embedding pool unavailable, encoding in-process: {exc}")
+
+    @property
+    def tokenizer(self):
+        """Tokenizer of the underlying model (used for token-aware splitting)."""
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        """Inputs longer than this many word-pieces are truncated by the model."""
+        return self.model.max_seq_length
+
+    def check_parity(
+        self, texts: Optional[List[str]] = None, tolerance: float = 1e-3
+    ) -> float:
+        """
+        Compare this model's embeddings with the reference PyTorch model.
+        Returns the lowest cosine similarity; raises if below 1 - tolerance.
+        """
+        texts = texts or PARITY_SAMPLES
+        reference = SentenceTransformer(
+            model_name_or_path=self.model_name, device="cpu"
+        )
+
+        expected = reference.encode(
+            texts, convert_to_numpy=True, normalize_embeddings=True
+        )
+        actual = self.model.encode(
+            texts, convert_to_numpy=True, normalize_embeddings=True
+        )
+        worst = float((expected * actual).sum(axis=1).min())
+
+        if worst < 1.0 - tolerance:
+            raise RuntimeError(
+                f"{self.backend} embeddings diverge from torch: "
+                f"min cosine similarity {worst:.5f} < {1.0 - tolerance:.5f}"
+            )
+        return worst
 
     def _maybe_normalize(self, vectors: np.ndarray) -> np.ndarray:
         if not self.normalize:
@@ -40,17 +152,57 @@ class EmbeddingsService:
         norms[norms == 0] = 1.0
         return vectors / norms
 
+    def _encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        with observe_stage("embed"):
+            if self.scheduler is None:
+                return self._encode_batch(texts, batch_size)
+            parts = self.scheduler.map_chunks(
+                current_workload(),
+                lambda chunk: self._encode_batch(chunk, batch_size),
+                texts,
+            )
+            return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _encode_batch(self, texts: List[str], batch_size: int) -> np.ndarray:
+        # large batches go to the worker pool, small ones (queries) stay local
+        pool = self.pool
+        if pool is not None and len(texts) >= self.pool_min_texts:
+            try:
+                return pool.encode(texts, batch_size=batch_size)
+            except EmbeddingPoolError as exc:
+                print(f"Embedding pool failed, encoding in-process: {exc}")
+                if not pool.alive():
+                    # a dead worker would fail every later batch too
+                    self.pool = None
+                    pool.close()
+
+        # SentenceTransformer handles batching internally; batch_size param passed through encode
+        return self.model.encode(
+            texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True
+        )
+
+    def close(self):
+        """Stop the worker pool, if any."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
     def embed_texts(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
         """
         Embed a list of strings and return list of python lists (vectors).
         """
-        # SentenceTransformer handles batching internally; batch_size param passed through encode
-        vectors = self.model.encode(
-            texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True
-        )
+        vectors = self._encode(texts, batch_size=batch_size)
         vectors = self._maybe_normalize(vectors)
         return [v.tolist() for v in vectors]
 
+    def embed_array(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embed a list of strings into one float32 array (no per-float Python
+        objects; used by the binary / streamed responses).
+        """
+        vectors = self._maybe_normalize(self._encode(texts, batch_size=batch_size))
+        return np.asarray(vectors, dtype=np.float32)
+
     def embed_documents(
         self, documents: List[Document], batch_size: int = 32
     ) -> List[Tuple[List[float], Document]]:
@@ -58,9 +210,7 @@ class EmbeddingsService:
         Embed a list of LangChain Documents. Returns list of (vector, document).
         """
         texts = [doc.page_content for doc in documents]
-        vectors = self.model.encode(
-            texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True
-        )
+        vectors = self._encode(texts, batch_size=batch_size)
         vectors = self._maybe_normalize(vectors)
         return [(vec.tolist(), doc) for vec, doc in zip(vectors, documents)]
 
@@ -0,0 +1,220 @@
+# rag_pipeline_services/fast_splitter.py
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional
+
+from langchain.schema import Document
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _piece_bounds(text: str, start: int, end: int, separators: List[str]):
+    """
+    Pick the first separator present in text[start:end] and return
+    (piece boundaries, remaining separators).
+
+    Boundaries are offsets into `text`; piece i is text[b[i]:b[i + 1]] and
+    starts with its separator, like keep_separator=True in LangChain.
+    """
+    for i, sep in enumerate(separators):
+        if sep == "":
+            # split into single characters, nothing left to recurse into
+            return list(range(start, end + 1)), []
+
+        step = len(sep)
+        pos = text.find(sep, start, end)
+        if pos == -1:
+            continue
+
+        bounds = [start]
+        while pos != -1:
+            if pos != start:
+                bounds.append(pos)
+            pos = text.find(sep, pos + step, end)
+        bounds.append(end)
+        return bounds, separators[i + 1 :]
+
+    # no separator matched and "" is not in the list: keep the span whole
+    return [start, end], []
+
+
+def _merge_spans(
+    text: str,
+    bounds: List[int],
+    lo: int,
+    hi: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    out: List[str],
+):
+    """
+    Merge consecutive pieces bounds[lo:hi + 1] into chunks.
+
+    Same sliding window as TextSplitter._merge_splits with an empty
+    separator, but on offsets: a window is always a contiguous run of
+    pieces, so a chunk is a single slice of the original text.
+    """
+    first = lo  # index of the first piece in the current window
+    total = 0
+    for j in range(lo, hi):
+        length = bounds[j + 1] - bounds[j]
+        if total + length > chunk_size:
+            if j > first:
+                chunk = text[bounds[first] : bounds[j]].strip()
+                if chunk:
+                    out.append(chunk)
+                while total > chunk_overlap or (
+                    total + length > chunk_size and total > 0
+                ):
+                    total -= bounds[first + 1] - bounds[first]
+                    first += 1
+        total += length
+
+    if hi > first:
+        chunk = text[bounds[first] : bounds[hi]].strip()
+        if chunk:
+            out.append(chunk)
+
+
+def _split_span(
+    text: str,
+    start: int,
+    end: int,
+    separators: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    out: List[str],
+):
+    bounds, new_separators = _piece_bounds(text, start, end, separators)
+
+    good_from = None  # first piece of the current run of small pieces
+    for j in range(len(bounds) - 1):
+        if bounds[j + 1] - bounds[j] < chunk_size:
+            if good_from is None:
+                good_from = j
+            continue
+
+        if good_from is not None:
+            _merge_spans(text, bounds, good_from, j, chunk_size, chunk_overlap, out)
+            good_from = None
+
+        if not new_separators:
+            out.append(text[bounds[j] : bounds[j + 1]])
+        else:
+            _split_span(
+                text,
+                bounds[j],
+                bounds[j + 1],
+                new_separators,
+                chunk_size,
+                chunk_overlap,
+                out,
+            )
+
+    if good_from is not None:
+        _merge_spans(
+            text, bounds, good_from, len(bounds) - 1, chunk_size, chunk_overlap, out
+        )
+
+
+def split_text(
+    text: str,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    separators: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Split one text into chunks, boundary-for-boundary identical to
+    RecursiveCharacterTextSplitter with default settings.
+    """
+    out: List[str] = []
+    if text:
+        _split_span(
+            text,
+            0,
+            len(text),
+            separators or DEFAULT_SEPARATORS,
+            chunk_size,
+            chunk_overlap,
+            out,
+        )
+    return out
+
+
+class FastRecursiveTextSplitter:
+    """
+    Offset-based drop-in for RecursiveCharacterTextSplitter.
+
+    Works on (start, end) offsets into the page text instead of slicing and
+    re-joining substrings, so every level of the recursion is a single
+    str.find pass and the only strings created are the final chunks.
+    Large corpora can be split across worker processes.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        separators: Optional[List[str]] = None,
+        workers: int = 1,
+        min_texts_per_worker: int = 64,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.workers = workers
+        self.min_texts_per_worker = min_texts_per_worker
+
+    def split_text(self, text: str) -> List[str]:
+        return split_text(text, self.chunk_size, self.chunk_overlap, self.separators)
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split many texts, fanning out to worker processes when the batch is
+        large enough to pay for the process start-up.
+        """
+        workers = min(self.workers, len(texts) // self.min_texts_per_worker)
+        if workers <= 1:
+            return [self.split_text(text) for text in texts]
+
+        fn = partial(
+            split_text,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=self.separators,
+        )
+        chunksize = max(1, len(texts) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fn, texts, chunksize=chunksize))
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Same output as TextSplitter.split_documents: one Document per chunk
+        with a copy of the source page metadata.
+        """
+        documents = list(documents)
+        split = self.split_texts([doc.page_content for doc in documents])
+
+        chunks = []
+        for doc, texts in zip(documents, split):
+            metadata = doc.metadata or {}
+            # loader metadata is flat (source, page, ...): a dict copy is as
+            # good as a deepcopy and far cheaper per chunk
+            if all(isinstance(v, _SCALARS) for v in metadata.values()):
+                copy_metadata = dict
+            else:
+                copy_metadata = copy.deepcopy
+            for text in texts:
+                chunks.append(
+                    Document(page_content=text, metadata=copy_metadata(metadata))
+                )
+        return chunks
@@ -2,6 +2,10 @@
 
 from typing import List, Dict, Any, Optional
 
+from hugging_face.services.stop_conditions import StopConditions
+from observability.metrics import observe_stage
+from observability.tracing import span
+
 
 class GenerationService:
     """
@@ -9,6 +13,11 @@ class GenerationService:
     Uses:
        retriever.retrieve(query, k)
        generator.invoke(prompt, **kwargs)   <-- matches your usage
+    or, when an engine is given:
+       engine.generate(prompt, max_new_tokens, temperature)  (continuous batching)
+    Pipeline calls run as interactive work of `scheduler` when one is given.
+    Generation halts at `stop_conditions` (default: eos / <|im_end|> and the
+    model starting a new QUESTION: / CONTEXT: section).
     """
 
     def __init__(
@@ -17,9 +26,17 @@ class GenerationService:
         generator_callable,  # MUST be your HuggingFacePipeline wrapper
         default_max_new_tokens: int = 256,
         default_temperature: float = 0.7,
+        engine=None,
+        scheduler=None,
+        stop_conditions: Optional[StopConditions] = None,
     ):
         self.retriever = retriever
         self.generator = generator_callable  # you supply load_text_generation_model()
+        self.engine = engine
+        self.scheduler = scheduler
+        self.stop_conditions = stop_conditions or StopConditions(
+            ["\nQUESTION:", "\nCONTEXT:"]
+        )
         self.default_max_new_tokens = default_max_new_tokens
         self.default_temperature = default_temperature
 
@@ -62,16 +79,19 @@ If the context does NOT contain the answer, then say ONLY: "I don't know."""
         k: int = 5,
         max_new_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None,
+        stop: Optional[List[str]] = None,
     ):
         if not query.strip():
             raise ValueError("Query cannot be empty.")
 
-        # 1. Retrieval
-        res = self.retriever.retrieve(query, k=k)
+        # 1. Retrieval (optionally restricted by metadata)
+        res = self.retriever.retrieve(query, k=k, where=where)
         retrieved = res.get("results", [])
 
         # 2. Build RAG Prompt
-        prompt = self._build_prompt(query, retrieved)
+        with observe_stage("prompt"):
+            prompt = self._build_prompt(query, retrieved)
 
         # 3. LLM settings
         gen_kwargs = {
@@ -79,11 +99,29 @@ If the context does NOT contain the answer, then say ONLY: "I don't know."""
             "temperature": temperature or self.default_temperature,
         }
 
-        # 4. Call HuggingFacePipeline.invoke(prompt, **kwargs)
-        raw_output = self.generator.invoke(prompt, **gen_kwargs)
-
-        # 5. Extract answer text
-        answer = self._extract_answer(raw_output)
+        stops = self.stop_conditions.extend(stop)
+
+        # 4. Call the shared engine, or HuggingFacePipeline.invoke(prompt, pipeline_kwargs=...)
+        #    (HuggingFacePipeline only forwards pipeline_kwargs to the pipeline)
+        with span("llm", prompt_chars=len(prompt)):
+            if self.engine is not None:
+                raw_output = self.engine.generate(prompt, **gen_kwargs, stop=stops)
+            else:
+                pipeline_kwargs = {**gen_kwargs, "stop_conditions": stops}
+                if self.scheduler is not None:
+                    raw_output = self.scheduler.run(
+                        "interactive",
+                        self.generator.invoke,
+                        prompt,
+                        pipeline_kwargs=pipeline_kwargs,
+                    )
+                else:
+                    raw_output = self.generator.invoke(
+                        prompt, pipeline_kwargs=pipeline_kwargs
+                    )
+
+        # 5. Extract answer text (without the stop it ended on)
+        answer = stops.trim(self._extract_answer(raw_output))
 
         return {
             "query": query,
@@ -0,0 +1,441 @@
+# rag_pipeline_services/index_manager_service.py
+"""
+Blue-green index management and snapshots for the vector store.
+
+A rebuild never touches the collection that is serving queries: a new
+collection (`<base>_<timestamp>`) is filled in a background thread with the
+requested HNSW parameters, validated (item count, recall@k of sampled
+queries against exact search) and only then made active through
+ChromaVectorStoreService.activate(), which swaps the active-collection
+pointer file with os.replace. Retrieval keeps answering from the old
+collection until that moment; the previous `keep_previous` collections are
+kept for rollback and older ones dropped.
+
+/add calls made while a rebuild runs still land in the old collection. Before
+the swap (and once more right after it, for writers that picked up the old
+collection just before) every item of the old collection with
+`ingested_at >= <build start>` is copied into the new one; the last copy
+before activate() holds the store's add lock, so adds from this process
+cannot fall between the copy and the swap. Every other write of the
+rebuild (creating the collection, each add batch, dropping collections)
+also takes that lock, one step at a time, so persist() never compacts or
+copies the files halfway through one.
+
+Job records and the one-rebuild-at-a-time rule are shared by every worker
+using the same persist_directory: jobs are written to
+`rebuild_jobs/<job_id>.json` and a running rebuild holds `rebuild.lock`
+(taken with O_EXCL, released when the job ends; a lock left behind by a
+process that died on this host is taken over).
+
+persist() asks the store for a compacted, consistent copy into
+`<snapshot_root>/<timestamp>` (written to a .tmp directory first) and keeps
+the newest `keep_snapshots`.
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from observability.tracing import span
+
+from ..rag_pipeline_services.vectorstore_service import ChromaVectorStoreService
+
+
+class RebuildInProgress(RuntimeError):
+    pass
+
+
+FINISHED = ("done", "failed")
+
+
+class IndexManagerService:
+    def __init__(
+        self,
+        store,
+        build_items: Callable[[], List],
+        snapshot_root: str = "vector_snapshots",
+        keep_snapshots: int = 3,
+        keep_previous: int = 1,
+        add_batch_size: int = 1000,
+    ):
+        """
+        store          : the store serving queries (rebuilds need a Chroma store)
+        build_items    : returns [(vector, Document)] for the configured docs
+        snapshot_root  : folder holding /persist snapshots
+        keep_snapshots : snapshots kept (oldest removed first)
+        keep_previous  : inactive collections kept for rollback after a swap
+        add_batch_size : items per add() while filling a new collection
+        """
+        self.store = store
+        self.build_items = build_items
+        self.snapshot_root = snapshot_root
+        self.keep_snapshots = keep_snapshots
+        self.keep_previous = keep_previous
+        self.add_batch_size = add_batch_size
+
+        self.jobs: Dict[str, dict] = {}
+        # job files and the rebuild lock live next to active_collection.json
+        self.state_dir = getattr(store, "persist_directory", None)
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        # one rebuild at a time, off the request threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rebuild")
+
+    # -------------------------------------------------------
+    # REBUILD
+    # -------------------------------------------------------
+    def start_rebuild(
+        self,
+        source: str = "documents",
+        ef_construction: int = 200,
+        m: int = 16,
+        ef_search: Optional[int] = None,
+        min_recall: float = 0.9,
+        sample_queries: int = 50,
+        k: int = 5,
+    ) -> dict:
+        """
+        Queue a rebuild and return its job record.
+        source: "documents" (load / split / embed the docs folder again) or
+                "collection" (re-index the active collection's vectors)
+        """
+        if not isinstance(self.store, ChromaVectorStoreService):
+            raise ValueError(
+                "Rebuilds need the Chroma store (VECTOR_STORE=chroma, no shards)"
+            )
+        if source not in ("documents", "collection"):
+            raise ValueError(f"Unsupported rebuild source: {source}")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "source": source,
+            "hnsw": {
+                "hnsw:space": "cosine",
+                "hnsw:construction_ef": ef_construction,
+                "hnsw:M": m,
+                **({"hnsw:search_ef": ef_search} if ef_search else {}),
+            },
+            "validation": {
+                "min_recall": min_recall,
+                "sample_queries": sample_queries,
+                "k": k,
+            },
+            "collection": None,
+            "previous_collection": None,
+            "items": 0,
+            "added": 0,
+            "replayed": 0,
+            "recall": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._acquire(job["job_id"])
+            self.jobs[job["job_id"]] = job
+            self._save(job)
+
+        self._executor.submit(self._rebuild, job)
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job:
+            return dict(job)
+        # started by another worker
+        return self._load(job_id)
+
+    # -------------------------------------------------------
+    # SHARED JOB STATE
+    # -------------------------------------------------------
+    def _path(self, *names) -> str:
+        return os.path.join(self.state_dir, *names)
+
+    def _save(self, job: dict):
+        path = self._path("rebuild_jobs", f"{job['job_id']}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        if self.state_dir is None or not job_id.isalnum():
+            return None
+        try:
+            with open(self._path("rebuild_jobs", f"{job_id}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _acquire(self, job_id: str):
+        """Take rebuild.lock for `job_id`; RebuildInProgress if a live job holds it."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        lock = self._path("rebuild.lock")
+        owner = {"job_id": job_id, "pid": os.getpid(), "host": socket.gethostname()}
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._lock_holder()
+                if holder is not None:
+                    raise RebuildInProgress(
+                        f"Rebuild {holder['job_id']} is still running"
+                    )
+                # stale lock: its job finished or its process is gone
+                try:
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump(owner, f)
+            return
+        raise RebuildInProgress("Another worker is starting a rebuild")
+
+    def _lock_holder(self) -> Optional[dict]:
+        """Owner of rebuild.lock while its job is still running, else None."""
+        try:
+            with open(self._path("rebuild.lock")) as f:
+                holder = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            # being written by another worker right now
+            return {"job_id": "(starting)"}
+
+        job = self._load(holder["job_id"])
+        if job is not None and job["status"] in FINISHED:
+            return None
+        if holder.get("host") == socket.gethostname():
+            try:
+                os.kill(holder["pid"], 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+        return holder
+
+    def _release(self, job_id: str):
+        lock = self._path("rebuild.lock")
+        try:
+            with open(lock) as f:
+                mine = json.load(f)["job_id"] == job_id
+            if mine:
+                os.remove(lock)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _rebuild(self, job: dict):
+        store = self.store
+        # adds from here on may miss the source; they are replayed before the swap
+        build_start = time.time()
+        old = store.collection
+        # millisecond timestamp: names sort by age (see _drop_old_collections)
+        now = time.time()
+        stamp = time.strftime("%Y%m%d%H%M%S", time.localtime(now))
+        name = f"{store.base_collection_name}_{stamp}{int(now * 1000) % 1000:03d}"
+        job["collection"] = name
+        try:
+            job["status"] = "building"
+            self._save(job)
+            if job["source"] == "collection":
+                # items added since build_start come in through the replay
+                items = [
+                    (vector, doc)
+                    for vector, doc in store.iter_items(batch_size=self.add_batch_size)
+                    if doc.metadata.get("ingested_at", 0) < build_start
+                ]
+            else:
+                items = self.build_items()
+            if not items:
+                raise ValueError("Nothing to index")
+            job["items"] = len(items)
+
+            with store._add_lock:
+                collection = store.client.create_collection(
+                    name=name, metadata=job["hnsw"]
+                )
+            ingested_at = time.time()
+            for start in range(0, len(items), self.add_batch_size):
+                batch = items[start : start + self.add_batch_size]
+                with store._add_lock:
+                    collection.add(
+                        ids=[f"id_{start + i}" for i in range(len(batch))],
+                        embeddings=[vector for vector, _ in batch],
+                        metadatas=[
+                            {"ingested_at": ingested_at, **(doc.metadata or {})}
+                            for _, doc in batch
+                        ],
+                        documents=[doc.page_content for _, doc in batch],
+                    )
+                job["added"] = start + len(batch)
+                self._save(job)
+
+            job["status"] = "validating"
+            self._save(job)
+            job["recall"] = self._validate(collection, items, **job["validation"])
+
+            replayed = set()
+            self._replay(job, old, collection, build_start, replayed)
+            previous = store.collection_name
+            with store._add_lock:
+                self._replay(job, old, collection, build_start, replayed)
+                store.activate(name)
+            # adds that picked up the old collection just before the swap
+            self._replay(job, old, collection, build_start, replayed)
+            job["previous_collection"] = previous
+            job["status"] = "done"
+            self._drop_old_collections(active=name)
+        except Exception as error:
+            job["status"] = "failed"
+            job["error"] = str(error)
+            if store.collection_name != name:
+                try:
+                    with store._add_lock:
+                        store.client.delete_collection(name)
+                except Exception:
+                    pass
+        finally:
+            job["finished_at"] = time.time()
+            self._save(job)
+            self._release(job["job_id"])
+
+    def _replay(self, job: dict, old, collection, since: float, replayed: set):
+        """
+        Copy the items added to `old` since `since` (and not copied yet)
+        into `collection`, keeping their metadata.
+        """
+        offset = 0
+        while True:
+            page = old.get(
+                where={"ingested_at": {"$gte": since}},
+                include=["embeddings", "documents", "metadatas"],
+                limit=self.add_batch_size,
+                offset=offset,
+            )
+            if not page["ids"]:
+                return
+            offset += len(page["ids"])
+
+            fresh = [
+                i for i, item_id in enumerate(page["ids"]) if item_id not in replayed
+            ]
+            if not fresh:
+                continue
+            with self.store._add_lock:
+                # same id scheme as add_embeddings in persistent mode
+                start = collection.count()
+                collection.add(
+                    ids=[f"id_{start + n}" for n in range(len(fresh))],
+                    embeddings=[page["embeddings"][i] for i in fresh],
+                    metadatas=[page["metadatas"][i] for i in fresh],
+                    documents=[page["documents"][i] for i in fresh],
+                )
+            replayed.update(page["ids"][i] for i in fresh)
+            job["replayed"] = len(replayed)
+
+    def _validate(self, collection, items, min_recall, sample_queries, k) -> float:
+        """
+        recall@k of HNSW against exact cosine search for sampled stored
+        vectors; raises when the count or recall is off.
+        """
+        count = collection.count()
+        if count != len(items):
+            raise ValueError(f"Collection holds {count} items, expected {len(items)}")
+
+        with span("rebuild.validate", samples=sample_queries):
+            vectors = np.asarray([vector for vector, _ in items], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+
+            rng = np.random.default_rng(0)
+            sample = rng.choice(
+                len(items), size=min(sample_queries, len(items)), replace=False
+            )
+            k = min(k, len(items))
+
+            queries = vectors[sample]
+            exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+            found = collection.query(
+                query_embeddings=queries.tolist(), n_results=k, include=[]
+            )["ids"]
+
+        hits = sum(
+            len({f"id_{i}" for i in truth} & set(ids))
+            for truth, ids in zip(exact, found)
+        )
+        recall = hits / (len(sample) * k)
+        if recall < min_recall:
+            raise ValueError(f"recall@{k} {recall:.3f} is below {min_recall}")
+        return round(recall, 4)
+
+    def _drop_old_collections(self, active: str):
+        """Keep the active collection and the newest `keep_previous` others."""
+        base = self.store.base_collection_name
+        names = [
+            collection.name
+            for collection in self.store.client.list_collections()
+            if collection.name == base or collection.name.startswith(f"{base}_")
+        ]
+        # rebuilt names carry a timestamp; the base collection is the oldest
+        inactive = sorted(
+            (name for name in names if name != active),
+            key=lambda name: (name != base, name),
+            reverse=True,
+        )
+        for name in inactive[self.keep_previous :]:
+            with self.store._add_lock:
+                self.store.client.delete_collection(name)
+
+    # -------------------------------------------------------
+    # SNAPSHOT
+    # -------------------------------------------------------
+    def persist(self) -> dict:
+        """Compacted, consistent snapshot of the store; returns its path and sizes."""
+        with self._persist_lock:
+            os.makedirs(self.snapshot_root, exist_ok=True)
+            target = os.path.join(self.snapshot_root, time.strftime("%Y%m%d-%H%M%S"))
+            if os.path.exists(target):
+                target += f"-{uuid.uuid4().hex[:6]}"
+            tmp = target + ".tmp"
+
+            start = time.perf_counter()
+            try:
+                details = self.store.persist(tmp)
+            except Exception:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            os.replace(tmp, target)
+
+            snapshots = sorted(
+                entry.path
+                for entry in os.scandir(self.snapshot_root)
+                if entry.is_dir() and not entry.name.endswith(".tmp")
+            )
+            for old in (
+                snapshots[: -self.keep_snapshots] if self.keep_snapshots > 0 else []
+            ):
+                shutil.rmtree(old, ignore_errors=True)
+
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(target)
+            for name in files
+        )
+        return {
+            "snapshot": target,
+            "snapshot_bytes": size,
+            "seconds": round(time.perf_counter() - start, 3),
+            **details,
+        }
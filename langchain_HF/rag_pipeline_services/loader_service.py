@@ -7,6 +7,8 @@ from langchain_community.document_loaders import (
     WebBaseLoader,
 )
 
+from observability.metrics import observe_stage
+
 
 class DocumentLoaderServices:
     """Service class for loading documents from various sources."""
@@ -49,7 +51,8 @@ class DocumentLoaderServices:
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
 
-        return loader.load()
+        with observe_stage("load"):
+            return loader.load()
 
     def load_pdfs_from_folder(self, folder_path: str):
         """Load all PDF documents from the specified folder.
@@ -60,13 +63,21 @@ class DocumentLoaderServices:
         Returns:
             list: A list of loaded documents.
         """
+        with observe_stage("load"):
+            return self._load_pdfs(folder_path)
+
+    def _load_pdfs(self, folder_path: str):
         all_documents = []
         for filename in os.listdir(folder_path):
             if filename.endswith(".pdf"):
                 file_path = os.path.join(folder_path, filename)
-                # Use PyPDFLoader to load the PDF file
-                loader = PyPDFLoader(file_path)
-                # load documents from the PDF
-                docs = loader.load()
-                all_documents.extend(docs)
+                all_documents.extend(self.load_pdf(file_path))
         return all_documents
+
+    @staticmethod
+    def load_pdf(file_path: str) -> List[Document]:
+        """Parse one PDF into one Document per page."""
+        # Use PyPDFLoader to load the PDF file
+        loader = PyPDFLoader(file_path)
+        # load documents from the PDF
+        return loader.load()
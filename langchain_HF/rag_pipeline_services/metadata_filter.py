@@ -0,0 +1,151 @@
+# rag_pipeline_services/metadata_filter.py
+
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Filters use Chroma's `where` syntax so the same dict works for both stores:
+#   {"source": "a.pdf"}, {"page": {"$gte": 2}}, {"$and": [...]}, {"$or": [...]}
+# operators: $eq $ne $gt $gte $lt $lte $in $nin
+
+NUMERIC_OPS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+def _timestamp(value: Union[datetime, float, int, None]) -> Optional[float]:
+    if value is None:
+        return None
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+def build_where(
+    source: Union[str, List[str], None] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    ingested_after: Union[datetime, float, None] = None,
+    ingested_before: Union[datetime, float, None] = None,
+) -> Optional[dict]:
+    """
+    Chroma `where` clause for the common filters (None when no filter is set).
+    Pages are compared with the stored `page` metadata (0-based for PDFs);
+    ingest times with `ingested_at` (epoch seconds, set by add_embeddings).
+    """
+    conditions = []
+    if isinstance(source, str):
+        conditions.append({"source": source})
+    elif source:
+        conditions.append({"source": {"$in": list(source)}})
+    if page_from is not None:
+        conditions.append({"page": {"$gte": page_from}})
+    if page_to is not None:
+        conditions.append({"page": {"$lte": page_to}})
+    if ingested_after is not None:
+        conditions.append({"ingested_at": {"$gte": _timestamp(ingested_after)}})
+    if ingested_before is not None:
+        conditions.append({"ingested_at": {"$lte": _timestamp(ingested_before)}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+class MetadataIndex:
+    """
+    In-memory secondary index over record metadata.
+
+    Numbers go into a (rows, values) column per key, everything else into an
+    inverted index value -> rows. rows() evaluates a `where` clause against
+    the index only and returns the matching row numbers, so vector scoring
+    can be limited to that subset.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._numeric: Dict[str, tuple] = {}
+        self._values: Dict[str, Dict[str, array]] = {}
+
+    def add(self, row: int, metadata: Optional[dict]):
+        for key, value in (metadata or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                rows, values = self._numeric.setdefault(key, (array("q"), array("d")))
+                rows.append(row)
+                values.append(float(value))
+            elif isinstance(value, (str, bool)):
+                self._values.setdefault(key, {}).setdefault(
+                    str(value), array("q")
+                ).append(row)
+        self._count = max(self._count, row + 1)
+
+    # -------------------------
+    # Evaluation
+    # -------------------------
+    def rows(self, where: dict) -> np.ndarray:
+        """Sorted row numbers matching `where`."""
+        if "$and" in where or "$or" in where:
+            op = "$and" if "$and" in where else "$or"
+            parts = [self.rows(clause) for clause in where[op]]
+            combine = np.intersect1d if op == "$and" else np.union1d
+            result = parts[0]
+            for part in parts[1:]:
+                result = combine(result, part)
+            return result
+
+        parts = [self._field_rows(key, cond) for key, cond in where.items()]
+        result = parts[0]
+        for part in parts[1:]:
+            result = np.intersect1d(result, part)
+        return result
+
+    def _field_rows(self, key: str, condition) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        result = None
+        for op, operand in condition.items():
+            rows = self._apply(key, op, operand)
+            result = rows if result is None else np.intersect1d(result, rows)
+        return result
+
+    def _has_key(self, key: str) -> np.ndarray:
+        parts = []
+        if key in self._numeric:
+            parts.append(np.frombuffer(self._numeric[key][0], dtype=np.int64))
+        for rows in self._values.get(key, {}).values():
+            parts.append(np.frombuffer(rows, dtype=np.int64))
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, np.int64)
+
+    def _equal(self, key: str, operand) -> np.ndarray:
+        if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+            if key not in self._numeric:
+                return np.empty(0, np.int64)
+            rows, values = self._numeric[key]
+            rows = np.frombuffer(rows, dtype=np.int64)
+            return np.sort(rows[np.frombuffer(values) == float(operand)])
+        rows = self._values.get(key, {}).get(str(operand))
+        if rows is None:
+            return np.empty(0, np.int64)
+        return np.frombuffer(rows, dtype=np.int64).copy()
+
+    def _apply(self, key: str, op: str, operand) -> np.ndarray:
+        if op == "$eq":
+            return self._equal(key, operand)
+        if op == "$in":
+            parts = [self._equal(key, value) for value in operand]
+            return np.unique(np.concatenate(parts)) if parts else np.empty(0, np.int64)
+        if op == "$ne":
+            return np.setdiff1d(self._has_key(key), self._equal(key, operand))
+        if op == "$nin":
+            return np.setdiff1d(self._has_key(key), self._apply(key, "$in", operand))
+        if op in NUMERIC_OPS:
+            if key not in self._numeric:
+                return np.empty(0, np.int64)
+            rows, values = self._numeric[key]
+            mask = NUMERIC_OPS[op](np.frombuffer(values), float(operand))
+            return np.sort(np.frombuffer(rows, dtype=np.int64)[mask])
+        raise ValueError(f"Unsupported filter operator: {op}")
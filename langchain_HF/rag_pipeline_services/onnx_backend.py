@@ -0,0 +1,92 @@
+# rag_pipeline_services/onnx_backend.py
+
+import os
+import platform
+from typing import Optional
+
+from sentence_transformers import SentenceTransformer
+
+
+def host_threads() -> int:
+    """CPUs this process may run on (respects taskset / cgroup affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def quantization_config_for_host() -> str:
+    """
+    Pick the onnxruntime dynamic-quantization preset matching this CPU.
+    """
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+
+    flags = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = line
+                    break
+    except OSError:
+        pass
+
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def _session_options(threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def load_onnx_model(
+    model_name: str,
+    quantize: bool = False,
+    cache_dir: str = "onnx_models",
+    threads: Optional[int] = None,
+) -> SentenceTransformer:
+    """
+    Load `model_name` as a SentenceTransformer running on onnxruntime.
+
+    The first call exports the model to ONNX (and, with quantize=True, a
+    dynamic int8 copy for this host's instruction set) under `cache_dir`;
+    later calls load the exported files directly.
+    """
+    export_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+    file_name = "onnx/model_qint8.onnx" if quantize else "onnx/model.onnx"
+
+    if not os.path.exists(os.path.join(export_dir, "onnx", "model.onnx")):
+        exported = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        exported.save_pretrained(export_dir)
+
+    if quantize and not os.path.exists(os.path.join(export_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(export_dir, backend="onnx", device="cpu"),
+            quantization_config=quantization_config_for_host(),
+            model_name_or_path=export_dir,
+            file_suffix="qint8",
+        )
+
+    return SentenceTransformer(
+        export_dir,
+        backend="onnx",
+        device="cpu",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": _session_options(threads or host_threads()),
+        },
+    )
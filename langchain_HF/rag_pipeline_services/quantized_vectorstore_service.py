@@ -0,0 +1,404 @@
+# rag_pipeline_services/quantized_vectorstore_service.py
+
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+from langchain.schema import Document
+
+from observability.metrics import observe_stage
+
+from ..rag_pipeline_services.metadata_filter import MetadataIndex
+
+
+class QuantizedVectorStoreService:
+    """
+    Compact on-disk vector store with the same interface as
+    ChromaVectorStoreService (add_embeddings / search / delete_all / count).
+
+    Vectors are L2-normalized and stored as
+      - "int8"   : scalar-quantized codes + one float32 scale per row
+      - "float16": half-precision rows
+    Search scans the compact codes (memory-mapped, in blocks) and can
+    re-score the best candidates against full-precision float32 vectors
+    kept in a separate file that is only touched for those rows.
+    Distances are cosine distances (1 - similarity), like Chroma's.
+
+    Metadata is kept in an in-memory secondary index (MetadataIndex); a
+    `where` filter selects the matching rows first and only those are scored.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "quantized_db",
+        collection_name: str = "rag_collection",
+        dtype: str = "int8",
+        keep_full_precision: bool = True,
+        rescore_factor: int = 4,
+        block_rows: int = 65536,
+    ):
+        """
+        persist_directory  : folder to save the store
+        collection_name    : sub-folder for this collection
+        dtype              : "int8" or "float16"
+        keep_full_precision: also store float32 vectors for exact re-scoring
+        rescore_factor     : re-score k * rescore_factor candidates (0 = off)
+        block_rows         : rows scanned per block (bounds search memory)
+        """
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        if rescore_factor < 0:
+            raise ValueError(f"rescore_factor must be >= 0, not {rescore_factor}")
+
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.dtype = dtype
+        self.keep_full_precision = keep_full_precision
+        self._rescore_factor = rescore_factor
+        self.block_rows = block_rows
+
+        self.path = os.path.join(persist_directory, collection_name)
+        self._lock = threading.Lock()
+        self._load()
+
+    # -------------------------------------------------------
+    # FILE LAYOUT
+    # -------------------------------------------------------
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta["dtype"] != self.dtype:
+                raise ValueError(
+                    f"Collection `{self.collection_name}` is stored as "
+                    f"{meta['dtype']}, not {self.dtype}"
+                )
+            self.dim = meta["dim"]
+            self.keep_full_precision = meta["keep_full_precision"]
+            self._count = meta["count"]
+        else:
+            self.dim = None
+            self._count = 0
+        # only collections stored with float32 rows can be re-scored
+        self.rescore_factor = self._rescore_factor if self.keep_full_precision else 0
+
+        # byte offset of every record line, so results are read on demand,
+        # and the metadata index rebuilt from the same pass
+        self._offsets = array("q")
+        self._index = MetadataIndex()
+        records = self._file("records.jsonl")
+        pos = 0
+        if os.path.exists(records):
+            with open(records, "rb") as f:
+                for line in f:
+                    if len(self._offsets) == self._count:
+                        break
+                    self._index.add(len(self._offsets), json.loads(line)["metadata"])
+                    self._offsets.append(pos)
+                    pos += len(line)
+
+        # meta.json is written last: bytes past its count belong to a crashed
+        # add (or to one still running in another process, so opening the
+        # store never writes); the next add here drops them
+        self._records_end = pos
+
+        self._map()
+
+    def _drop_partial_add(self):
+        """Cut the files back to the rows meta.json counts, so appends line up."""
+        row_bytes = (self.dim or 0) * (1 if self.dtype == "int8" else 2)
+        self._truncate("records.jsonl", self._records_end)
+        self._truncate("codes.bin", self._count * row_bytes)
+        self._truncate("scales.bin", self._count * 4)
+        self._truncate("full.bin", self._count * (self.dim or 0) * 4)
+
+    def _truncate(self, name, size):
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _map(self):
+        self._codes = self._scales = self._full = None
+        if not self._count:
+            return
+
+        code_type = np.int8 if self.dtype == "int8" else np.float16
+        shape = (self._count, self.dim)
+        self._codes = np.memmap(self._file("codes.bin"), code_type, "r", shape=shape)
+        if self.dtype == "int8":
+            self._scales = np.memmap(
+                self._file("scales.bin"), np.float32, "r", shape=(self._count,)
+            )
+        if self.keep_full_precision:
+            self._full = np.memmap(self._file("full.bin"), np.float32, "r", shape=shape)
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "dim": self.dim,
+                    "dtype": self.dtype,
+                    "keep_full_precision": self.keep_full_precision,
+                    "count": self._count,
+                },
+                f,
+            )
+        os.replace(tmp, self._file("meta.json"))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # -------------------------------------------------------
+    # ADD EMBEDDINGS
+    # -------------------------------------------------------
+    def add_embeddings(self, embedded_pairs):
+        """
+        embedded_pairs: List[(vector, Document)]
+        """
+        if not embedded_pairs:
+            return
+
+        vectors = self._normalize(
+            np.asarray([vec for vec, _ in embedded_pairs], dtype=np.float32)
+        )
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}"
+                )
+            self._drop_partial_add()
+
+            if self.dtype == "int8":
+                # per-row symmetric scale: max |x| maps to 127
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                codes = np.round(vectors / scales[:, None]).astype(np.int8)
+                with open(self._file("scales.bin"), "ab") as f:
+                    f.write(scales.astype(np.float32).tobytes())
+            else:
+                codes = vectors.astype(np.float16)
+
+            with open(self._file("codes.bin"), "ab") as f:
+                f.write(codes.tobytes())
+
+            if self.keep_full_precision:
+                with open(self._file("full.bin"), "ab") as f:
+                    f.write(vectors.tobytes())
+
+            records = self._file("records.jsonl")
+            pos = self._records_end
+            ingested_at = time.time()
+            with open(records, "ab") as f:
+                for idx, (_, doc) in enumerate(embedded_pairs):
+                    metadata = {"ingested_at": ingested_at, **(doc.metadata or {})}
+                    line = (
+                        json.dumps(
+                            {
+                                "id": f"id_{self._count + idx}",
+                                "document": doc.page_content,
+                                "metadata": metadata,
+                            }
+                        )
+                        + "\n"
+                    ).encode("utf-8")
+                    f.write(line)
+                    self._index.add(self._count + idx, metadata)
+                    self._offsets.append(pos)
+                    pos += len(line)
+
+            self._records_end = pos
+            self._count += len(embedded_pairs)
+            self._write_meta()
+            self._map()
+
+        print(f"Added {len(embedded_pairs)} items to {self.dtype} store.")
+
+    # -------------------------------------------------------
+    # SEARCH / RETRIEVE
+    # -------------------------------------------------------
+    def _scan(self, query: np.ndarray, n: int, rows=None):
+        """
+        Top-n rows by approximate similarity over the compact codes
+        (only `rows`, sorted row numbers, when given).
+        """
+        best_idx = np.empty(0, dtype=np.int64)
+        best_sim = np.empty(0, dtype=np.float32)
+        total = self._count if rows is None else len(rows)
+
+        for start in range(0, total, self.block_rows):
+            stop = min(start + self.block_rows, total)
+            if rows is None:
+                block = np.arange(start, stop)
+                sims = self._codes[start:stop].astype(np.float32) @ query
+            else:
+                block = rows[start:stop]
+                sims = self._codes[block].astype(np.float32) @ query
+            if self._scales is not None:
+                sims *= self._scales[block]
+
+            if len(sims) > n:
+                top = np.argpartition(-sims, n - 1)[:n]
+            else:
+                top = np.arange(len(sims))
+
+            best_idx = np.concatenate([best_idx, block[top]])
+            best_sim = np.concatenate([best_sim, sims[top]])
+            if len(best_sim) > n:
+                keep = np.argpartition(-best_sim, n - 1)[:n]
+                best_idx, best_sim = best_idx[keep], best_sim[keep]
+
+        return best_idx, best_sim
+
+    def _record(self, row: int):
+        with open(self._file("records.jsonl"), "rb") as f:
+            f.seek(self._offsets[row])
+            return json.loads(f.readline())
+
+    def search(
+        self, query_vector, k=5, rescore=None, where=None, include_embeddings=False
+    ):
+        """
+        query_vector      : list[float]
+        rescore           : override the store's re-scoring (True / False)
+        where             : Chroma-style metadata filter (see metadata_filter.py)
+        include_embeddings: also return the (normalized) vectors as float32
+        returns top-k results: text, metadata, score
+        """
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            empty["embeddings"] = np.empty((0, self.dim or 0), dtype=np.float32)
+        if not self._count:
+            return empty
+
+        with observe_stage("search"):
+            rows = None
+            candidates = self._count
+            if where:
+                rows = self._index.rows(where)
+                rows = rows[rows < self._count]
+                candidates = len(rows)
+                if not candidates:
+                    return empty
+
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+            k = min(k, candidates)
+
+            use_rescore = self.rescore_factor > 0 if rescore is None else rescore
+            use_rescore = use_rescore and self._full is not None
+
+            # rescore=True on a factor-0 store still re-ranks the top k exactly
+            n = min(k * max(self.rescore_factor, 1), candidates) if use_rescore else k
+            idx, sims = self._scan(query, n, rows)
+
+            if use_rescore:
+                # exact float32 scores for the few candidates only
+                order = np.sort(idx)
+                sims = self._full[order] @ query
+                idx = order
+
+            top = np.argsort(-sims)[:k]
+            idx, sims = idx[top], sims[top]
+
+            records = [self._record(int(row)) for row in idx]
+        results = {
+            "ids": [r["id"] for r in records],
+            "documents": [r["document"] for r in records],
+            "metadatas": [r["metadata"] for r in records],
+            "distances": [float(1.0 - s) for s in sims],
+        }
+        if include_embeddings:
+            results["embeddings"] = self._vectors(idx)
+        return results
+
+    def _vectors(self, rows) -> np.ndarray:
+        """float32 rows: exact when kept, otherwise dequantized codes."""
+        if self._full is not None:
+            return np.array(self._full[rows])
+        vectors = self._codes[rows].astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows, None]
+        return vectors
+
+    # -------------------------------------------------------
+    # STATUS / MEMORY
+    # -------------------------------------------------------
+    def count(self):
+        return self._count
+
+    def memory_bytes(self):
+        """Bytes scanned per query (compact) vs. kept on disk for re-scoring."""
+        compact = self._codes.nbytes if self._codes is not None else 0
+        if self._scales is not None:
+            compact += self._scales.nbytes
+        full = self._full.nbytes if self._full is not None else 0
+        return {"compact": compact, "full_precision": full}
+
+    def iter_items(self, batch_size: int = 1000, since: Optional[float] = None):
+        """
+        Yield every stored item as (vector, Document). Vectors are the
+        float32 rows when kept, otherwise dequantized codes (normalized).
+        since: only items with `ingested_at >= since`
+        """
+        for start in range(0, self._count, batch_size):
+            stop = min(start + batch_size, self._count)
+            vectors = self._vectors(slice(start, stop))
+            for row, vector in zip(range(start, stop), vectors):
+                record = self._record(row)
+                if (
+                    since is not None
+                    and record["metadata"].get("ingested_at", 0) < since
+                ):
+                    continue
+                yield vector.tolist(), Document(
+                    page_content=record["document"], metadata=record["metadata"]
+                )
+
+    # -------------------------------------------------------
+    # SNAPSHOT
+    # -------------------------------------------------------
+    def persist(self, target: str):
+        """
+        Copy the collection to `target`. The files are append-only with
+        meta.json written last, so there is nothing to compact; adds wait
+        until the copy is done.
+        """
+        with self._lock:
+            shutil.copytree(self.path, os.path.join(target, self.collection_name))
+        return {"count": self._count}
+
+    # -------------------------------------------------------
+    # DELETE COLLECTION (optional)
+    # -------------------------------------------------------
+    def delete_all(self):
+        with self._lock:
+            self._codes = self._scales = self._full = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.dim = None
+            self._load()
+        print("🗑️ Collection deleted.")
+
+    def drop(self):
+        """Delete the collection's files (the store is not used afterwards)."""
+        with self._lock:
+            self._codes = self._scales = self._full = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._count = 0
@@ -2,6 +2,7 @@
 
 from ..rag_pipeline_services.embeddings_service import EmbeddingsService
 from ..rag_pipeline_services.vectorstore_service import ChromaVectorStoreService
+from observability.tracing import span
 
 
 class RetrieverService:
@@ -20,10 +21,18 @@ class RetrieverService:
         self.vector_store = vector_store
         self.k = k
 
-    def retrieve(self, query: str, k: int = None):
+    def retrieve(
+        self,
+        query: str,
+        k: int = None,
+        where: dict = None,
+        include_embeddings: bool = False,
+    ):
         """
         Takes user query → embeds it → retrieves top-k chunks from ChromaDB.
-        Returns structured result with text, metadata, and scores.
+        `where` restricts the search to chunks whose metadata matches it.
+        Returns structured result with text, metadata, and scores (plus the
+        chunk vectors as one float32 array when include_embeddings is set).
         """
         if not query or query.strip() == "":
             raise ValueError("Query cannot be empty.")
@@ -31,19 +40,31 @@ class RetrieverService:
         # Use custom k OR default
         top_k = k if k is not None else self.k
 
-        # Step 1 — Embed user query
-        query_vector = self.embedder.embed_texts([query])[0]
+        with span("retrieve", k=top_k):
+            # Step 1 — Embed user query
+            query_vector = self.embedder.embed_texts([query])[0]
 
-        # Step 2 — Retrieve from ChromaDB
-        results = self.vector_store.search(query_vector, k=top_k)
+            # Step 2 — Retrieve from ChromaDB
+            results = self.vector_store.search(
+                query_vector,
+                k=top_k,
+                where=where,
+                include_embeddings=include_embeddings,
+            )
 
         # Step 3 — Prepare cleaner structure for LLM context
         retrieved_contexts = []
-        for text, meta, dist in zip(
-            results["documents"], results["metadatas"], results["distances"]
+        for item_id, text, meta, dist in zip(
+            results["ids"],
+            results["documents"],
+            results["metadatas"],
+            results["distances"],
         ):
             retrieved_contexts.append(
-                {"text": text, "metadata": meta, "distance": dist}
+                {"id": item_id, "text": text, "metadata": meta, "distance": dist}
             )
 
-        return {"query": query, "k": top_k, "results": retrieved_contexts}
+        response = {"query": query, "k": top_k, "results": retrieved_contexts}
+        if include_embeddings:
+            response["embeddings"] = results["embeddings"]
+        return response
@@ -0,0 +1,662 @@
+# rag_pipeline_services/sharded_vectorstore_service.py
+"""
+Vector store partitioned across N independent shards.
+
+    python -m langchain_HF.rag_pipeline_services.sharded_vectorstore_service status
+    python -m langchain_HF.rag_pipeline_services.sharded_vectorstore_service \
+        rebalance --shards 8 [--shard-by source] [--drop-old]
+
+Every shard is a complete store of its own (a Chroma PersistentClient or a
+quantized store, each in its own directory), so each has its own HNSW index
+/ code file and its own writer. Chunks are routed by a stable 64-bit
+blake2b hash of the chunk (shard_by="hash") or of its `source`
+(shard_by="source": a document's chunks stay together and source filters
+only touch the shards that hold them). add_embeddings writes the shards in parallel; search fans out to the
+shards concurrently and merges their sorted top-k lists.
+
+The layout lives in `<persist_directory>/<collection_name>/layout.json`
+and names the current generation directory (gen_<n>/shard_<i>). rebalance
+copies every item into a new generation, then switches layout.json with an
+atomic os.replace; every worker re-opens its shards on its next call once
+the file has changed. The previous generation is kept (workers may still be
+reading it) unless rebalance is asked to drop it.
+
+One rebalance at a time holds `rebalance.lock` next to layout.json (taken
+with O_EXCL; a lock left behind by a process that died on this host is
+taken over). With Chroma server shards (mode="http") workers keep
+ingesting into the old generation meanwhile: as in IndexManagerService
+rebuilds, every old item with `ingested_at >= <rebalance start>` is copied
+into the new generation just before the swap and once more right after it
+(for adds that picked up the old layout just before). Shard files written
+in-process (persistent Chroma, quantized) cannot take writes from another
+process while the rebalance reads them, so add_embeddings raises
+RebalanceInProgress while the lock is held; stop ingestion before a
+rebalance (adds still in flight when it starts are replayed before the
+swap).
+"""
+
+import argparse
+import contextvars
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from observability.tracing import span
+
+from ..rag_pipeline_services.quantized_vectorstore_service import (
+    QuantizedVectorStoreService,
+)
+from ..rag_pipeline_services.vectorstore_service import ChromaVectorStoreService
+
+# Load .env variables
+load_dotenv()
+
+SHARD_BY = ("hash", "source")
+BACKENDS = ("chroma", "int8", "float16")
+
+
+class RebalanceInProgress(RuntimeError):
+    pass
+
+
+class ShardedVectorStoreService:
+    """
+    Same interface as ChromaVectorStoreService (add_embeddings / search /
+    delete_all / count) over `num_shards` shards. Result ids are prefixed
+    with the shard number ("s2_id_14") since every shard numbers its own.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "sharded_db",
+        collection_name: str = "rag_collection",
+        num_shards: Optional[int] = None,
+        shard_by: Optional[str] = None,
+        backend: str = "chroma",
+        workers: Optional[int] = None,
+        **store_kwargs,
+    ):
+        """
+        persist_directory : folder holding the layout and all shards
+        collection_name   : sub-folder for this collection
+        num_shards        : shard count (None = as stored, 4 for a new store)
+        shard_by          : "hash" (per chunk) or "source" (per document)
+        backend           : "chroma", "int8" or "float16" shards
+        workers           : threads for parallel ingest / fan-out search
+        store_kwargs      : passed to every shard's store
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.backend = backend
+        self.store_kwargs = store_kwargs
+        self.path = os.path.join(persist_directory, collection_name)
+        self._lock = threading.RLock()
+        self._pool = None
+
+        layout = self._read_layout()
+        if layout is None:
+            layout = {
+                "num_shards": num_shards or 4,
+                "shard_by": shard_by or "hash",
+                "backend": backend,
+                "hash": "blake2b",
+                "generation": 0,
+            }
+            self._write_layout(layout)
+
+        # an existing layout is only changed by rebalance()
+        for key, wanted in (
+            ("num_shards", num_shards),
+            ("shard_by", shard_by),
+            ("backend", backend),
+        ):
+            if wanted is not None and layout[key] != wanted:
+                raise ValueError(
+                    f"Collection `{collection_name}` is stored with {key}="
+                    f"{layout[key]}, not {wanted}; run the rebalance command "
+                    f"to change it"
+                )
+        if layout["shard_by"] not in SHARD_BY:
+            raise ValueError(f"Unsupported shard_by: {layout['shard_by']}")
+
+        self.workers = workers
+        # only a Chroma server takes writes from several processes at once
+        self._file_shards = not (
+            backend == "chroma" and store_kwargs.get("mode") == "http"
+        )
+        self._layout_mtime = os.stat(self._layout_file()).st_mtime_ns
+        self._use_layout(layout)
+
+    # -------------------------------------------------------
+    # LAYOUT
+    # -------------------------------------------------------
+    @staticmethod
+    def stored_layout(
+        persist_directory: str = "sharded_db", collection_name: str = "rag_collection"
+    ) -> Optional[dict]:
+        """layout.json of a collection, or None for a new one."""
+        path = os.path.join(persist_directory, collection_name, "layout.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _layout_file(self):
+        return os.path.join(self.path, "layout.json")
+
+    def _read_layout(self):
+        return self.stored_layout(self.persist_directory, self.collection_name)
+
+    def _write_layout(self, layout):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._layout_file() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(layout, f)
+        os.replace(tmp, self._layout_file())
+
+    def _use_layout(self, layout, shards=None):
+        """Serve from the generation `layout` names (opened unless given)."""
+        num_shards = layout["num_shards"]
+        if shards is None:
+            shards = self._open_generation(layout["generation"], num_shards)
+        self.shards, self.num_shards = shards, num_shards
+        self.shard_by, self.generation = layout["shard_by"], layout["generation"]
+        # layouts written before blake2b routing have no "hash" entry
+        self.hash = layout.get("hash", "crc32")
+
+        workers = self.workers or num_shards
+        if self._pool is None or workers > self._pool._max_workers:
+            # not shut down: other threads may still submit to the old pool,
+            # whose threads exit once it is no longer referenced
+            self._pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="shard"
+            )
+
+    def _refresh(self):
+        """Follow layout.json when another process has rebalanced the store."""
+        try:
+            mtime = os.stat(self._layout_file()).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._layout_mtime:
+            return
+        with self._lock:
+            if mtime != self._layout_mtime:
+                self._use_layout(self._read_layout())
+                self._layout_mtime = mtime
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.path, f"gen_{generation}")
+
+    def _open_generation(self, generation, num_shards):
+        root = self._generation_dir(generation)
+        shards = []
+        for i in range(num_shards):
+            directory = os.path.join(root, f"shard_{i}")
+            if self.backend == "chroma":
+                collection_name = self.collection_name
+                if self.store_kwargs.get("mode") == "http":
+                    # shards share one Chroma server: one collection each
+                    collection_name = f"{self.collection_name}_gen{generation}_shard{i}"
+                store = ChromaVectorStoreService(
+                    persist_directory=directory,
+                    collection_name=collection_name,
+                    **self.store_kwargs,
+                )
+            else:
+                store = QuantizedVectorStoreService(
+                    persist_directory=directory,
+                    collection_name=self.collection_name,
+                    dtype=self.backend,
+                    **self.store_kwargs,
+                )
+            shards.append(store)
+        return shards
+
+    # -------------------------------------------------------
+    # ROUTING
+    # -------------------------------------------------------
+    @staticmethod
+    def _hash(key: str, method: str = "blake2b") -> int:
+        """Stable across processes (unlike hash()); blake2b spreads similar keys."""
+        data = key.encode("utf-8")
+        if method == "crc32":
+            return zlib.crc32(data)
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+    @classmethod
+    def _shard_of(cls, doc, num_shards, shard_by, method="blake2b"):
+        metadata = doc.metadata or {}
+        if shard_by == "source":
+            key = str(metadata.get("source", ""))
+        else:
+            key = f"{metadata.get('source', '')}:{metadata.get('page', '')}:{doc.page_content}"
+        return cls._hash(key, method) % num_shards
+
+    def _partition(self, embedded_pairs, num_shards, shard_by, method):
+        groups = [[] for _ in range(num_shards)]
+        for pair in embedded_pairs:
+            groups[self._shard_of(pair[1], num_shards, shard_by, method)].append(pair)
+        return groups
+
+    def _target_shards(self, where) -> List[int]:
+        """Shards that can hold matches; pruned by source when sharded by it."""
+        everything = list(range(self.num_shards))
+        if not where or self.shard_by != "source":
+            return everything
+
+        clauses = where["$and"] if "$and" in where else [where]
+        for clause in clauses:
+            condition = clause.get("source")
+            if condition is None:
+                continue
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    sources = [condition["$eq"]]
+                elif "$in" in condition:
+                    sources = condition["$in"]
+                else:
+                    continue
+            else:
+                sources = [condition]
+            return sorted(
+                {
+                    self._hash(str(source), self.hash) % self.num_shards
+                    for source in sources
+                }
+            )
+        return everything
+
+    def _run(self, fn, items):
+        """fn(item) for every item on the pool, in the caller's tracing context."""
+        futures = [
+            self._pool.submit(contextvars.copy_context().run, fn, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+    # -------------------------------------------------------
+    # ADD EMBEDDINGS
+    # -------------------------------------------------------
+    def add_embeddings(self, embedded_pairs):
+        """
+        embedded_pairs: List[(vector, Document)]
+        """
+        self._refresh()
+        if self._file_shards and self._lock_holder() is not None:
+            raise RebalanceInProgress(
+                "The shards are being rebalanced; retry the add once it is done"
+            )
+        with self._lock:
+            groups = self._partition(
+                embedded_pairs, self.num_shards, self.shard_by, self.hash
+            )
+            with span("shard.add", shards=sum(1 for g in groups if g)):
+                self._run(
+                    lambda i: self.shards[i].add_embeddings(groups[i]),
+                    [i for i, group in enumerate(groups) if group],
+                )
+
+    # -------------------------------------------------------
+    # SEARCH / RETRIEVE
+    # -------------------------------------------------------
+    def search(self, query_vector, k=5, where=None, include_embeddings=False):
+        """
+        query_vector      : list[float]
+        where             : Chroma metadata filter, applied inside every shard
+        include_embeddings: also return the stored vectors (float32 array)
+        returns the merged top-k results: text, metadata, score
+        """
+        self._refresh()
+        shards = self.shards  # one generation for the whole query
+        targets = self._target_shards(where)
+
+        def search_shard(i):
+            result = shards[i].search(
+                query_vector, k=k, where=where, include_embeddings=include_embeddings
+            )
+            vectors = result.get("embeddings")
+            return [
+                (
+                    distance,
+                    f"s{i}_{item_id}",
+                    document,
+                    metadata,
+                    vectors[row] if include_embeddings else None,
+                )
+                for row, (distance, item_id, document, metadata) in enumerate(
+                    zip(
+                        result["distances"],
+                        result["ids"],
+                        result["documents"],
+                        result["metadatas"],
+                    )
+                )
+            ]
+
+        with span("shard.search", shards=len(targets)):
+            per_shard = self._run(search_shard, targets)
+
+        # every shard list is already sorted by distance
+        merged = list(islice(heapq.merge(*per_shard, key=lambda r: r[0]), k))
+        results = {
+            "ids": [r[1] for r in merged],
+            "documents": [r[2] for r in merged],
+            "metadatas": [r[3] for r in merged],
+            "distances": [r[0] for r in merged],
+        }
+        if include_embeddings:
+            results["embeddings"] = np.asarray([r[4] for r in merged], dtype=np.float32)
+        return results
+
+    # -------------------------------------------------------
+    # REBALANCE
+    # -------------------------------------------------------
+    def rebalance(
+        self,
+        num_shards: int,
+        shard_by: Optional[str] = None,
+        batch_size: int = 1000,
+        drop_old: bool = False,
+    ):
+        """
+        Copy every item into a new generation of `num_shards` shards (routed
+        by `shard_by`), then switch the layout to it. Items keep their
+        metadata, including the original `ingested_at`; items added while
+        this runs are replayed into the new generation (see the module
+        docstring). The old generation is only deleted with drop_old=True,
+        once no worker still reads or writes it (adds landing there after
+        the last replay are lost).
+        """
+        shard_by = shard_by or self.shard_by
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Unsupported shard_by: {shard_by}")
+
+        self._acquire()
+        try:
+            with self._lock:
+                # re-open: the layout may have moved on, and shards opened
+                # earlier may miss rows added since (quantized stores read
+                # their row count once)
+                self._use_layout(self._read_layout())
+                self._layout_mtime = os.stat(self._layout_file()).st_mtime_ns
+                moved = self._rebalance(num_shards, shard_by, batch_size, drop_old)
+        finally:
+            self._release()
+
+        print(f"Rebalanced {moved} items into {num_shards} shards by {shard_by}.")
+        return moved
+
+    def _rebalance(self, num_shards, shard_by, batch_size, drop_old):
+        # adds from here on may miss the copy; they are replayed around the swap
+        start = time.time()
+        generation = self.generation + 1
+        shutil.rmtree(self._generation_dir(generation), ignore_errors=True)
+        new_shards = self._open_generation(generation, num_shards)
+        if any(shard.count() for shard in new_shards):
+            # left on the Chroma server by a rebalance that died (http mode)
+            self._run(lambda shard: shard.delete_all(), new_shards)
+
+        def add(pairs):
+            groups = self._partition(pairs, num_shards, shard_by, "blake2b")
+            self._run(
+                lambda i: new_shards[i].add_embeddings(groups[i]),
+                [i for i, group in enumerate(groups) if group],
+            )
+
+        old_generation, old_shards = self.generation, self.shards
+        replayed = Counter()
+        moved = 0
+        try:
+            for shard in old_shards:
+                items = (
+                    (vector, doc)
+                    for vector, doc in shard.iter_items(batch_size=batch_size)
+                    if doc.metadata.get("ingested_at", 0) < start
+                )
+                while True:
+                    batch = list(islice(items, batch_size))
+                    if not batch:
+                        break
+                    add(batch)
+                    moved += len(batch)
+            # adds still in flight when the lock was taken, seen through
+            # freshly opened shards for the same reason as above
+            latest = self._open_generation(old_generation, len(old_shards))
+            moved += self._replay(latest, add, start, replayed, batch_size)
+        except Exception:
+            # nothing serves from the new generation yet
+            self._run(lambda shard: shard.drop(), new_shards)
+            shutil.rmtree(self._generation_dir(generation), ignore_errors=True)
+            raise
+
+        layout = {
+            "num_shards": num_shards,
+            "shard_by": shard_by,
+            "backend": self.backend,
+            "hash": "blake2b",
+            "generation": generation,
+        }
+        self._write_layout(layout)
+        self._layout_mtime = os.stat(self._layout_file()).st_mtime_ns
+        self._use_layout(layout, shards=new_shards)
+        if not self._file_shards:
+            # adds that picked up the old layout just before the swap (file
+            # shards take no adds meanwhile, and workers that already opened
+            # the new generation would not see a late write to its files)
+            moved += self._replay(old_shards, add, start, replayed, batch_size)
+
+        if drop_old:
+            # drop(), not delete_all(): that would recreate every old
+            # shard's collection (on the server, in http mode)
+            self._run(lambda shard: shard.drop(), old_shards)
+            shutil.rmtree(self._generation_dir(old_generation), ignore_errors=True)
+        return moved
+
+    @staticmethod
+    def _replay(old_shards, add, since, replayed: Counter, batch_size) -> int:
+        """
+        add() the items of `old_shards` with `ingested_at >= since` that are
+        not copied yet. `replayed` counts the copies made per item, so a
+        chunk stored twice is copied twice.
+        """
+        fresh = []
+        for i, shard in enumerate(old_shards):
+            seen = Counter()
+            for vector, doc in shard.iter_items(batch_size=batch_size, since=since):
+                key = (
+                    i,
+                    doc.page_content,
+                    json.dumps(doc.metadata, sort_keys=True, default=str),
+                )
+                seen[key] += 1
+                if seen[key] > replayed[key]:
+                    replayed[key] += 1
+                    fresh.append((vector, doc))
+        for begin in range(0, len(fresh), batch_size):
+            add(fresh[begin : begin + batch_size])
+        return len(fresh)
+
+    # -------------------------------------------------------
+    # REBALANCE LOCK (shared by every process using the store)
+    # -------------------------------------------------------
+    def _lock_file(self):
+        return os.path.join(self.path, "rebalance.lock")
+
+    def _acquire(self):
+        """Take rebalance.lock; RebalanceInProgress if a live process holds it."""
+        owner = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started_at": time.time(),
+        }
+        for _ in range(2):
+            try:
+                fd = os.open(self._lock_file(), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._lock_holder()
+                if holder is not None:
+                    raise RebalanceInProgress(
+                        f"A rebalance is already running (pid {holder.get('pid')} "
+                        f"on {holder.get('host')}); remove {self._lock_file()} "
+                        f"if that process is gone"
+                    )
+                # stale lock: its process is gone
+                try:
+                    os.remove(self._lock_file())
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump(owner, f)
+            return
+        raise RebalanceInProgress("Another process is starting a rebalance")
+
+    def _lock_holder(self) -> Optional[dict]:
+        """Owner of rebalance.lock unless its process died on this host."""
+        try:
+            with open(self._lock_file()) as f:
+                holder = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            # being written by another process right now
+            return {}
+
+        if holder.get("host") == socket.gethostname():
+            try:
+                os.kill(holder["pid"], 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+        return holder
+
+    def _release(self):
+        try:
+            with open(self._lock_file()) as f:
+                mine = json.load(f)["pid"] == os.getpid()
+            if mine:
+                os.remove(self._lock_file())
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    # -------------------------------------------------------
+    # STATUS
+    # -------------------------------------------------------
+    def shard_counts(self):
+        self._refresh()
+        return [shard.count() for shard in self.shards]
+
+    def count(self):
+        return sum(count or 0 for count in self.shard_counts())
+
+    # -------------------------------------------------------
+    # SNAPSHOT
+    # -------------------------------------------------------
+    def persist(self, target: str):
+        """Snapshot every shard (in parallel) plus the layout into `target`."""
+        self._refresh()
+        with self._lock:
+            os.makedirs(target)
+            shutil.copy2(self._layout_file(), target)
+            results = self._run(
+                lambda i: self.shards[i].persist(os.path.join(target, f"shard_{i}")),
+                range(self.num_shards),
+            )
+        return {"shards": results}
+
+    # -------------------------------------------------------
+    # DELETE COLLECTION (optional)
+    # -------------------------------------------------------
+    def delete_all(self):
+        self._refresh()
+        with self._lock:
+            self._run(lambda shard: shard.delete_all(), self.shards)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m " + __spec__.name)
+    parser.add_argument("--root", default=os.getenv("VECTOR_SHARD_DIR", "sharded_db"))
+    parser.add_argument("--collection", default="rag_collection")
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default=os.getenv("VECTOR_STORE", "chroma")
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="show the layout and per-shard counts")
+
+    rebalance = commands.add_parser("rebalance", help="change the shard count")
+    rebalance.add_argument("--shards", type=int, required=True)
+    rebalance.add_argument("--shard-by", choices=SHARD_BY)
+    rebalance.add_argument("--batch-size", type=int, default=1000)
+    rebalance.add_argument(
+        "--drop-old",
+        action="store_true",
+        help="delete the previous generation (only once no worker reads it)",
+    )
+
+    args = parser.parse_args(argv)
+    # same Chroma server settings as the API workers (see rag_apis)
+    store_kwargs = {}
+    if args.backend == "chroma" and os.getenv("CHROMA_MODE") == "http":
+        store_kwargs.update(
+            mode="http",
+            host=os.getenv("CHROMA_HOST"),
+            port=int(os.getenv("CHROMA_PORT", "8001")),
+        )
+    store = ShardedVectorStoreService(
+        persist_directory=args.root,
+        collection_name=args.collection,
+        backend=args.backend,
+        **store_kwargs,
+    )
+
+    if args.command == "rebalance":
+        if args.shards < 1:
+            parser.error("--shards must be at least 1")
+        try:
+            store.rebalance(
+                args.shards,
+                shard_by=args.shard_by,
+                batch_size=args.batch_size,
+                drop_old=args.drop_old,
+            )
+        except RebalanceInProgress as error:
+            parser.exit(1, f"{error}\n")
+
+    print(
+        json.dumps(
+            {
+                "path": store.path,
+                "generation": store.generation,
+                "shard_by": store.shard_by,
+                "hash": store.hash,
+                "backend": store.backend,
+                "shard_counts": store.shard_counts(),
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,61 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from observability.metrics import observe_stage
+
+from ..rag_pipeline_services.fast_splitter import FastRecursiveTextSplitter
+from ..rag_pipeline_services.token_splitter import TokenWindowSplitter
 
 
 class DocumentSplitterService:
     """
     Splits loaded documents into smaller chunks for embeddings.
+    - mode: "recursive" (LangChain RecursiveCharacterTextSplitter),
+            "fast" (offset-based splitter with identical chunk boundaries) or
+            "tokens" (windows sized in embedding-model tokens)
+    - workers: processes used by the "fast" mode for large batches
+    - tokenizer / max_tokens / token_overlap: used by the "tokens" mode,
+      normally the embedder's tokenizer and max sequence length
     """
 
-    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap
-        )
+    def __init__(
+        self,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        mode: str = "recursive",
+        workers: int = 1,
+        tokenizer=None,
+        max_tokens: int = 256,
+        token_overlap: int = 32,
+    ):
+        self.mode = mode
+
+        # identifies the chunking configuration (corpus cache key)
+        if mode == "tokens":
+            tokenizer_name = getattr(tokenizer, "name_or_path", "")
+            self.cache_key = f"tokens-{max_tokens}-{token_overlap}-{tokenizer_name}"
+        else:
+            self.cache_key = f"{mode}-{chunk_size}-{chunk_overlap}"
+
+        if mode == "recursive":
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+        elif mode == "fast":
+            self.text_splitter = FastRecursiveTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap, workers=workers
+            )
+        elif mode == "tokens":
+            if tokenizer is None:
+                raise ValueError("tokens mode requires the embedding tokenizer")
+            self.text_splitter = TokenWindowSplitter(
+                tokenizer, max_tokens=max_tokens, token_overlap=token_overlap
+            )
+        else:
+            raise ValueError(f"Unsupported splitter mode: {mode}")
 
     def split_documents(self, documents):
         """
         Accepts list of LangChain Documents and splits them into chunks.
         """
-        chunks = self.text_splitter.split_documents(documents)
+        with observe_stage("split"):
+            chunks = self.text_splitter.split_documents(documents)
         return chunks
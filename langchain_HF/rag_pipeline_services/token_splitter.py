@@ -0,0 +1,105 @@
+# rag_pipeline_services/token_splitter.py
+
+import copy
+from typing import List, Tuple
+
+from langchain.schema import Document
+
+
+class TokenWindowSplitter:
+    """
+    Splits documents into windows measured in embedding-model tokens.
+
+    Each page is tokenized once (in batches, with the fast tokenizer's
+    offset mapping) and cut into windows of at most `max_tokens` word-pieces,
+    so every chunk fits the embedder's max sequence length and no stored
+    text is silently truncated at embedding time.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int = 256,
+        token_overlap: int = 32,
+        batch_size: int = 64,
+    ):
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("TokenWindowSplitter needs a fast (Rust) tokenizer.")
+
+        # leave room for [CLS]/[SEP] or whatever the model adds
+        budget = max_tokens - tokenizer.num_special_tokens_to_add(pair=False)
+        if token_overlap >= budget:
+            raise ValueError(
+                f"token_overlap ({token_overlap}) must be smaller than the "
+                f"token budget per chunk ({budget})."
+            )
+
+        self.tokenizer = tokenizer
+        self.max_tokens = budget
+        self.token_overlap = token_overlap
+        self.batch_size = batch_size
+
+    def _windows(self, text: str, offsets: List[Tuple[int, int]]) -> List[str]:
+        n = len(offsets)
+        chunks = []
+        start = 0
+        while start < n:
+            end = min(start + self.max_tokens, n)
+
+            # don't cut through a word: back off to the last token that
+            # starts after whitespace, unless that would halve the window
+            if end < n:
+                cut = end
+                while cut > start + self.max_tokens // 2:
+                    if offsets[cut][0] > offsets[cut - 1][1]:
+                        break
+                    cut -= 1
+                else:
+                    cut = end
+                end = cut
+
+            chunk = text[offsets[start][0] : offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            if end == n:
+                break
+
+            # overlap, starting on a word boundary so the chunk re-tokenizes
+            # to the same word-pieces
+            next_start = max(end - self.token_overlap, start + 1)
+            while (
+                next_start < end
+                and offsets[next_start][0] <= offsets[next_start - 1][1]
+            ):
+                next_start += 1
+            start = next_start
+        return chunks
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i : i + self.batch_size]
+            encoded = self.tokenizer(
+                batch,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                truncation=False,
+                verbose=False,
+            )
+            for text, offsets in zip(batch, encoded["offset_mapping"]):
+                results.append(self._windows(text, offsets))
+        return results
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        documents = list(documents)
+        split = self.split_texts([doc.page_content for doc in documents])
+
+        chunks = []
+        for doc, texts in zip(documents, split):
+            for text in texts:
+                chunks.append(
+                    Document(page_content=text, metadata=copy.deepcopy(doc.metadata))
+                )
+        return chunks
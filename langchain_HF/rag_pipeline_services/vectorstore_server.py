@@ -0,0 +1,95 @@
+# rag_pipeline_services/vectorstore_server.py
+"""
+One local Chroma server that owns the vector index for every API worker.
+
+    python -m langchain_HF.rag_pipeline_services.vectorstore_server \
+        [--path chroma_db] [--host 127.0.0.1] [--port 8001]
+
+    CHROMA_MODE=http CHROMA_HOST=127.0.0.1 CHROMA_PORT=8001 \
+        uvicorn main:app --workers 4
+
+With CHROMA_MODE=persistent (default) every worker that imports rag_apis
+opens its own PersistentClient on chroma_db: one HNSW copy per worker, and
+concurrent /add calls from different processes race on the same files.
+With CHROMA_MODE=http the workers keep no index at all; they reach this
+server through chromadb.HttpClient (keep-alive connection pool, sized by
+CHROMA_HTTP_MAX_CONNECTIONS) and the server is the single writer.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import chromadb
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+# Load .env variables
+load_dotenv()
+
+DEFAULT_HOST = os.getenv("CHROMA_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+
+
+def http_client(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_connections: int = int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "16")),
+    wait_seconds: float = float(os.getenv("CHROMA_CONNECT_TIMEOUT", "30")),
+):
+    """
+    HttpClient with a pooled keep-alive connection to the server, retried for
+    up to `wait_seconds` so workers can start together with the server.
+    """
+    settings = Settings(
+        anonymized_telemetry=False,
+        chroma_http_max_connections=max_connections,
+        chroma_http_max_keepalive_connections=max_connections,
+    )
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        try:
+            # the constructor already checks the server (tenant / database)
+            client = chromadb.HttpClient(host=host, port=port, settings=settings)
+            client.heartbeat()
+            return client
+        except Exception as error:
+            if time.monotonic() >= deadline:
+                raise ConnectionError(
+                    f"Chroma server not reachable at {host}:{port}: {error}"
+                ) from error
+            time.sleep(0.5)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m " + __spec__.name)
+    parser.add_argument("--path", default=os.getenv("CHROMA_PATH", "chroma_db"))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    # the server ships with chromadb as a native binary (same as `chroma run`)
+    import chromadb_rust_bindings
+
+    print(f"Serving {os.path.abspath(args.path)} on {args.host}:{args.port}")
+    try:
+        chromadb_rust_bindings.cli(
+            [
+                "chroma",
+                "run",
+                "--path",
+                args.path,
+                "--host",
+                args.host,
+                "--port",
+                str(args.port),
+            ]
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
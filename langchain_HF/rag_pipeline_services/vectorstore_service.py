@@ -1,37 +1,121 @@
 # rag_pipeline_services/vectorstore_service_chroma.py
 
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Optional
+
 import chromadb
+import numpy as np
+from langchain.schema import Document
 from chromadb.config import Settings
 from chromadb import PersistentClient
+from observability.metrics import observe_stage
+
+from ..rag_pipeline_services.vectorstore_server import http_client
 
 
 class ChromaVectorStoreService:
     """
     Simple ChromaDB vector store wrapper.
     Stores embeddings, metadata, and performs similarity search.
+
+    The collection in use is named by `active_collection.json` in
+    persist_directory when that file exists (written by activate() after a
+    background rebuild); every worker follows it on its next call.
     """
 
     def __init__(
         self,
         persist_directory: str = "chroma_db",
         collection_name: str = "rag_collection",
+        brute_force_limit: int = 2000,
+        mode: str = "persistent",
+        host: str = None,
+        port: int = None,
     ):
         """
-        persist_directory : folder to save the Chroma DB
+        persist_directory : folder to save the Chroma DB (persistent mode)
         collection_name   : name of the vector collection
+        brute_force_limit : filtered searches matching at most this many
+                            items are scored exactly instead of through HNSW
+        mode              : "persistent" (index opened in this process) or
+                            "http" (shared server, see vectorstore_server.py)
+        host, port        : server address in http mode
         """
+        if mode not in ("persistent", "http"):
+            raise ValueError(f"Unsupported Chroma mode: {mode}")
 
         self.persist_directory = persist_directory
+        self.base_collection_name = collection_name
         self.collection_name = collection_name
+        self.brute_force_limit = brute_force_limit
+        self.mode = mode
+        # held by adds, persist() and every collection create / delete
+        # (re-entrant: a rebuild replays adds while holding it for the swap)
+        self._add_lock = threading.RLock()
 
-        # Create/load persistent DB
-        self.client = PersistentClient(path=self.persist_directory)
+        if mode == "http":
+            # the server owns the index; this process only holds a connection pool
+            self.client = http_client(
+                **{
+                    key: value
+                    for key, value in (("host", host), ("port", port))
+                    if value
+                }
+            )
+        else:
+            # Create/load persistent DB
+            self.client = PersistentClient(path=self.persist_directory)
 
-        # create or load collection
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
+        # create or load the active collection
+        self._pointer = os.path.join(self.persist_directory, "active_collection.json")
+        self._pointer_mtime = None
+        self._collection = None
+        self._refresh()
+
+    # -------------------------------------------------------
+    # ACTIVE COLLECTION (blue-green switch)
+    # -------------------------------------------------------
+    def _refresh(self):
+        """Re-open the collection when the active pointer has changed."""
+        try:
+            mtime = os.stat(self._pointer).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._collection is not None and mtime == self._pointer_mtime:
+            return
+
+        name = self.base_collection_name
+        if mtime is not None:
+            with open(self._pointer) as f:
+                name = json.load(f)["collection"]
+        self._collection = self.client.get_or_create_collection(
+            name=name,
             metadata={"hnsw:space": "cosine"},  # use cosine similarity
         )
+        self.collection_name = name
+        self._pointer_mtime = mtime
+
+    @property
+    def collection(self):
+        self._refresh()
+        return self._collection
+
+    def activate(self, collection_name: str):
+        """Atomically point this store (and every worker sharing it) at a collection."""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp = self._pointer + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"collection": collection_name, "activated_at": time.time()}, f)
+        os.replace(tmp, self._pointer)
+        self._collection = None
+        self._refresh()
 
     # -------------------------------------------------------
     # ADD EMBEDDINGS
@@ -41,44 +125,211 @@ class ChromaVectorStoreService:
         embedded_pairs: List[(vector, Document)]
         """
 
-        ids = []
         embeddings = []
         metadatas = []
         documents = []
 
-        for idx, (vector, doc) in enumerate(embedded_pairs):
-            ids.append(f"id_{len(self.collection.get()['ids']) + idx}")
+        ingested_at = time.time()
+
+        for vector, doc in embedded_pairs:
             embeddings.append(vector)
-            metadatas.append(doc.metadata)
+            # items copied between stores keep their original ingest time
+            metadatas.append({"ingested_at": ingested_at, **(doc.metadata or {})})
             documents.append(doc.page_content)
 
-        self.collection.add(
-            ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
-        )
+        # the lock also keeps a rebuild from swapping collections mid-add
+        with self._add_lock:
+            collection = self.collection
+            if self.mode == "http":
+                # other workers write concurrently: ids must not depend on count()
+                ids = [f"id_{uuid.uuid4().hex}" for _ in embeddings]
+            else:
+                # one count per batch (not a full collection.get() per item)
+                start = collection.count()
+                ids = [f"id_{start + idx}" for idx in range(len(embeddings))]
+            collection.add(
+                ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
+            )
 
         print(f"Added {len(embeddings)} items to ChromaDB.")
 
     # -------------------------------------------------------
     # SEARCH / RETRIEVE
     # -------------------------------------------------------
-    def search(self, query_vector, k=5):
+    def search(self, query_vector, k=5, where=None, include_embeddings=False):
         """
-        query_vector: list[float]
+        query_vector      : list[float]
+        where             : Chroma metadata filter, e.g. {"source": "a.pdf"}
+        include_embeddings: also return the stored vectors (float32 array)
         returns top-k results: text, metadata, score
         """
 
-        results = self.collection.query(query_embeddings=[query_vector], n_results=k)
+        collection = self.collection  # one collection for the whole query
+        with observe_stage("search"):
+            if where:
+                # Chroma's metadata index narrows the candidates; small
+                # subsets are scored exactly, larger ones by filtered HNSW
+                matched = collection.get(
+                    where=where, include=[], limit=self.brute_force_limit + 1
+                )["ids"]
+                if len(matched) <= self.brute_force_limit:
+                    return self._exact_search(
+                        collection, query_vector, k, matched, include_embeddings
+                    )
+
+            include = ["documents", "metadatas", "distances"]
+            if include_embeddings:
+                include.append("embeddings")
+            results = collection.query(
+                query_embeddings=[query_vector],
+                n_results=k,
+                where=where,
+                include=include,
+            )
 
-        return {
+        found = {
             "ids": results["ids"][0],
             "documents": results["documents"][0],
             "metadatas": results["metadatas"][0],
             "distances": results["distances"][0],
         }
+        if include_embeddings:
+            found["embeddings"] = np.asarray(results["embeddings"][0], dtype=np.float32)
+        return found
+
+    def _exact_search(self, collection, query_vector, k, ids, include_embeddings):
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            empty["embeddings"] = np.empty((0, 0), dtype=np.float32)
+        if not ids:
+            return empty
+
+        stored = collection.get(ids=ids, include=["embeddings"])
+        ids = stored["ids"]
+        vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        norms[norms == 0] = 1.0
+        distances = 1.0 - (vectors @ query) / norms
+
+        top = np.argsort(distances)[:k]
+        top_ids = [ids[i] for i in top]
+        found = collection.get(ids=top_ids, include=["documents", "metadatas"])
+        # get() does not keep the requested order
+        position = {item_id: i for i, item_id in enumerate(found["ids"])}
+        order = [position[item_id] for item_id in top_ids]
+        results = {
+            "ids": top_ids,
+            "documents": [found["documents"][i] for i in order],
+            "metadatas": [found["metadatas"][i] for i in order],
+            "distances": [float(distances[i]) for i in top],
+        }
+        if include_embeddings:
+            results["embeddings"] = vectors[top]
+        return results
+
+    # -------------------------------------------------------
+    # STATUS
+    # -------------------------------------------------------
+    def count(self):
+        """
+        Number of items currently in the collection (best-effort).
+        """
+        try:
+            info = self.collection.count()
+            # chroma returns dict with 'count' depending on version; fallback
+            return info if isinstance(info, int) else info.get("count", None)
+        except Exception:
+            # fallback: try retrieving collection metadata length
+            try:
+                return len(self.collection.get()["ids"])
+            except Exception:
+                return None
+
+    def iter_items(self, batch_size: int = 1000, since: Optional[float] = None):
+        """
+        Yield every stored item as (vector, Document), reading the
+        collection in pages of `batch_size` (used to copy / reshard stores).
+        since: only items with `ingested_at >= since`
+        """
+        collection = self.collection
+        where = {"ingested_at": {"$gte": since}} if since is not None else None
+        offset = 0
+        while True:
+            page = collection.get(
+                where=where,
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not page["ids"]:
+                return
+            for vector, text, metadata in zip(
+                page["embeddings"], page["documents"], page["metadatas"]
+            ):
+                yield list(map(float, vector)), Document(
+                    page_content=text, metadata=metadata or {}
+                )
+            offset += len(page["ids"])
 
     # -------------------------------------------------------
     # DELETE COLLECTION (optional)
     # -------------------------------------------------------
     def delete_all(self):
-        self.client.delete_collection(self.collection_name)
+        with self._add_lock:
+            self.client.delete_collection(self.collection_name)
+            # leave an empty collection behind so later adds keep working
+            self._collection = None
+            self._refresh()
         print("🗑️ Collection deleted.")
+
+    def drop(self):
+        """
+        Delete the collection without leaving an empty one behind (the
+        store is not used afterwards, e.g. a retired shard).
+        """
+        with self._add_lock:
+            self.client.delete_collection(self.collection_name)
+            self._collection = None
+
+    # -------------------------------------------------------
+    # SNAPSHOT / COMPACTION
+    # -------------------------------------------------------
+    def persist(self, target: str):
+        """
+        Write a consistent copy of the whole Chroma directory to `target`
+        and compact (VACUUM) the copied SQLite file. Adds from this process
+        wait until the copy is done.
+
+        The live file is only read: a VACUUM through a second connection
+        while Chroma has it open fails Chroma's own reads and writes with
+        disk I/O errors and can leave the file malformed.
+        """
+        if self.mode == "http":
+            raise RuntimeError(
+                "In http mode the Chroma server owns the files; snapshot them on the server host"
+            )
+
+        db = os.path.join(self.persist_directory, "chroma.sqlite3")
+        before = os.path.getsize(db)
+        copy_path = os.path.join(target, "chroma.sqlite3")
+        with self._add_lock:
+            os.makedirs(target)
+            # HNSW segment directories and the pointer file as they are ...
+            for entry in os.scandir(self.persist_directory):
+                if entry.is_dir():
+                    shutil.copytree(entry.path, os.path.join(target, entry.name))
+                elif entry.name == "active_collection.json":
+                    shutil.copy2(entry.path, target)
+            # ... and SQLite through its online backup API (consistent copy)
+            with closing(sqlite3.connect(db, timeout=30)) as source, closing(
+                sqlite3.connect(copy_path)
+            ) as copy:
+                source.backup(copy)
+
+        # the copy is private to us: compact it outside the lock
+        with closing(sqlite3.connect(copy_path)) as connection:
+            connection.execute("VACUUM")
+        after = os.path.getsize(copy_path)
+
+        return {"sqlite_bytes_before": before, "sqlite_bytes_after": after}
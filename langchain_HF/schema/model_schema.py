@@ -1,15 +1,18 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Union
 
 
 class TextGenRequest(BaseModel):
     prompt: str
     service_token: str
+    stop: Optional[List[str]] = None  # extra stop strings
 
 
 class SummarizeRequest(BaseModel):
     text: str
     service_token: str
+    long_document: bool = False
 
 
 class LLMChainRequest(BaseModel):
@@ -17,14 +20,41 @@ class LLMChainRequest(BaseModel):
     service_token: str
 
 
+class LLMChainBatchRequest(BaseModel):
+    topics: List[str] = Field(..., min_length=1, max_length=1024)
+    service_token: str
+
+
 class AddOptions(BaseModel):
     pass
 
 
+class MetadataFilter(BaseModel):
+    source: Optional[Union[str, List[str]]] = None  # one source or any of several
+    page_from: Optional[int] = None  # inclusive, as stored (0-based for PDFs)
+    page_to: Optional[int] = None  # inclusive
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
+
+
 class QueryRequest(BaseModel):
     query: str
     k: Optional[int] = 5
+    filters: Optional[MetadataFilter] = None
+    include_embeddings: bool = False  # also return the chunk vectors
 
 
 class AskRequest(BaseModel):
     prompt: str
+    filters: Optional[MetadataFilter] = None
+    stop: Optional[List[str]] = None  # extra stop strings
+
+
+class RebuildRequest(BaseModel):
+    source: Literal["documents", "collection"] = "documents"
+    ef_construction: int = Field(200, ge=1)  # HNSW build-time candidate list
+    m: int = Field(16, ge=2)  # HNSW neighbours per node
+    ef_search: Optional[int] = Field(None, ge=1)
+    min_recall: float = Field(0.9, ge=0, le=1)  # recall@k needed to swap
+    sample_queries: int = Field(50, ge=1)
+    k: int = Field(5, ge=1)
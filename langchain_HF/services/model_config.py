@@ -1,41 +1,64 @@
 import os
 from dotenv import load_dotenv
-from transformers import pipeline
 from langchain_huggingface import HuggingFacePipeline
+from hugging_face.services.model_precision import load_pipeline
+from hugging_face.services.speculative_decoding import enable_speculative_decoding
 
 # Load .env variables
 load_dotenv()
 
 hf_token = os.getenv("HF_TOKEN")
 
+# Model ids or local paths
+qwen_model = os.getenv("QWEN_MODEL", "Qwen/Qwen2.5-3B-Instruct")
+bart_model = os.getenv("BART_MODEL", "facebook/bart-large-cnn")
+
+# fp32 (default) | bf16 | int8 | int4
+qwen_precision = os.getenv("QWEN_PRECISION", "fp32")
+bart_precision = os.getenv("BART_PRECISION", "fp32")
+
+# Prompts per batched pipeline call (chain batch endpoints)
+llm_batch_size = int(os.getenv("LLM_BATCH_SIZE", "8"))
+
 # Text generation pipeline
-generator = pipeline(
+generator = load_pipeline(
         "text-generation",
-        model="Qwen/Qwen2.5-3B-Instruct",
+        qwen_model,
+        precision=qwen_precision,
         max_new_tokens=256,
         temperature=0.7,
         do_sample=True,
         token=hf_token,
         return_full_text=False,
         trust_remote_code=True,
-        
+        batch_size=llm_batch_size,
     )
 
+# Decoder-only batches must be left-padded so every prompt ends at the same position
+generator.tokenizer.padding_side = "left"
+if generator.tokenizer.pad_token is None:
+    generator.tokenizer.pad_token = generator.tokenizer.eos_token
+
+# Draft-model assisted decoding when QWEN_DRAFT_MODEL is set
+enable_speculative_decoding(generator)
+
 # Summarization pipeline
-summarizer = pipeline(
+summarizer = load_pipeline(
         "summarization",
-        model="facebook/bart-large-cnn",
-        token=hf_token
+        bart_model,
+        precision=bart_precision,
+        token=hf_token,
+        batch_size=llm_batch_size,
     )
 
 
 # 🔹 TEXT GENERATION MODEL
 def load_text_generation_model():
     
-    return HuggingFacePipeline(pipeline=generator)
+    return HuggingFacePipeline(pipeline=generator, batch_size=llm_batch_size)
 
 
 # 🔹 SUMMARIZATION MODEL
 def load_summarization_model():
     
-    return HuggingFacePipeline(pipeline=summarizer)
+    return HuggingFacePipeline(pipeline=summarizer, batch_size=llm_batch_size)
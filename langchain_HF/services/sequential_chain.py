@@ -1,7 +1,10 @@
 # Import necessary components
+from typing import List
+
 from langchain.chains import LLMChain, SequentialChain
 from langchain.prompts import PromptTemplate
 
+from hugging_face.services.stop_conditions import StopConditions, route_stop_conditions
 from ..services.model_config import load_text_generation_model, load_summarization_model
 
 llm = load_text_generation_model()
@@ -36,10 +39,15 @@ title_prompt = PromptTemplate(
 )
 
 
+# One short title: stop at the first newline after it instead of 256 tokens
+# (STOP_STRINGS_TITLE adds stop strings)
+title_stops = route_stop_conditions("title", StopConditions(stop_at_newline=True))
+
 title_chain = LLMChain(
     llm=llm,
     prompt=title_prompt,
     output_key="title",
+    llm_kwargs={"pipeline_kwargs": {"stop_conditions": title_stops}},
 )
 
 
@@ -56,4 +64,25 @@ def squential_chain(text: str):
     1. Summarize the given text
     2. Generate a title from the summary
     """
-    return chain.invoke({"content": text})
+    result = chain.invoke({"content": text})
+    result["title"] = title_stops.trim(result["title"])
+    return result
+
+
+def squential_chain_batch(texts: List[str]):
+    """
+    Same as squential_chain for many texts: every stage runs once for the
+    whole batch (LLMChain.apply -> batched pipeline calls), and its outputs
+    become the next stage's inputs. Results are in input order.
+    """
+    rows = [{"content": text} for text in texts]
+    for stage in chain.chains:
+        outputs = stage.apply(rows)
+        rows = [{**row, **output} for row, output in zip(rows, outputs)]
+    return [
+        {
+            **{key: row[key] for key in ["content", *chain.output_variables]},
+            "title": title_stops.trim(row["title"]),
+        }
+        for row in rows
+    ]
@@ -1,3 +1,5 @@
+from typing import List
+
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from ..services.model_config import load_text_generation_model
@@ -17,3 +19,9 @@ def generate_llm_chain_quote(topic: str):
     print(f"Generating quote about: {topic}")
     response = chain.invoke({"topic": topic})
     return response
+
+
+# Batch: one LLM generate() call for all topics, split into pipeline batches
+def generate_llm_chain_quotes(topics: List[str]):
+    outputs = chain.apply([{"topic": topic} for topic in topics])
+    return [{"topic": topic, **output} for topic, output in zip(topics, outputs)]
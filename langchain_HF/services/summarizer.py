@@ -1,4 +1,5 @@
 from ..services.model_config import load_summarization_model
+from hugging_face.services.map_reduce_summary import map_reduce_summarize
 import json
 
 llm_summarizer = load_summarization_model()
@@ -10,10 +11,15 @@ def clean_title(title: str) -> str:
     return lines[0]
 
 
-def summarize_text(content: str) -> str:
+def summarize_text(content: str, long_document: bool = False) -> str:
     """
     Summarize a long passage.
+    With long_document=True the whole text is summarized map-reduce style
+    instead of only its first line.
     """
+    if long_document:
+        return map_reduce_summarize(llm_summarizer.pipeline, content)
+
     content = clean_title(content)
     response = llm_summarizer.invoke(content)
     return response
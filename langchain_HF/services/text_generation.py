@@ -1,9 +1,15 @@
+from typing import List, Optional
+
+from hugging_face.services.stop_conditions import StopConditions, route_stop_conditions
 from ..services.model_config import load_text_generation_model
 
 # Load model once at startup
 llm_generate = load_text_generation_model()
 
-def generate_text(user_query: str) -> str:
+# Stop at <|im_end|> / eos (plus STOP_STRINGS_LANGCHAIN_GENERATE) instead of running to max_new_tokens
+generate_stops = route_stop_conditions("langchain_generate", StopConditions())
+
+def generate_text(user_query: str, stop: Optional[List[str]] = None) -> str:
     """
     Generate creative or factual text response using Qwen Chat Template.
     """
@@ -16,11 +22,15 @@ def generate_text(user_query: str) -> str:
         f"<|im_start|>assistant\n"
     )
 
-    # Run through HuggingFacePipeline
-    raw_output = llm_generate.invoke(qwen_prompt)
+    stops = generate_stops.extend(stop)
+
+    # Run through HuggingFacePipeline (halts at the first stop condition)
+    raw_output = llm_generate.invoke(
+        qwen_prompt, pipeline_kwargs={"stop_conditions": stops}
+    )
 
-    # Remove prompt part and keep only assistant answer
-    cleaned = raw_output.split("<|im_start|>assistant\n")[-1].strip()
+    # Remove prompt part and the stop string, keep only assistant answer
+    cleaned = stops.trim(raw_output.split("<|im_start|>assistant\n")[-1])
 
     return cleaned
 
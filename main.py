@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from hugging_face.api import hugging_face_ai
 from langchain_HF.api.langchain_sample_apis import langchain_ai
 from langchain_HF.api.rag_pipeline_apis import rag_apis
+from observability.metrics import REGISTRY, http_latency, http_requests
+from observability.tracing import start_trace
 
 # Initialize FastAPI app
 
@@ -19,3 +24,33 @@ app.include_router(
 app.include_router(
     rag_apis.router, prefix="/api/v1/langchain-rag-ai", tags=["RAG Pipeline"]
 )
+
+
+@app.middleware("http")
+async def record_request_metrics_and_trace(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    with start_trace(f"{request.method} {request.url.path}") as root:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Trace-Id"] = root.trace.trace_id
+            return response
+        finally:
+            # label by route template, not raw path, to keep label sets bounded
+            route = request.scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            root.name = f"{request.method} {path}"
+            root.set_attribute("http.status_code", status)
+            http_requests.inc(method=request.method, route=path, status=status)
+            http_latency.observe(
+                time.perf_counter() - start, method=request.method, route=path
+            )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,327 @@
+"""
+In-process metrics with Prometheus text exposition (served on /metrics).
+
+Hot paths only take a lock and bump a few numbers: histograms use fixed
+buckets (bisect), and values that are expensive or live elsewhere - queue
+depths, process memory - are gauges computed from callbacks at scrape time.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+from observability.tracing import span
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)  # fmt: skip
+
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> str:
+        return (
+            f"# HELP {self.name} {self.documentation}\n"
+            f"# TYPE {self.name} {self.kind}\n"
+        )
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + "".join(
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}\n"
+            for key, v in items
+        )
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels):
+        """Evaluate `function` at scrape time for these labels."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def render(self) -> str:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return self.header() + "".join(
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}\n"
+            for key, v in values.items()
+        )
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> str:
+        with self._lock:
+            items = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            ]
+        lines = [self.header()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}\n"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}\n")
+            lines.append(f"{self.name}_count{labels} {cumulative}\n")
+        return "".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    name, documentation, labelnames, **kwargs
+                )
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+# -------------------------
+# Shared metrics
+# -------------------------
+http_requests = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+http_latency = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route"),
+)
+stage_latency = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds",
+    "Time spent in each pipeline stage (load, split, embed, search, prompt, prefill, decode).",
+    ("stage",),
+)
+generated_tokens = REGISTRY.counter(
+    "generated_tokens_total", "Tokens generated, by model.", ("model",)
+)
+tokens_saved = REGISTRY.counter(
+    "generation_tokens_saved_total",
+    "max_new_tokens budget left unused because generation hit a stop string "
+    "or a newline stop (eos stops are not counted).",
+    ("model", "reason"),
+)
+tokens_per_second = REGISTRY.histogram(
+    "generation_tokens_per_second",
+    "Decoding speed of each generate call, by model.",
+    ("model",),
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+queue_depth = REGISTRY.gauge(
+    "queue_depth", "Items waiting in in-process queues.", ("queue",)
+)
+model_memory = REGISTRY.gauge(
+    "model_memory_bytes", "Bytes held by loaded model weights.", ("model",)
+)
+process_memory = REGISTRY.gauge(
+    "process_resident_memory_bytes", "Resident set size of this process."
+)
+
+
+def _resident_bytes() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+process_memory.set_function(_resident_bytes)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time the enclosed block as one pipeline stage (and a tracing span)."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        stage_latency.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_generation(model: str, new_tokens: int, seconds: float):
+    generated_tokens.inc(new_tokens, model=model)
+    if seconds > 0 and new_tokens > 0:
+        tokens_per_second.observe(new_tokens / seconds, model=model)
+
+
+def record_early_stop(model: str, reason: str, saved_tokens: int):
+    if saved_tokens > 0:
+        tokens_saved.inc(saved_tokens, model=model, reason=reason)
+
+
+def tensor_bytes(model) -> int:
+    """Weight memory of a torch module, including packed quantized weights."""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if hasattr(tensor, "element_size"):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def instrument_generate(model, name: str):
+    """
+    Record prefill / decode stage timings and tokens/sec for every
+    model.generate() call: the first forward of a call is the prefill, each
+    later one is a decode step (same granularity as the generation engine).
+    """
+    local = threading.local()
+
+    def before_forward(*_):
+        local.forward_start = time.perf_counter()
+
+    def after_forward(*_):
+        if not getattr(local, "active", False):
+            return
+        elapsed = time.perf_counter() - local.forward_start
+        stage = "prefill" if local.forwards == 0 else "decode"
+        stage_latency.observe(elapsed, stage=stage)
+        local.seconds[stage] += elapsed
+        local.forwards += 1
+
+    model.register_forward_pre_hook(before_forward)
+    model.register_forward_hook(after_forward)
+    generate = model.generate
+
+    def timed_generate(*args, **kwargs):
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        local.active, local.forwards = True, 0
+        local.seconds = {"prefill": 0.0, "decode": 0.0}
+        start = time.perf_counter()
+        with span("generate", model=name) as trace_span:
+            try:
+                output = generate(*args, **kwargs)
+            finally:
+                local.active = False
+            elapsed = time.perf_counter() - start
+
+            sequences = getattr(output, "sequences", output)
+            new_tokens = sequences.numel()
+            if input_ids is not None and not model.config.is_encoder_decoder:
+                new_tokens -= input_ids.numel()
+            record_generation(name, new_tokens, elapsed)
+
+            if trace_span is not None:
+                if input_ids is not None:
+                    trace_span.set_attribute("prompt_tokens", input_ids.shape[-1])
+                trace_span.set_attribute("new_tokens", new_tokens)
+                for stage, seconds in local.seconds.items():
+                    trace_span.set_attribute(f"{stage}_ms", round(seconds * 1000, 3))
+        return output
+
+    model.generate = timed_generate
+    return model
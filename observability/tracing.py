@@ -0,0 +1,205 @@
+"""
+Request-scoped tracing spans.
+
+Every HTTP request opens a root span (main.py middleware); span() and
+observe_stage() open nested spans under whatever span is current in the
+calling context (contextvars, so threads started with copy_context().run and
+FastAPI's threadpool keep the parent). Outside a request nothing is recorded.
+
+Exporters:
+  - local (always): finished traces slower than TRACE_SLOW_REQUEST_MS are
+    appended to TRACE_SLOW_LOG (JSON lines), sampled at
+    TRACE_SLOW_SAMPLE_RATE (default 0.1), with the span breakdown and prompt
+    token counts. Records are queued and written by a background thread (the
+    request only pays for the sampling check); the file rotates at
+    TRACE_SLOW_LOG_MAX_BYTES, keeping TRACE_SLOW_LOG_BACKUPS old files
+  - otel: TRACING_EXPORTER=otel mirrors every span to the OpenTelemetry API
+    (opentelemetry-api/sdk must be installed and configured by the deployer)
+
+IDs use the W3C trace-context sizes (32 / 16 hex chars) so they line up with
+OpenTelemetry trace ids.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+# Load .env variables
+load_dotenv()
+
+slow_request_ms = float(os.getenv("TRACE_SLOW_REQUEST_MS", "1000"))
+slow_sample_rate = float(os.getenv("TRACE_SLOW_SAMPLE_RATE", "0.1"))
+slow_log_path = os.getenv("TRACE_SLOW_LOG", "slow_requests.jsonl")
+slow_log_max_bytes = int(os.getenv("TRACE_SLOW_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+slow_log_backups = int(os.getenv("TRACE_SLOW_LOG_BACKUPS", "3"))
+
+_otel_tracer = None
+if os.getenv("TRACING_EXPORTER") == "otel":
+    try:
+        from opentelemetry import trace as otel_trace
+
+        _otel_tracer = otel_trace.get_tracer("fastapi-huggingface")
+    except ImportError:
+        _otel_tracer = None
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None
+)
+_log_lock = threading.Lock()
+_slow_traces: queue.SimpleQueue = queue.SimpleQueue()  # (root span, finished at)
+_writer: Optional[threading.Thread] = None
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span"):
+        with self._lock:
+            self.spans.append(span)
+
+
+class Span:
+    def __init__(self, name: str, trace: Trace, parent: Optional["Span"] = None):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = os.urandom(8).hex()
+        self.attributes: Dict[str, Any] = {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+        self._otel = None
+        if _otel_tracer is not None:
+            context = None
+            if parent is not None and parent._otel is not None:
+                context = otel_trace.set_span_in_context(parent._otel)
+            self._otel = _otel_tracer.start_span(name, context=context)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def finish(self):
+        self.end = time.perf_counter()
+        self.trace.add(self)
+        if self._otel is not None:
+            self._otel.end()
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value):
+    """Attach an attribute to the current span (no-op outside a trace)."""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Nested span under the current one; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent)
+    for key, value in attributes.items():
+        child.set_attribute(key, value)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """Root span of a request; exports the trace when it closes."""
+    root = Span(name, Trace())
+    for key, value in attributes.items():
+        root.set_attribute(key, value)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        _current_span.reset(token)
+        root.finish()
+        _export(root)
+
+
+def _export(root: Span):
+    """Queue a slow, sampled trace for the writer thread (runs on the request path)."""
+    global _writer
+    if root.duration_ms < slow_request_ms or random.random() >= slow_sample_rate:
+        return
+
+    _slow_traces.put((root, time.time()))
+    if _writer is None:
+        with _log_lock:
+            if _writer is None:
+                _writer = threading.Thread(
+                    target=_write_slow_traces, name="slow-trace-log", daemon=True
+                )
+                _writer.start()
+
+
+def _slow_record(root: Span, timestamp: float) -> dict:
+    spans = sorted(root.trace.spans, key=lambda s: s.start)
+    return {
+        "trace_id": root.trace.trace_id,
+        "name": root.name,
+        "timestamp": timestamp,
+        "duration_ms": round(root.duration_ms, 3),
+        "prompt_tokens": [
+            s.attributes["prompt_tokens"]
+            for s in spans
+            if "prompt_tokens" in s.attributes
+        ],
+        "spans": [s.to_dict(root.start) for s in spans],
+    }
+
+
+def _write_slow_traces():
+    handler = RotatingFileHandler(
+        slow_log_path,
+        maxBytes=slow_log_max_bytes,
+        backupCount=slow_log_backups,
+        encoding="utf-8",
+        delay=True,
+    )
+    while True:
+        root, timestamp = _slow_traces.get()
+        line = json.dumps(_slow_record(root, timestamp), default=str)
+        handler.handle(logging.makeLogRecord({"msg": line}))